@@ -1,3 +1,4 @@
+from datetime import timedelta
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -13,7 +14,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
+    'rest_framework_simplejwt',
     'core',
+    'reports',
+    'catalog',
+    'quotes',
 ]
 
 MIDDLEWARE = [
@@ -53,6 +59,14 @@ DATABASES = {
     }
 }
 
+# In produzione puntare a Redis/Memcached: frammenti e rollup sono condivisi tra i worker
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cantieresmart',
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME':'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME':'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -72,8 +86,52 @@ STATIC_ROOT = BASE_DIR / 'static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# === EXPORT PDF (processi worker fuori dal ciclo di richiesta) ===
+PDF_EXPORT_DIR = MEDIA_ROOT / 'exports'
+PDF_WORKERS = 2
+
+# === IMPORT LISTINI (file caricati e stato dei job in background) ===
+CATALOG_IMPORT_DIR = MEDIA_ROOT / 'imports'
+
+# === MINIATURE (derivati in MEDIA_ROOT/derived, generati in process pool) ===
+IMAGE_WORKERS = 2
+
+# === API (sync offline dal telefono) ===
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        # App mobile: JWT senza letture di sessione; browser: sessione Django
+        'core.authentication.CachedJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.RoleTokenObtainPairSerializer',
+    # Cambio password = token esistenti revocati (controllo sull'utente in cache, senza DB)
+    'CHECK_REVOKE_TOKEN': True,
+}
+JWT_USER_CACHE_SECONDS = 300
+JWT_USER_CACHE_SIZE = 1024
+# Alias in CACHES di una cache condivisa tra i processi (Redis/Memcached) per rendere immediata
+# ovunque la revoca (disattivazione, cambio password); costa un GET sulla cache per richiesta.
+# None: ogni processo vede la revoca allo scadere di JWT_USER_CACHE_SECONDS. La LocMemCache
+# qui sopra è per processo e non va indicata.
+JWT_USER_STAMP_CACHE = None
+
+# === UPLOAD A BLOCCHI (riprendibili, deduplicati per SHA-256) ===
+UPLOAD_MAX_BYTES = 50 * 1024 * 1024
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
+AUTHENTICATION_BACKENDS = ['core.backends.EmailOrUsernameBackend']
+# Tentativi di login falliti per username/email prima del blocco temporaneo (None = disattivato)
+LOGIN_THROTTLE = {'attempts': 5, 'window': 300}
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
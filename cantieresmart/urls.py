@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from core import views as core_views
@@ -6,5 +8,11 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('login/', core_views.login_view, name='login'),
     path('logout/', core_views.logout_view, name='logout'),
+    path('reports/', include('reports.urls')),
+    path('catalog/', include('catalog.urls')),
+    path('quotes/', include('quotes.urls')),
     path('', include('core.urls')),
 ]
+
+# In sviluppo serve MEDIA_ROOT (upload, miniature, export)
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,3 +1,20 @@
 from django.contrib import admin
+from .models import Macro, Category, Item
 
-# Register your models here.
+@admin.register(Macro)
+class MacroAdmin(admin.ModelAdmin):
+    list_display = ('code','name','sort_order')
+    search_fields = ('code','name')
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('code','name','macro','sort_order')
+    list_filter = ('macro',)
+    search_fields = ('code','name')
+
+@admin.register(Item)
+class ItemAdmin(admin.ModelAdmin):
+    list_display = ('code','description','category','unit','unit_price_eur','active')
+    list_filter = ('active','category__macro')
+    search_fields = ('code','description')
+    autocomplete_fields = ('category',)
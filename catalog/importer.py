@@ -0,0 +1,262 @@
+import codecs
+import csv
+import io
+import os
+import re
+import zipfile
+from contextlib import closing
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from xml.etree.ElementTree import ParseError, iterparse
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Macro, Category, Item
+
+# ===== IMPORT LISTINO (CSV / XLSX in streaming) =====
+# Le righe sono lette una alla volta (CSV via csv.reader, XLSX via iterparse sul foglio
+# dentro lo zip) e scritte a blocchi: per ogni blocco una query sui codici esistenti,
+# un bulk_create e un bulk_update delle sole voci cambiate.
+BATCH_SIZE = 2000
+MAX_ERRORS = 100
+COLUMNS = {
+    'macro_code': ('macro_code', 'codice_macro', 'macro'),
+    'macro_name': ('macro_name', 'nome_macro', 'descrizione_macro'),
+    'category_code': ('category_code', 'codice_categoria', 'categoria'),
+    'category_name': ('category_name', 'nome_categoria', 'descrizione_categoria'),
+    'code': ('code', 'codice', 'codice_voce'),
+    'description': ('description', 'descrizione', 'voce'),
+    'unit': ('unit', 'um', 'unita', 'unità', 'unita_misura'),
+    'unit_price_eur': ('unit_price_eur', 'prezzo', 'prezzo_unitario', 'price'),
+    'weight': ('weight', 'peso'),
+}
+REQUIRED = ('macro_code', 'category_code', 'code', 'description', 'unit_price_eur')
+ITEM_FIELDS = ['category_id', 'description', 'unit', 'unit_price_eur', 'weight', 'sort_order', 'active']
+
+class ImportFormatError(Exception):
+    """File non leggibile o intestazione senza le colonne obbligatorie."""
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    macros: int = 0
+    categories: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, line, message):
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+# --- lettura ---
+def _encoding(fileobj):
+    """UTF-8 (con o senza BOM) se tutto il file lo è, altrimenti cp1252 (CSV salvati da Excel).
+
+    Una passata a blocchi con decoder incrementale: memoria costante anche su listini grandi.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for chunk in iter(lambda: fileobj.read(65536), b''):
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'cp1252'
+    finally:
+        fileobj.seek(0)
+    return 'utf-8-sig'
+
+def _csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding=_encoding(fileobj), newline='')
+    try:
+        sample = text.read(8192)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError("Codifica del file non riconosciuta: salva il CSV in UTF-8.") from exc
+    except csv.Error as exc:
+        raise ImportFormatError(f"CSV non valido: {exc}") from exc
+    finally:
+        text.detach()
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_COL = re.compile(r'[A-Z]+')
+
+def _col_index(ref):
+    n = 0
+    for ch in _COL.match(ref).group():
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+def _xlsx_rows(fileobj):
+    """Primo foglio di un .xlsx riga per riga (solo libreria standard, memoria costante)."""
+    try:
+        book = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as exc:
+        raise ImportFormatError("File XLSX non valido.") from exc
+    with book:
+        try:
+            shared = []
+            if 'xl/sharedStrings.xml' in book.namelist():
+                with book.open('xl/sharedStrings.xml') as fh:
+                    for _, el in iterparse(fh):
+                        if el.tag == _NS + 'si':
+                            shared.append(''.join(t.text or '' for t in el.iter(_NS + 't')))
+                            el.clear()
+            sheets = sorted(n for n in book.namelist() if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', n))
+            if not sheets:
+                raise ImportFormatError("Il file XLSX non contiene fogli.")
+            with book.open(sheets[0]) as fh:
+                for _, el in iterparse(fh):
+                    if el.tag != _NS + 'row':
+                        continue
+                    cells = {}
+                    for c in el.iter(_NS + 'c'):
+                        kind, v = c.get('t'), c.find(_NS + 'v')
+                        if kind == 's' and v is not None:
+                            value = shared[int(v.text)]
+                        elif kind == 'inlineStr':
+                            value = ''.join(t.text or '' for t in c.iter(_NS + 't'))
+                        else:
+                            value = v.text if v is not None else ''
+                        cells[_col_index(c.get('r')) if c.get('r') else len(cells)] = value
+                    el.clear()
+                    yield [cells.get(i, '') for i in range(max(cells) + 1)] if cells else []
+        except (ParseError, KeyError, IndexError, ValueError) as exc:
+            # XML rotto o riferimento a una stringa condivisa inesistente
+            raise ImportFormatError("File XLSX non valido.") from exc
+
+def iter_records(fileobj, filename):
+    """(numero riga, {colonna: valore}) per ogni riga dati; intestazione con alias italiani/inglesi."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    rows = _xlsx_rows(fileobj) if ext in ('.xlsx', '.xlsm') else _csv_rows(fileobj)
+    # closing: il lettore rilascia il file anche se l'intestazione è rifiutata
+    with closing(rows):
+        header = next(rows, None)
+        if not header:
+            raise ImportFormatError("File vuoto.")
+        names = [re.sub(r'\s+', '_', (h or '').strip().lower()) for h in header]
+        index = {}
+        for key, aliases in COLUMNS.items():
+            for alias in aliases:
+                if alias in names:
+                    index[key] = names.index(alias)
+                    break
+        missing = [k for k in REQUIRED if k not in index]
+        if missing:
+            raise ImportFormatError(f"Colonne obbligatorie mancanti: {', '.join(missing)}")
+        for line, row in enumerate(rows, start=2):
+            if not any((v or '').strip() for v in row):
+                continue
+            yield line, {k: (row[i] if i < len(row) else '').strip() for k, i in index.items()}
+
+def parse_decimal(value):
+    """Accetta 1234.5, 1.234,50 e 1234,5."""
+    text = (value or '').replace('€', '').replace(' ', '')
+    if ',' in text:
+        text = text.replace('.', '').replace(',', '.')
+    return Decimal(text).quantize(Decimal('0.01'))
+
+# --- scrittura ---
+class _Importer:
+    def __init__(self, result):
+        self.result = result
+        self.macros = {m.code: m for m in Macro.objects.all()}
+        self.categories = {c.code: c for c in Category.objects.all()}
+
+    def _upsert_parents(self, batch):
+        new_macros, dirty_macros = {}, {}
+        for _, r in batch:
+            m = self.macros.get(r['macro_code'])
+            name = r.get('macro_name') or r['macro_code']
+            if m is None:
+                m = self.macros[r['macro_code']] = new_macros[r['macro_code']] = Macro(code=r['macro_code'], name=name, sort_order=len(self.macros))
+            elif r.get('macro_name') and m.name != name and m.pk:
+                m.name = name
+                dirty_macros[m.code] = m
+        Macro.objects.bulk_create(new_macros.values())
+        Macro.objects.bulk_update(dirty_macros.values(), ['name'])
+        self.result.macros += len(new_macros)
+
+        new_cats, dirty_cats = {}, {}
+        for _, r in batch:
+            macro = self.macros[r['macro_code']]
+            c = self.categories.get(r['category_code'])
+            name = r.get('category_name') or r['category_code']
+            if c is None:
+                c = self.categories[r['category_code']] = new_cats[r['category_code']] = Category(
+                    macro=macro, code=r['category_code'], name=name, sort_order=len(self.categories),
+                )
+            elif c.pk and (c.macro_id != macro.pk or (r.get('category_name') and c.name != name)):
+                c.macro, c.name = macro, (name if r.get('category_name') else c.name)
+                dirty_cats[c.code] = c
+        Category.objects.bulk_create(new_cats.values())
+        Category.objects.bulk_update(dirty_cats.values(), ['macro', 'name'])
+        self.result.categories += len(new_cats)
+
+    def write(self, batch):
+        self._upsert_parents(batch)
+        wanted = {}
+        for line, r in batch:
+            wanted[r['code']] = Item(
+                category_id=self.categories[r['category_code']].pk, code=r['code'], description=r['description'],
+                unit=r.get('unit', ''), unit_price_eur=r['unit_price_eur'], weight=r['weight'], sort_order=line, active=True,
+            )
+        existing = {i.code: i for i in Item.objects.filter(code__in=list(wanted))}
+        create, update = [], []
+        now = timezone.now()
+        for code, item in wanted.items():
+            old = existing.get(code)
+            if old is None:
+                create.append(item)
+            elif any(getattr(old, f) != getattr(item, f) for f in ITEM_FIELDS):
+                for f in ITEM_FIELDS:
+                    setattr(old, f, getattr(item, f))
+                old.updated_at = now
+                update.append(old)
+            else:
+                self.result.unchanged += 1
+        Item.objects.bulk_create(create)
+        Item.objects.bulk_update(update, ITEM_FIELDS + ['updated_at'])
+        self.result.created += len(create)
+        self.result.updated += len(update)
+
+def import_catalog(fileobj, filename, batch_size=BATCH_SIZE, progress=None):
+    """Importa (upsert per codice) un listino CSV/XLSX in un'unica transazione.
+
+    Le righe non valide sono saltate e riportate in result.errors; progress(result) è
+    chiamata dopo ogni blocco.
+    """
+    result = ImportResult()
+    with transaction.atomic():
+        importer = _Importer(result)
+        batch = []
+        for line, r in iter_records(fileobj, filename):
+            result.rows += 1
+            missing = [k for k in REQUIRED if not r.get(k)]
+            if missing:
+                result.error(line, f"Campi mancanti: {', '.join(missing)}")
+                continue
+            try:
+                r['unit_price_eur'] = parse_decimal(r['unit_price_eur'])
+                r['weight'] = parse_decimal(r['weight']) if r.get('weight') else Decimal('1.00')
+            except InvalidOperation:
+                result.error(line, "Prezzo o peso non numerico")
+                continue
+            batch.append((line, r))
+            if len(batch) >= batch_size:
+                importer.write(batch)
+                batch = []
+                if progress:
+                    progress(result)
+        if batch:
+            importer.write(batch)
+            if progress:
+                progress(result)
+    return result
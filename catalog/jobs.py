@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+
+from django.conf import settings
+from django.db import connections
+
+from .importer import import_catalog, ImportFormatError, ImportResult
+
+# ===== IMPORT LISTINO IN BACKGROUND =====
+# Il file caricato è salvato su disco e importato da un thread fuori dal ciclo di richiesta.
+# Lo stato (contatori aggiornati a ogni blocco, esito, righe scartate) è un JSON accanto al
+# file: la pagina di import lo rilegge a ogni refresh, da qualunque richiesta.
+STALE_TIMEOUT = 15 * 60
+
+_pool = None
+
+def _executor():
+    global _pool
+    if _pool is None:
+        # Un import alla volta: due listini in parallelo si contenderebbero gli stessi codici
+        _pool = ThreadPoolExecutor(max_workers=1)
+    return _pool
+
+def import_dir():
+    path = getattr(settings, 'CATALOG_IMPORT_DIR', os.path.join(settings.MEDIA_ROOT, 'imports'))
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+def _paths(job_id):
+    base = os.path.join(import_dir(), job_id)
+    return base + '.upload', base + '.json'
+
+def _write(job_id, **state):
+    path = _paths(job_id)[1]
+    with open(path + '.tmp', 'w') as fh:
+        json.dump(state, fh, default=str)
+    os.replace(path + '.tmp', path)
+
+def submit(upload):
+    """Salva il file caricato e accoda l'import; restituisce l'id del job."""
+    job_id = uuid.uuid4().hex
+    with open(_paths(job_id)[0], 'wb') as fh:
+        for chunk in upload.chunks():
+            fh.write(chunk)
+    _write(job_id, status='running', filename=upload.name, result=asdict(ImportResult()))
+    _executor().submit(_run_in_thread, job_id, upload.name)
+    return job_id
+
+def run(job_id, filename):
+    src = _paths(job_id)[0]
+    def progress(result):
+        _write(job_id, status='running', filename=filename, result=asdict(result))
+    try:
+        with open(src, 'rb') as fh:
+            result = import_catalog(fh, filename, progress=progress)
+    except ImportFormatError as e:
+        _write(job_id, status='failed', filename=filename, error=str(e))
+    except Exception:
+        _write(job_id, status='failed', filename=filename, error="Errore imprevisto durante l'import.")
+        raise
+    else:
+        _write(job_id, status='done', filename=filename, result=asdict(result))
+    finally:
+        os.remove(src)
+
+def _run_in_thread(job_id, filename):
+    try:
+        run(job_id, filename)
+    finally:
+        connections.close_all()
+
+def status(job_id):
+    """Stato del job ({'status': running|done|failed, ...}) o None se l'id non esiste."""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+        return None
+    path = _paths(job_id)[1]
+    try:
+        with open(path) as fh:
+            state = json.load(fh)
+        age = time.time() - os.path.getmtime(path)
+    except (OSError, ValueError):
+        return None
+    if state['status'] == 'running' and age >= STALE_TIMEOUT:
+        return {**state, 'status': 'failed', 'error': "Import interrotto."}
+    return state
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importer import import_catalog, ImportFormatError, BATCH_SIZE
+
+class Command(BaseCommand):
+    help = "Importa un listino CSV/XLSX nel catalogo (Macro → Categoria → Voce), upsert per codice"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File .csv o .xlsx")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        def progress(r):
+            self.stdout.write(f"  {r.rows} righe · {r.created} nuove · {r.updated} aggiornate · {r.unchanged} invariate")
+        try:
+            with open(options['path'], 'rb') as fh:
+                result = import_catalog(fh, options['path'], options['batch_size'], progress)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+        for line, msg in result.errors:
+            self.stderr.write(f"Riga {line}: {msg}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Listino importato: {result.created} voci nuove, {result.updated} aggiornate, "
+            f"{result.macros} macro e {result.categories} categorie create"
+        ))
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Macro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=40, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('sort_order', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['sort_order', 'code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=40, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('sort_order', models.IntegerField(default=0)),
+                ('macro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='catalog.macro')),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['macro', 'sort_order', 'code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Item',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=60, unique=True)),
+                ('description', models.TextField()),
+                ('unit', models.CharField(blank=True, default='', max_length=20)),
+                ('unit_price_eur', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('weight', models.DecimalField(decimal_places=2, default=1, max_digits=10)),
+                ('sort_order', models.IntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='catalog.category')),
+            ],
+            options={
+                'ordering': ['category', 'sort_order', 'code'],
+                'indexes': [models.Index(fields=['category', 'sort_order'], name='catalog_ite_categor_fb28fc_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,36 @@
 from django.db import models
 
-# Create your models here.
+# ===== CATALOGO LAVORAZIONI (Macro → Categoria → Voce) =====
+# Il codice è la chiave naturale usata dagli import dei listini (upsert per codice).
+class Macro(models.Model):
+    code = models.CharField(max_length=40, unique=True)
+    name = models.CharField(max_length=200)
+    sort_order = models.IntegerField(default=0)
+    class Meta:
+        ordering = ['sort_order','code']
+    def __str__(self): return f"{self.code} - {self.name}"
+
+class Category(models.Model):
+    macro = models.ForeignKey(Macro, on_delete=models.CASCADE, related_name='categories')
+    code = models.CharField(max_length=40, unique=True)
+    name = models.CharField(max_length=200)
+    sort_order = models.IntegerField(default=0)
+    class Meta:
+        ordering = ['macro','sort_order','code']
+        verbose_name_plural = 'categories'
+    def __str__(self): return f"{self.code} - {self.name}"
+
+class Item(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='items')
+    code = models.CharField(max_length=60, unique=True)
+    description = models.TextField()
+    unit = models.CharField(max_length=20, blank=True, default='')
+    unit_price_eur = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    weight = models.DecimalField(max_digits=10, decimal_places=2, default=1)  # peso nell'avanzamento se istanziata
+    sort_order = models.IntegerField(default=0)
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        ordering = ['category','sort_order','code']
+        indexes = [models.Index(fields=['category','sort_order'])]
+    def __str__(self): return f"{self.code} - {self.description[:60]}"
@@ -1,3 +1,125 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from . import jobs
+from .importer import import_catalog, iter_records, parse_decimal, ImportFormatError
+from .models import Macro, Category, Item
+
+CSV = (
+    "codice_macro;nome_macro;codice_categoria;nome_categoria;codice;descrizione;um;prezzo\n"
+    "M01;Opere edili;C01;Murature;V001;Muratura in blocchi;m²;1.234,50\n"
+    "M01;Opere edili;C01;Murature;V002;Intonaco civile;m²;18,5\n"
+)
+
+def xlsx(rows):
+    """XLSX minimo con tutte le celle testo in sharedStrings."""
+    strings = sorted({v for row in rows for v in row})
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    sheet = ''.join(
+        f'<row r="{r}">' + ''.join(
+            f'<c r="{chr(65 + c)}{r}" t="s"><v>{strings.index(v)}</v></c>' for c, v in enumerate(row)
+        ) + '</row>'
+        for r, row in enumerate(rows, start=1)
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        z.writestr('xl/sharedStrings.xml', f'<sst {ns}>' + ''.join(f'<si><t>{s}</t></si>' for s in strings) + '</sst>')
+        z.writestr('xl/worksheets/sheet1.xml', f'<worksheet {ns}><sheetData>{sheet}</sheetData></worksheet>')
+    buf.seek(0)
+    return buf
+
+# ===== IMPORT LISTINO =====
+class ImportCatalogTests(TestCase):
+    def run_import(self, text, encoding='utf-8', name='listino.csv'):
+        return import_catalog(io.BytesIO(text.encode(encoding)), name)
+
+    def test_upsert_by_code_and_unchanged_rows(self):
+        first = self.run_import(CSV)
+        self.assertEqual((first.rows, first.created, first.updated, first.macros, first.categories), (2, 2, 0, 1, 1))
+        self.assertEqual(Item.objects.get(code='V001').unit_price_eur, Decimal('1234.50'))
+        again = self.run_import(CSV)
+        self.assertEqual((again.created, again.updated, again.unchanged), (0, 0, 2))
+        changed = self.run_import(CSV.replace('18,5', '19,00'))
+        self.assertEqual((changed.created, changed.updated, changed.unchanged), (0, 1, 1))
+        self.assertEqual(Item.objects.get(code='V002').unit_price_eur, Decimal('19.00'))
+        self.assertEqual((Macro.objects.count(), Category.objects.count(), Item.objects.count()), (1, 1, 2))
+
+    def test_invalid_rows_are_reported(self):
+        result = self.run_import(CSV + "M01;;C01;;V003;Senza prezzo;m;\nM01;;C01;;V004;Prezzo errato;m;abc\n")
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+
+    def test_parse_decimal(self):
+        self.assertEqual(parse_decimal('1234.5'), Decimal('1234.50'))
+        self.assertEqual(parse_decimal('1.234,50'), Decimal('1234.50'))
+        self.assertEqual(parse_decimal('€ 12,3'), Decimal('12.30'))
+
+    def test_cp1252_csv_from_excel(self):
+        text = CSV.replace('um;', 'unità;').replace(';m²;', ';€/m;')
+        result = self.run_import(text, encoding='cp1252')
+        self.assertEqual(result.created, 2)
+        self.assertEqual(Item.objects.get(code='V001').unit, '€/m')
+
+    def test_undecodable_csv_is_a_format_error(self):
+        with self.assertRaises(ImportFormatError):
+            list(iter_records(io.BytesIO(CSV.encode() + b'\x81\x8d\n'), 'listino.csv'))
+
+    def test_xlsx_with_shared_strings(self):
+        rows = [line.split(';') for line in CSV.strip().split('\n')]
+        result = import_catalog(xlsx(rows), 'listino.xlsx')
+        self.assertEqual(result.created, 2)
+        item = Item.objects.get(code='V002')
+        self.assertEqual((item.description, item.unit, item.unit_price_eur), ('Intonaco civile', 'm²', Decimal('18.50')))
+
+    def test_broken_xlsx_is_a_format_error(self):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w') as z:
+            z.writestr('xl/worksheets/sheet1.xml', '<worksheet><sheetData><row>')
+        buf.seek(0)
+        with self.assertRaises(ImportFormatError):
+            import_catalog(buf, 'listino.xlsx')
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        override = override_settings(CATALOG_IMPORT_DIR=self.dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def start(self, content, name):
+        job_id = 'a' * 32
+        with open(jobs._paths(job_id)[0], 'wb') as fh:
+            fh.write(content)
+        jobs.run(job_id, name)
+        self.assertFalse(os.path.exists(jobs._paths(job_id)[0]))
+        return jobs.status(job_id)
+
+    def test_job_records_result(self):
+        state = self.start(CSV.encode(), 'listino.csv')
+        self.assertEqual(state['status'], 'done')
+        self.assertEqual(state['result']['created'], 2)
+
+    def test_job_reports_format_error(self):
+        state = self.start(b'codice;descrizione\nV001;Voce\n', 'listino.csv')
+        self.assertEqual(state['status'], 'failed')
+        self.assertIn('Colonne obbligatorie mancanti', state['error'])
+
+    def test_status_rejects_unknown_ids(self):
+        self.assertIsNone(jobs.status('../../etc/passwd'))
+        self.assertIsNone(jobs.status('b' * 32))
+
+    def test_import_page_shows_job(self):
+        self.client.force_login(User.objects.create_user('ufficio', is_staff=True))
+        self.start(CSV.encode(), 'listino.csv')
+        response = self.client.get('/catalog/import/', {'job': 'a' * 32})
+        self.assertContains(response, 'Listino listino.csv importato.')
+        response = self.client.post('/catalog/import/', {})
+        self.assertContains(response, 'Seleziona un file CSV o XLSX.')
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.catalog_home, name='catalog_home'),
+    path('import/', views.catalog_import, name='catalog_import'),
+]
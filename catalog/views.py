@@ -1,3 +1,39 @@
-from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.db.models import Count, Q
+from django.shortcuts import redirect, render
+from django.urls import reverse
 
-# Create your views here.
+from core.pagination import keyset_paginate, wants_fragment
+from . import jobs
+from .models import Macro, Item
+
+def _is_staff(user): return user.is_staff or user.is_superuser
+
+@login_required
+def catalog_home(request):
+    q = (request.GET.get('q') or '').strip()
+    category = request.GET.get('category') if (request.GET.get('category') or '').isdigit() else None
+    items = Item.objects.filter(active=True).select_related('category__macro')
+    if q:
+        items = items.filter(Q(code__istartswith=q) | Q(description__icontains=q))
+    if category:
+        items = items.filter(category_id=category)
+    page = keyset_paginate(request, items)
+    if wants_fragment(request):
+        return render(request, 'catalog/partials/item_rows.html', {'page': page})
+    macros = Macro.objects.prefetch_related('categories').annotate(n_items=Count('categories__items'))
+    return render(request, 'catalog/home.html', {'page': page, 'macros': macros, 'q': q, 'category': category})
+
+@user_passes_test(_is_staff)
+@login_required
+def catalog_import(request):
+    # L'import gira in background (catalog.jobs): la pagina mostra l'avanzamento del job
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, "Seleziona un file CSV o XLSX.")
+        else:
+            return redirect(f"{reverse('catalog_import')}?job={jobs.submit(upload)}")
+    job = jobs.status(request.GET.get('job')) if request.GET.get('job') else None
+    return render(request, 'catalog/import.html', {'job': job, 'result': (job or {}).get('result')})
@@ -1,11 +1,13 @@
 from django.contrib import admin
 from .models import (
     Project, WorkItem,
-    TimeSession, TimeSessionAllocation, WorkPhoto,
+    TimeSession, TimeSessionAllocation, WorkPhoto, DailyHours,
     CostDocument,
-    Vehicle, VehicleSession,
-    UserFolder, UserFile, BroadcastDoc
+    Vehicle, VehicleSession, VehicleReading,
+    UserFolder, UserFile, BroadcastDoc,
+    StoredFile, UploadSession, ChangeLog, HourlyRate
 )
+from .broadcasts import fan_out, BroadcastError
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
@@ -32,6 +34,20 @@ class TimeSessionAdmin(admin.ModelAdmin):
     inlines = [TimeSessionAllocationInline]
     search_fields = ('id','project__name','user__username','user__email','note')
 
+@admin.register(HourlyRate)
+class HourlyRateAdmin(admin.ModelAdmin):
+    list_display = ('user','rate_eur','valid_from','note')
+    list_filter = ('user',)
+    autocomplete_fields = ('user',)
+    search_fields = ('user__username','note')
+
+@admin.register(DailyHours)
+class DailyHoursAdmin(admin.ModelAdmin):
+    list_display = ('id','day','user','project','minutes')
+    list_filter = ('project','user')
+    date_hierarchy = 'day'
+    readonly_fields = ('user','project','day','minutes')
+
 @admin.register(WorkPhoto)
 class WorkPhotoAdmin(admin.ModelAdmin):
     list_display = ('id','project','user','time_session','work_item','url','created_at')
@@ -48,7 +64,7 @@ class CostDocumentAdmin(admin.ModelAdmin):
 
 @admin.register(Vehicle)
 class VehicleAdmin(admin.ModelAdmin):
-    list_display = ('id','plate','name','vehicle_type','status','odometer_km','fuel_level_percent')
+    list_display = ('id','plate','name','vehicle_type','status','odometer_km','fuel_level_percent','tank_liters')
     list_filter = ('status','vehicle_type')
     search_fields = ('plate','name')
 
@@ -59,6 +75,15 @@ class VehicleSessionAdmin(admin.ModelAdmin):
     autocomplete_fields = ('vehicle','user','project')
     search_fields = ('id','vehicle__plate','vehicle__name','user__username','user__email','project__name','notes_out','notes_in','damages_report')
 
+@admin.register(VehicleReading)
+class VehicleReadingAdmin(admin.ModelAdmin):
+    # Append-only: le letture si aggiungono (manuali) ma non si modificano
+    list_display = ('id','vehicle','recorded_at','odometer_km','fuel_percent','kind','project')
+    list_filter = ('kind','vehicle')
+    autocomplete_fields = ('vehicle','session','project')
+    def has_change_permission(self, request, obj=None):
+        return obj is None
+
 @admin.register(UserFolder)
 class UserFolderAdmin(admin.ModelAdmin):
     list_display = ('id','owner','name','parent','created_at')
@@ -75,6 +100,35 @@ class UserFileAdmin(admin.ModelAdmin):
 
 @admin.register(BroadcastDoc)
 class BroadcastDocAdmin(admin.ModelAdmin):
-    list_display = ('id','title','created_by','created_at')
+    list_display = ('id','title','audience','requires_ack','sent_at','created_by','created_at')
+    list_filter = ('audience','requires_ack')
     search_fields = ('title','created_by__username','created_by__email')
-    autocomplete_fields = ('created_by',)
+    autocomplete_fields = ('created_by','project')
+    actions = ['send']
+
+    @admin.action(description="Consegna ai destinatari")
+    def send(self, request, queryset):
+        for doc in queryset:
+            try:
+                n = fan_out(doc.pk)
+            except BroadcastError as e:
+                self.message_user(request, f"{doc.title}: {e}", level='error')
+            else:
+                self.message_user(request, f"{doc.title}: consegnata a {n} destinatari")
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ('id','sha256','size','path','content_type','created_at')
+    search_fields = ('sha256','path')
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ('id','user','filename','size','received','stored_file','created_at')
+    list_filter = ('user',)
+    search_fields = ('filename','user__username')
+    autocomplete_fields = ('user',)
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    list_display = ('id','table','object_id','action','owner','created_at')
+    list_filter = ('table','action')
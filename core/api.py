@@ -0,0 +1,96 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .changes import TRACKED, PAGE_LIMIT, changes_since
+from .kpi import project_kpis
+from .fleet_board import fleet_board, board_summary
+from .models import Project, UserFile
+from .pagination import encode_cursor, decode_cursor
+from .serializers import SyncBatchSerializer, SYNC_SERIALIZERS
+from .sync import apply_batch, SyncConflict
+
+# ===== API SYNC OFFLINE =====
+class SyncBatchView(APIView):
+    """POST {"operations": [...]}: un round trip per tutta la coda del telefono.
+
+    200 con esito per operazione se il batch è stato applicato; 400 con gli errori per
+    operazione (e nulla scritto) se anche una sola non è valida; 409 su conflitto concorrente.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        batch = SyncBatchSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        try:
+            ok, results = apply_batch(request.user, batch.validated_data['operations'])
+        except SyncConflict:
+            return Response({'detail': "Conflitto con un'altra operazione in corso: riprova la sincronizzazione."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response({'applied': ok, 'results': results}, status=status.HTTP_200_OK if ok else status.HTTP_400_BAD_REQUEST)
+
+
+# ===== API DELTA SYNC =====
+def _changed_rows(table, ids, user):
+    qs = TRACKED[table].objects.filter(pk__in=ids)
+    if table == 'userfile':
+        qs = qs.filter(owner=user).select_related('folder')
+    elif table == 'broadcastdoc':
+        qs = qs.filter(pk__in=UserFile.objects.filter(owner=user).values('broadcast_id'))
+    return list(qs)
+
+class ChangesView(APIView):
+    """GET ?since=<token>: solo ciò che è cambiato dall'ultimo token (since vuoto = tutto).
+
+    Risposta: {token, more, reset, changes: {tabella: {upserts: [...], deletes: [id...]}}}.
+    Con more=true il client richiama subito con il nuovo token; con reset=true scarta
+    i dati locali (il token era anteriore all'ultima compattazione).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', PAGE_LIMIT)), PAGE_LIMIT)
+        except ValueError:
+            limit = PAGE_LIMIT
+        delta = changes_since(request.user, decode_cursor(request.query_params.get('since')), max(limit, 1))
+        changes = {}
+        for table, ids in delta['tables'].items():
+            rows = _changed_rows(table, ids['upsert'], request.user) if ids['upsert'] else []
+            found = {obj.pk for obj in rows}
+            changes[table] = {
+                'upserts': SYNC_SERIALIZERS[table](rows, many=True).data,
+                # Oggetti spariti dopo l'ultima riga del journal: per il client sono cancellati
+                'deletes': sorted(ids['delete'] | (ids['upsert'] - found)),
+            }
+        return Response({
+            'token': encode_cursor(delta['token']), 'more': delta['more'], 'reset': delta['reset'], 'changes': changes,
+        })
+
+
+# ===== API KPI PROGETTI =====
+class ProjectKpiView(APIView):
+    """GET ?status=active: KPI di tutti i progetti (avanzamento, ore, manodopera, spese, budget).
+
+    Una query per l'elenco più, al massimo, una per i KPI non ancora in cache.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        projects = Project.objects.only('id', 'name', 'status')
+        status_filter = request.query_params.get('status')
+        if status_filter in dict(Project.STATUS_CHOICES):
+            projects = projects.filter(status=status_filter)
+        projects = list(projects)
+        kpis = project_kpis([p.pk for p in projects])
+        return Response([{'id': p.pk, 'name': p.name, 'status': p.status, **kpis[p.pk]} for p in projects])
+
+# ===== API BACHECA FLOTTA =====
+class FleetBoardView(APIView):
+    """GET: tutti i mezzi con stato, sessione aperta (utente, progetto, ore fuori) e ultima lettura km/carburante."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rows = fleet_board()
+        return Response({'summary': board_summary(rows), 'vehicles': rows})
@@ -4,3 +4,6 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'core'
     verbose_name = 'Cantiere Smart'
+
+    def ready(self):
+        from . import signals  # noqa: F401
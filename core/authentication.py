@@ -0,0 +1,111 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# ===== JWT CON CACHE DEI CLAIMS IN PROCESSO =====
+# L'access token è verificato senza DB (firma + scadenza); dell'utente si tengono per
+# pochi minuti, in un LRU locale al processo, solo i campi immutabili per la richiesta
+# (id, anagrafica, ruolo, stato) e l'impronta della password per la revoca. A ogni
+# richiesta viene costruito un User nuovo (gli altri campi, es. password e last_login,
+# restano differiti e si leggono dal DB solo se usati): nulla è condiviso tra richieste
+# o thread. Il salvataggio o la cancellazione di un utente invalida la copia del processo.
+# Gli altri processi se ne accorgono allo scadere del TTL, oppure alla richiesta dopo se
+# JWT_USER_STAMP_CACHE indica una cache condivisa (Redis/Memcached) in cui tenere un timbro
+# per utente: in quel caso ogni hit costa un GET sulla cache condivisa (niente DB), che è il
+# prezzo della revoca immediata rispetto alla lettura per pk che la cache evita.
+EXCLUDED_FIELDS = ('password', 'last_login')
+STAMP_KEY = 'jwt_user_stamp:{}'
+
+def _snapshot(user):
+    names = tuple(f.attname for f in user._meta.concrete_fields if f.attname not in EXCLUDED_FIELDS)
+    return names, tuple(getattr(user, n) for n in names), get_md5_hash_password(user.password)
+
+def _stamps():
+    """Cache condivisa per i timbri di invalidazione, o None (solo TTL) se non configurata."""
+    alias = getattr(settings, 'JWT_USER_STAMP_CACHE', None)
+    return caches[alias] if alias else None
+
+def _stamp(user_id):
+    stamps = _stamps()
+    return stamps.get(STAMP_KEY.format(user_id)) if stamps is not None else None
+
+class ClaimsCache:
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'JWT_USER_CACHE_SECONDS', 300)
+        self.max_size = max_size or getattr(settings, 'JWT_USER_CACHE_SIZE', 1024)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """(User nuovo, impronta password) o None se assente, scaduto o invalidato (anche da un altro processo, col timbro condiviso)."""
+        user_id = str(user_id)
+        with self._lock:
+            hit = self._data.get(user_id)
+        if hit is None:
+            return None
+        expires, stamp, (names, values, fingerprint) = hit
+        if expires < time.monotonic() or stamp != _stamp(user_id):
+            self._drop(user_id, hit)
+            return None
+        with self._lock:
+            if user_id in self._data:
+                self._data.move_to_end(user_id)
+        model = get_user_model()
+        return model.from_db(model.objects.db, names, values), fingerprint
+
+    def put(self, user_id, user):
+        user_id = str(user_id)
+        entry = (time.monotonic() + self.ttl, _stamp(user_id), _snapshot(user))
+        with self._lock:
+            self._data[user_id] = entry
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def _drop(self, user_id, entry):
+        with self._lock:
+            if self._data.get(user_id) is entry:
+                del self._data[user_id]
+
+    def forget(self, user_id):
+        """Invalida l'utente in questo processo e, se c'è la cache dei timbri, in tutti gli altri."""
+        user_id = str(user_id)
+        stamps = _stamps()
+        if stamps is not None:
+            stamps.set(STAMP_KEY.format(user_id), uuid.uuid4().hex, self.ttl)
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+claims_cache = ClaimsCache()
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        hit = claims_cache.get(user_id) if user_id is not None else None
+        if hit is None:
+            # Primo accesso, TTL scaduto o utente modificato: lettura dal DB con i controlli standard
+            user = super().get_user(validated_token)
+            claims_cache.put(user_id, user)
+            return user
+        user, fingerprint = hit
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            # Disattivato: la copia non serve più, una riattivazione sarà letta dal DB
+            claims_cache.forget(user_id)
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != fingerprint:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
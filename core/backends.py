@@ -0,0 +1,64 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+# ===== LOGIN CON USERNAME O EMAIL =====
+# Una sola query: username esatto oppure LOWER(email), servita dall'indice funzionale
+# user_email_lower_idx (migrazione core 0016). I tentativi falliti sono contati in cache
+# per identificativo: oltre la soglia il backend rifiuta subito, senza DB né hashing.
+def _throttle():
+    return getattr(settings, 'LOGIN_THROTTLE', None)
+
+def _fail_key(identifier):
+    return 'login_fail:' + hashlib.sha1(identifier.strip().lower().encode()).hexdigest()
+
+def login_throttled(identifier):
+    conf = _throttle()
+    return bool(conf and identifier) and (cache.get(_fail_key(identifier)) or 0) >= conf['attempts']
+
+def note_login_failure(identifier):
+    conf = _throttle()
+    if not conf or not identifier:
+        return
+    key = _fail_key(identifier)
+    # add() apre la finestra solo al primo errore; incr() non la rinnova
+    if not cache.add(key, 1, conf['window']):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, conf['window'])
+
+def reset_login_failures(identifier):
+    if _throttle() and identifier:
+        cache.delete(_fail_key(identifier))
+
+class EmailOrUsernameBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        identifier = (username or kwargs.get(UserModel.USERNAME_FIELD) or '').strip()
+        if not identifier or password is None:
+            return None
+        if login_throttled(identifier):
+            # PermissionDenied interrompe anche gli eventuali backend successivi
+            raise PermissionDenied("Troppi tentativi di accesso falliti.")
+        match = Q(**{UserModel.USERNAME_FIELD: identifier})
+        if '@' in identifier:
+            match |= Q(email_ci=identifier.lower())
+        candidates = list(UserModel._default_manager.alias(email_ci=Lower('email')).filter(match)[:3])
+        # Lo username esatto vince; un'email condivisa da più utenti non identifica nessuno
+        exact = [u for u in candidates if u.get_username() == identifier]
+        user = exact[0] if exact else (candidates[0] if len(candidates) == 1 else None)
+        if user is None:
+            # Stesso costo di un login valido: non rivela se l'utente esiste
+            UserModel().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            reset_login_failures(identifier)
+            return user
+        note_login_failure(identifier)
+        return None
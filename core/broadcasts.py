@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .changes import record_owned_changes
+from .models import BroadcastDoc, UserFolder, UserFile, TimeSession
+from .tree import path_segment
+
+# ===== CIRCOLARI: CONSEGNA A TUTTI I DESTINATARI =====
+# La consegna crea una copia UserFile per destinatario nella sua cartella radice
+# (folder_name), a blocchi: per ogni blocco una query sulle cartelle esistenti, un
+# bulk_create delle mancanti, un bulk_create delle copie e il journal per il delta sync.
+# Ogni blocco è una transazione a sé (lock e insert brevi anche con migliaia di
+# destinatari); chi ha già la copia viene saltato, quindi un invio interrotto si riprende
+# ripetendolo e il vincolo uniq_broadcast_delivery_per_user esclude i doppioni.
+BATCH_SIZE = 1000
+
+class BroadcastError(Exception):
+    """Circolare non consegnabile (senza file o destinatari non definiti)."""
+
+def audience_user_ids(doc):
+    users = get_user_model().objects.filter(is_active=True)
+    if doc.audience == 'staff':
+        users = users.filter(Q(is_staff=True) | Q(is_superuser=True))
+    elif doc.audience == 'workers':
+        users = users.filter(is_staff=False, is_superuser=False)
+    elif doc.audience == 'group':
+        if doc.group_id is None:
+            raise BroadcastError("Seleziona il gruppo dei destinatari.")
+        users = users.filter(groups=doc.group_id)
+    elif doc.audience == 'project':
+        if doc.project_id is None:
+            raise BroadcastError("Seleziona il progetto dei destinatari.")
+        users = users.filter(pk__in=TimeSession.objects.filter(project_id=doc.project_id).values('user_id'))
+    return users.values_list('id', flat=True)
+
+def _root_folders(user_ids, name):
+    rows = (UserFolder.objects.filter(owner_id__in=user_ids, parent__isnull=True, name=name)
+            .values('owner_id').annotate(first=Min('id')).values_list('owner_id', 'first'))
+    return dict(rows)
+
+def fan_out(doc_id, batch_size=BATCH_SIZE):
+    """Consegna la circolare ai destinatari che non l'hanno ancora ricevuta. Restituisce il numero di copie create."""
+    doc = BroadcastDoc.objects.get(pk=doc_id)
+    if not doc.file_url:
+        raise BroadcastError("La circolare non ha un file da consegnare.")
+    delivered = set(UserFile.objects.filter(broadcast=doc).values_list('owner_id', flat=True))
+    pending = sorted(set(audience_user_ids(doc)) - delivered)
+    created = 0
+    for i in range(0, len(pending), batch_size):
+        with transaction.atomic():
+            # Il lock sulla circolare serializza invii concorrenti blocco per blocco
+            BroadcastDoc.objects.select_for_update().filter(pk=doc.pk).exists()
+            chunk = pending[i:i + batch_size]
+            done = set(UserFile.objects.filter(broadcast=doc, owner_id__in=chunk).values_list('owner_id', flat=True))
+            chunk = [uid for uid in chunk if uid not in done]
+            folders = _root_folders(chunk, doc.folder_name)
+            missing = [UserFolder(owner_id=uid, name=doc.folder_name) for uid in chunk if uid not in folders]
+            if missing:
+                # bulk_create non emette post_save: il path delle nuove radici è scritto qui
+                UserFolder.objects.bulk_create(missing)
+                for f in missing:
+                    f.path = path_segment(0, f.pk)
+                UserFolder.objects.bulk_update(missing, ['path'])
+                folders = _root_folders(chunk, doc.folder_name)
+            files = UserFile.objects.bulk_create([UserFile(
+                owner_id=uid, folder_id=folders[uid], title=doc.title, file_url=doc.file_url,
+                category='circular', requires_ack=doc.requires_ack, broadcast=doc,
+            ) for uid in chunk])
+            record_owned_changes('userfile', {f.pk: f.owner_id for f in files})
+            created += len(files)
+    doc.sent_at = timezone.now()
+    doc.save(update_fields=['sent_at'])
+    return created
+
+def ack_report(qs=None):
+    """Circolari annotate con consegne, letture e prese visione (una query per tutte)."""
+    return (qs if qs is not None else BroadcastDoc.objects.all()).annotate(
+        delivered=Count('deliveries'),
+        read=Count('deliveries', filter=Q(deliveries__read_at__isnull=False)),
+        acked=Count('deliveries', filter=Q(deliveries__ack_at__isnull=False)),
+    )
+
+def rates(doc):
+    """Percentuali di lettura e presa visione di una circolare annotata da ack_report."""
+    if not doc.delivered:
+        return {'read_pct': None, 'ack_pct': None}
+    return {'read_pct': round(doc.read * 100 / doc.delivered, 1),
+            'ack_pct': round(doc.acked * 100 / doc.delivered, 1) if doc.requires_ack else None}
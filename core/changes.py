@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import ChangeLog, Project, WorkItem, Vehicle, UserFile, BroadcastDoc
+
+# ===== JOURNAL MODIFICHE PER IL DELTA SYNC =====
+# Ogni salvataggio/cancellazione sostituisce la riga precedente dello stesso oggetto
+# (compattazione in scrittura): il journal contiene al più una riga per oggetto vivo più
+# le tombstone recenti, e "since=0" restituisce l'intero dataset. Le tombstone più vecchie
+# della retention sono eliminate da compact_changelog; chi ha un token precedente riceve
+# reset=true e riparte da zero.
+TRACKED = {
+    'project': Project,
+    'workitem': WorkItem,
+    'vehicle': Vehicle,
+    'userfile': UserFile,
+    'broadcastdoc': BroadcastDoc,
+}
+PAGE_LIMIT = 500
+# Un id è assegnato all'INSERT ma la riga diventa visibile al COMMIT: una transazione
+# ancora aperta può avere un id più basso di righe già lette. Il token consegnato non
+# supera le righe più vecchie di questo margine (più lungo di qualunque transazione che
+# scrive il journal); le righe più recenti sono rimandate al giro dopo (upsert idempotenti).
+TOKEN_LAG_SECONDS = 30
+
+def record_changes(table, ids, action='upsert', owner_id=None):
+    ids = set(ids)
+    if not ids:
+        return
+    with transaction.atomic():
+        ChangeLog.objects.filter(table=table, object_id__in=ids).exclude(action='purge').delete()
+        ChangeLog.objects.bulk_create([ChangeLog(table=table, object_id=pk, action=action, owner_id=owner_id) for pk in ids])
+
+def record_owned_changes(table, owners, action='upsert'):
+    """Come record_changes per oggetti di proprietari diversi (bulk_create): owners = {id: owner_id}."""
+    if not owners:
+        return
+    with transaction.atomic():
+        ChangeLog.objects.filter(table=table, object_id__in=list(owners)).exclude(action='purge').delete()
+        ChangeLog.objects.bulk_create([ChangeLog(table=table, object_id=pk, action=action, owner_id=owner_id)
+                                       for pk, owner_id in owners.items()], batch_size=1000)
+
+def record(instance, action='upsert'):
+    record_changes(instance._meta.model_name, [instance.pk], action, owner_id=getattr(instance, 'owner_id', None))
+
+def seed_changelog(models_by_table=TRACKED, changelog=ChangeLog):
+    """Una riga upsert per ogni oggetto esistente (migrazione iniziale, ricostruzione)."""
+    rows = []
+    for table, model in models_by_table.items():
+        owned = any(f.name == 'owner' for f in model._meta.fields)
+        for pk, owner_id in model.objects.values_list('pk', 'owner_id' if owned else 'pk'):
+            rows.append(changelog(table=table, object_id=pk, owner_id=owner_id if owned else None))
+    changelog.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+def purge_floor():
+    return ChangeLog.objects.filter(action='purge').values_list('object_id', flat=True).first() or 0
+
+def compact_changelog(retention_days=30):
+    """Elimina le tombstone più vecchie della retention e alza il floor dei token validi."""
+    cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+    old = ChangeLog.objects.filter(action='delete', created_at__lt=cutoff)
+    top = old.aggregate(m=Max('id'))['m']
+    if top is None:
+        return 0
+    with transaction.atomic():
+        removed, _ = old.filter(id__lte=top).delete()
+        floor = max(top, purge_floor())
+        ChangeLog.objects.filter(action='purge').delete()
+        ChangeLog.objects.create(table='', object_id=floor, action='purge')
+    return removed
+
+def safe_token():
+    """Id più alto sotto cui nessuna transazione può ancora aggiungere righe (vedi TOKEN_LAG_SECONDS).
+
+    Scorre l'indice primario dall'alto fino alla prima riga abbastanza vecchia: legge solo le righe recenti.
+    """
+    lag = getattr(settings, 'SYNC_TOKEN_LAG_SECONDS', TOKEN_LAG_SECONDS)
+    cutoff = timezone.now() - timezone.timedelta(seconds=lag)
+    return ChangeLog.objects.filter(created_at__lte=cutoff).order_by('-id').values_list('id', flat=True).first() or 0
+
+def visible_to(user):
+    """Righe del journal per l'utente: comuni, proprie, circolari solo ai destinatari (le tombstone a tutti, portano solo l'id)."""
+    received = UserFile.objects.filter(owner=user, broadcast__isnull=False).values('broadcast_id')
+    return (
+        (Q(owner__isnull=True) & ~Q(table='broadcastdoc'))
+        | Q(owner=user)
+        | Q(table='broadcastdoc', action='delete')
+        | Q(table='broadcastdoc', object_id__in=received)
+    )
+
+def changes_since(user, since=0, limit=PAGE_LIMIT):
+    """Modifiche visibili all'utente con id > since: una query sul journal più una per tabella toccata."""
+    since = since or 0
+    reset = bool(since) and since < purge_floor()
+    if reset:
+        since = 0
+    # Il tetto è letto prima del journal: righe inserite nel frattempo arrivano al giro dopo
+    high = ChangeLog.objects.aggregate(m=Max('id'))['m'] or 0
+    safe = safe_token()
+    entries = list(
+        ChangeLog.objects.filter(id__gt=since, id__lte=high)
+        .exclude(action='purge')
+        .filter(visible_to(user))
+        .values_list('id', 'table', 'object_id', 'action')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    # Il token non supera safe: un id più basso ancora in volo non viene mai saltato
+    token = max(min(entries[-1][0] if more else high, safe), since)
+    if token == since:
+        # Pagina tutta più recente del margine: nessun avanzamento possibile ora, si riprova al prossimo giro
+        more = False
+    grouped = {}
+    for _, table, pk, action in entries:
+        if table in TRACKED:
+            grouped.setdefault(table, {'upsert': set(), 'delete': set()})[action].add(pk)
+    return {'token': token, 'more': more, 'reset': reset, 'tables': grouped}
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+
+from .models import CostDocument
+
+# ===== TOTALI PERIODO SPESE =====
+GRANULARITY = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+CACHE_TTL = 60 * 60
+VERSION_KEY = 'cost_totals:version'
+
+def bump_cost_totals_version():
+    # Invalida tutti i totali in cache: la chiave versione entra in ogni chiave dei risultati
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+def _version():
+    v = cache.get(VERSION_KEY)
+    if v is None:
+        v = 1
+        cache.add(VERSION_KEY, v, None)
+    return v
+
+def _rollup(rows, key, label=None):
+    acc = defaultdict(lambda: {'total': Decimal('0'), 'count': 0})
+    labels = {}
+    for r in rows:
+        k = r[key]
+        acc[k]['total'] += r['total']
+        acc[k]['count'] += r['n']
+        if label:
+            labels[k] = r[label]
+    out = [{'key': k, 'label': labels.get(k, k), **v} for k, v in acc.items()]
+    return sorted(out, key=lambda x: -x['total'])
+
+def compute_cost_totals(start, end, granularity='month', project_id=None, status=None):
+    """Totali spese nel periodo [start, end) raggruppati per tutte le dimensioni con una sola query GROUP BY.
+
+    Le righe raggruppate (poche) vengono poi ripartite in Python per progetto, lavorazione, tipo,
+    stato, IVA e periodo.
+    """
+    trunc = GRANULARITY.get(granularity, TruncMonth)
+    qs = CostDocument.objects.filter(created_at__gte=start, created_at__lt=end)
+    if project_id:
+        qs = qs.filter(project_id=project_id)
+    if status:
+        qs = qs.filter(status=status)
+    rows = list(
+        qs.annotate(period=trunc('created_at'))
+        .values('project_id', 'project__name', 'work_item_id', 'work_item__name', 'doc_type', 'status', 'with_vat', 'period')
+        .annotate(total=Sum('amount_eur'), n=Count('id'))
+        .order_by()
+    )
+    doc_types = dict(CostDocument.DOC_TYPES)
+    statuses = dict(CostDocument.STATUS)
+    for r in rows:
+        r['doc_type_label'] = doc_types.get(r['doc_type'], r['doc_type'])
+        r['status_label'] = statuses.get(r['status'], r['status'])
+        r['vat_label'] = 'Con IVA' if r['with_vat'] else 'Senza IVA'
+        r['work_item__name'] = r['work_item__name'] or '(nessuna)'
+    return {
+        'total': sum((r['total'] for r in rows), Decimal('0')),
+        'count': sum(r['n'] for r in rows),
+        'by_project': _rollup(rows, 'project_id', 'project__name'),
+        'by_work_item': _rollup(rows, 'work_item_id', 'work_item__name'),
+        'by_doc_type': _rollup(rows, 'doc_type', 'doc_type_label'),
+        'by_status': _rollup(rows, 'status', 'status_label'),
+        'by_vat': _rollup(rows, 'with_vat', 'vat_label'),
+        'by_period': sorted(_rollup(rows, 'period'), key=lambda x: x['key']),
+    }
+
+def cost_totals(start, end, granularity='month', project_id=None, status=None):
+    """Come compute_cost_totals, ma in cache fino alla prossima modifica di una spesa."""
+    key = f"cost_totals:{_version()}:{start.isoformat()}:{end.isoformat()}:{granularity}:{project_id or ''}:{status or ''}"
+    data = cache.get(key)
+    if data is None:
+        data = compute_cost_totals(start, end, granularity, project_id, status)
+        cache.set(key, data, CACHE_TTL)
+    return data
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Vehicle, VehicleSession
+
+# ===== BACHECA FLOTTA (disponibilità e sessioni aperte) =====
+# Ogni mezzo è annotato con la sessione aperta (utente, progetto, ritiro) e con l'ultima
+# lettura km/carburante in un solo SELECT: una subquery correlata per colonna, che usa
+# l'indice parziale unico delle sessioni aperte e (vehicle, -id). Il risultato resta in
+# cache pochi secondi; ritiri, riconsegne e modifiche ai mezzi alzano la versione.
+CACHE_TTL = 30
+VERSION_KEY = 'fleet_board:version'
+ROW_FIELDS = (
+    'id', 'plate', 'name', 'vehicle_type', 'status', 'photo_url',
+    'open_session_id', 'holder_id', 'holder', 'project_id', 'project_name', 'out_since', 'last_km', 'last_fuel',
+)
+
+def bump_fleet_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+def _version():
+    v = cache.get(VERSION_KEY)
+    if v is None:
+        v = 1
+        cache.add(VERSION_KEY, v, None)
+    return v
+
+def board_queryset(qs=None):
+    open_session = VehicleSession.objects.filter(vehicle=OuterRef('pk'), end_time__isnull=True)
+    latest = VehicleSession.objects.filter(vehicle=OuterRef('pk')).order_by('-id')
+    def col(sq, field):
+        return Subquery(sq.values(field)[:1])
+    return (qs if qs is not None else Vehicle.objects.all()).annotate(
+        open_session_id=col(open_session, 'id'),
+        holder_id=col(open_session, 'user_id'),
+        holder=col(open_session, 'user__username'),
+        project_id=col(open_session, 'project_id'),
+        project_name=col(open_session, 'project__name'),
+        out_since=col(open_session, 'start_time'),
+        # Ultima lettura: fine dell'ultima sessione, o inizio se ancora aperta; altrimenti il dato del mezzo
+        last_km=Coalesce(col(latest, 'end_odometer_km'), col(latest, 'start_odometer_km'), F('odometer_km')),
+        last_fuel=Coalesce(col(latest, 'end_fuel_percent'), col(latest, 'start_fuel_percent'), F('fuel_level_percent')),
+    )
+
+def fleet_board(now=None):
+    """Righe della bacheca (dict) dalla cache o da un'unica query; hours_out è calcolato al momento."""
+    key = f"fleet_board:{_version()}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(board_queryset().values(*ROW_FIELDS))
+        cache.set(key, rows, CACHE_TTL)
+    now = now or timezone.now()
+    labels = dict(Vehicle.STATUS)
+    out = []
+    for r in rows:
+        since = r['out_since']
+        out.append({**r, 'status_label': labels.get(r['status'], r['status']),
+                    'hours_out': round((now - since).total_seconds() / 3600, 1) if since else None})
+    return out
+
+def board_summary(rows):
+    counts = {code: 0 for code, _ in Vehicle.STATUS}
+    for r in rows:
+        counts[r['status']] = counts.get(r['status'], 0) + 1
+    return [{'status': code, 'label': label, 'count': counts[code]} for code, label in Vehicle.STATUS]
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import UserFolder, UserFile
+from .tree import path_ids, compute_paths
+
+# ===== CARTELLE HR (albero con path e badge) =====
+# Le cartelle hanno un materialized path come le lavorazioni: antenati e discendenti sono
+# prefissi del path (indice owner+path con pattern ops). I conteggi dei file, dei non letti e delle prese
+# visione in attesa includono le sottocartelle e sono subquery correlate dello stesso
+# SELECT che carica le cartelle: l'intero albero di un utente costa una query.
+
+def _count(qs):
+    return Coalesce(Subquery(qs.annotate(n=Count('id')).values('n')), Value(0), output_field=IntegerField())
+
+def with_counts(qs):
+    subtree = UserFile.objects.filter(
+        owner=OuterRef('owner'), folder__owner=OuterRef('owner'),
+        folder__path__startswith=OuterRef('path'),
+    ).order_by().values('owner')
+    children = UserFolder.objects.filter(parent=OuterRef('pk')).order_by().values('parent')
+    return qs.annotate(
+        n_files=_count(subtree),
+        n_unread=_count(subtree.filter(read_at__isnull=True)),
+        n_pending_ack=_count(subtree.filter(requires_ack=True, ack_at__isnull=True)),
+        n_children=_count(children),
+    )
+
+def sort_tree(folders):
+    """Pre-order con i fratelli per nome (il path ordina per id)."""
+    by_parent = {}
+    for f in folders:
+        by_parent.setdefault(f.parent_id, []).append(f)
+    for kids in by_parent.values():
+        kids.sort(key=lambda f: f.name.lower())
+    known = {f.pk for f in folders}
+    roots = [f for pid, kids in by_parent.items() if pid not in known for f in kids]
+    roots.sort(key=lambda f: f.name.lower())
+    out, stack = [], roots[::-1]
+    while stack:
+        f = stack.pop()
+        out.append(f)
+        stack.extend(by_parent.get(f.pk, [])[::-1])
+    return out
+
+def folder_tree(user):
+    """Tutte le cartelle dell'utente in pre-order, con depth e badge (una query)."""
+    return sort_tree(list(with_counts(UserFolder.objects.filter(owner=user).order_by())))
+
+def breadcrumbs(folder):
+    """Antenati dalla radice (una query, dagli id nel path)."""
+    return list(UserFolder.objects.filter(pk__in=path_ids(folder.path)[:-1], owner_id=folder.owner_id).order_by('depth'))
+
+def subfolders(folder):
+    return sort_tree(list(with_counts(UserFolder.objects.filter(parent=folder).order_by())))
+
+def rebuild_folder_paths():
+    """Ricostruisce path/depth di tutte le cartelle partendo dai parent."""
+    rows = ((pk, parent_id, 0) for pk, parent_id in UserFolder.objects.values_list('id', 'parent_id'))
+    changed = [UserFolder(pk=pk, path=path, depth=depth) for pk, path, depth in compute_paths(rows)]
+    with transaction.atomic():
+        UserFolder.objects.bulk_update(changed, ['path', 'depth'], batch_size=1000)
+    return len(changed)
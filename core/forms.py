@@ -1,5 +1,5 @@
 from django import forms
-from .models import WorkItem, TimeSessionAllocation, CostDocument, Project
+from .models import WorkItem, TimeSessionAllocation, CostDocument, Project, BroadcastDoc
 
 class WorkItemForm(forms.ModelForm):
     class Meta:
@@ -18,7 +18,16 @@ class WorkItemForm(forms.ModelForm):
             raise forms.ValidationError("Il progress deve essere tra 0 e 100.")
         return v
 
-class TimeStartForm(forms.Form):
+# Posizione rilevata dal browser (campi nascosti, compilati dallo script in base.html)
+class GeoForm(forms.Form):
+    lat = forms.FloatField(required=False, min_value=-90, max_value=90, widget=forms.HiddenInput)
+    lng = forms.FloatField(required=False, min_value=-180, max_value=180, widget=forms.HiddenInput)
+    accuracy = forms.FloatField(required=False, min_value=0, widget=forms.HiddenInput)
+    def location(self):
+        d = self.cleaned_data
+        return d.get('lat'), d.get('lng'), d.get('accuracy')
+
+class TimeStartForm(GeoForm):
     project = forms.ModelChoiceField(queryset=Project.objects.all())
     note = forms.CharField(widget=forms.Textarea(attrs={'rows':3}), required=False)
 
@@ -33,13 +42,13 @@ class AllocationForm(forms.ModelForm):
             raise forms.ValidationError("Inserisci almeno minuti o percentuale.")
         return cleaned
 
-class VehicleCheckoutForm(forms.Form):
+class VehicleCheckoutForm(GeoForm):
     project = forms.ModelChoiceField(queryset=Project.objects.all(), required=False)
     start_odometer_km = forms.IntegerField(min_value=0)
     start_fuel_percent = forms.IntegerField(min_value=0, max_value=100)
     notes_out = forms.CharField(widget=forms.Textarea(attrs={'rows':2}), required=False)
 
-class VehicleCheckinForm(forms.Form):
+class VehicleCheckinForm(GeoForm):
     end_odometer_km = forms.IntegerField(min_value=0)
     end_fuel_percent = forms.IntegerField(min_value=0, max_value=100)
     notes_in = forms.CharField(widget=forms.Textarea(attrs={'rows':2}), required=False)
@@ -51,3 +60,16 @@ class CostForm(forms.ModelForm):
         model = CostDocument
         fields = ['project','work_item','doc_type','amount_eur','with_vat','doc_url','note']
         widgets = {'note': forms.Textarea(attrs={'rows':2})}
+
+class BroadcastForm(forms.ModelForm):
+    class Meta:
+        model = BroadcastDoc
+        fields = ['title','body','file_url','requires_ack','audience','group','project','folder_name']
+        widgets = {'body': forms.Textarea(attrs={'rows':3})}
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('audience') == 'group' and not cleaned.get('group'):
+            self.add_error('group', "Seleziona il gruppo dei destinatari.")
+        if cleaned.get('audience') == 'project' and not cleaned.get('project'):
+            self.add_error('project', "Seleziona il progetto dei destinatari.")
+        return cleaned
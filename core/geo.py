@@ -0,0 +1,120 @@
+import math
+
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Least
+
+from .models import TimeSession, VehicleSession
+
+# ===== POSIZIONE GPS, GEOHASH E GEOFENCE DI CANTIERE =====
+# Ogni evento (timbratura, ritiro/riconsegna mezzo) salva lat/lng, accuratezza e geohash.
+# Il controllo geofence dell'evento è una distanza (O(1)); le query batch restringono i
+# candidati per prefisso di geohash (range sull'indice) e rifiniscono con una distanza
+# equirettangolare calcolata in SQL (solo aritmetica: vale su SQLite e Postgres).
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9  # celle ~5 m
+EARTH_RADIUS_M = 6371000
+M_PER_DEG = 111320
+# L'accuratezza dichiarata dal telefono allarga il raggio, fino a questo limite
+MAX_ACCURACY_M = 150
+
+def geohash_encode(lat, lng, precision=PRECISION):
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            ch = ch * 2 + (lng >= mid)
+            lng_lo, lng_hi = (mid, lng_hi) if lng >= mid else (lng_lo, mid)
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            ch = ch * 2 + (lat >= mid)
+            lat_lo, lat_hi = (mid, lat_hi) if lat >= mid else (lat_lo, mid)
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(BASE32[ch])
+            bits, ch = 0, 0
+    return ''.join(out)
+
+def cell_size_deg(precision):
+    """(altezza, larghezza) in gradi di una cella geohash."""
+    bits = precision * 5
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+def distance_m(lat1, lng1, lat2, lng2):
+    """Distanza haversine in metri."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def covering_cells(lat, lng, radius_m):
+    """Prefissi geohash (al più 9) che coprono il cerchio: la cella più fine non più piccola del raggio e le vicine."""
+    k = max(math.cos(math.radians(lat)), 0.01)
+    precision = 1
+    for p in range(PRECISION, 0, -1):
+        h, w = cell_size_deg(p)
+        if h * M_PER_DEG >= radius_m and w * M_PER_DEG * k >= radius_m:
+            precision = p
+            break
+    h, w = cell_size_deg(precision)
+    return sorted({geohash_encode(max(min(lat + dy, 90), -90), ((lng + dx + 180) % 360) - 180, precision)
+                   for dy in (-h, 0, h) for dx in (-w, 0, w)})
+
+def _distance2_expr(prefix, lat, lng):
+    # Metri² con approssimazione equirettangolare (errore trascurabile entro qualche km)
+    k = math.cos(math.radians(lat))
+    dy = (F(f'{prefix}lat') - Value(lat)) * Value(M_PER_DEG)
+    dx = (F(f'{prefix}lng') - Value(lng)) * Value(M_PER_DEG * k)
+    return dy * dy + dx * dx
+
+def within(qs, prefix, lat, lng, radius_m, with_accuracy=False):
+    """Righe con posizione <prefix>lat/lng entro radius_m (più l'accuratezza dichiarata, se richiesto)."""
+    slack = MAX_ACCURACY_M if with_accuracy else 0
+    # Prefisso di cella (LIKE 'cella%'): corretto con qualunque collation, indice varchar_pattern_ops su PostgreSQL
+    cells = Q()
+    for cell in covering_cells(lat, lng, radius_m + slack):
+        cells |= Q(**{f'{prefix}geohash__startswith': cell})
+    limit = Value(radius_m)
+    if with_accuracy:
+        limit = limit + Least(Coalesce(F(f'{prefix}accuracy_m'), Value(0)), Value(MAX_ACCURACY_M))
+    # Senza ordinamento di default: con ORDER BY id SQLite preferirebbe scandire la tabella
+    return qs.order_by().filter(cells).alias(_d2=_distance2_expr(prefix, lat, lng), _limit=limit).filter(_d2__lte=F('_limit') * F('_limit'))
+
+def in_geofence(project, lat, lng, accuracy_m=None):
+    """True/False rispetto all'area del cantiere; None se mancano posizione o area."""
+    if project is None or lat is None or lng is None or project.site_lat is None or project.site_lng is None:
+        return None
+    slack = min(accuracy_m or 0, MAX_ACCURACY_M)
+    return distance_m(lat, lng, project.site_lat, project.site_lng) <= project.site_radius_m + slack
+
+def location_fields(prefix, project, lat, lng, accuracy_m=None):
+    """Valori dei campi <prefix>lat/lng/accuracy_m/geohash/in_geofence per un evento."""
+    if lat is None or lng is None:
+        return {}
+    return {
+        f'{prefix}lat': lat, f'{prefix}lng': lng,
+        f'{prefix}accuracy_m': round(accuracy_m) if accuracy_m is not None else None,
+        f'{prefix}geohash': geohash_encode(lat, lng),
+        f'{prefix}in_geofence': in_geofence(project, lat, lng, accuracy_m),
+    }
+
+def refresh_geofence_flags(project):
+    """Ricalcola i flag geofence di timbrature e sessioni mezzo del progetto (area cambiata): poche UPDATE via indice."""
+    targets = [(TimeSession, 'start_'), (VehicleSession, 'start_'), (VehicleSession, 'end_')]
+    for model, prefix in targets:
+        base = model.objects.filter(project=project, **{f'{prefix}lat__isnull': False})
+        if project.site_lat is None or project.site_lng is None:
+            base.update(**{f'{prefix}in_geofence': None})
+            continue
+        inside = within(base, prefix, project.site_lat, project.site_lng, project.site_radius_m, with_accuracy=True)
+        model.objects.filter(pk__in=inside.values('pk')).update(**{f'{prefix}in_geofence': True})
+        base.exclude(pk__in=inside.values('pk')).update(**{f'{prefix}in_geofence': False})
+
+def outside_site(start, end):
+    """Timbrature e sessioni mezzo del periodo registrate fuori dall'area di cantiere (indici parziali)."""
+    sessions = TimeSession.objects.filter(start_in_geofence=False, start_time__gte=start, start_time__lt=end)
+    vehicle_sessions = VehicleSession.objects.filter(
+        Q(start_in_geofence=False) | Q(end_in_geofence=False), start_time__gte=start, start_time__lt=end,
+    )
+    return sessions, vehicle_sessions
@@ -0,0 +1,106 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+
+# ===== DERIVATI IMMAGINE (miniature) =====
+# I derivati stanno in MEDIA_ROOT/derived/<sha256 del file sorgente>/<taglia>.jpg:
+# lo stesso contenuto caricato due volte produce un solo set di miniature.
+SIZES = {'xs': 160, 'sm': 320, 'md': 800, 'lg': 1600}
+DERIVED_DIR = 'derived'
+JPEG_QUALITY = 82
+
+_pool = None
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'IMAGE_WORKERS', 2))
+    return _pool
+
+def local_media_path(url):
+    """Percorso su disco per URL sotto MEDIA_URL (None per immagini remote o fuori da MEDIA_ROOT)."""
+    path = unquote(urlparse(url or '').path)
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    # Normalizzato e risolto (anche i symlink): un URL con '..' non esce da MEDIA_ROOT
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    full = os.path.realpath(os.path.join(root, path[len(settings.MEDIA_URL):]))
+    return full if full.startswith(root + os.sep) else None
+
+def file_sha256(path, chunk=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _derived_root():
+    return os.path.join(settings.MEDIA_ROOT, DERIVED_DIR)
+
+def build_derivatives(src_path, derived_root, sizes=SIZES):
+    """Worker: genera tutte le taglie (orientamento EXIF applicato) e restituisce l'hash del sorgente."""
+    from PIL import Image, ImageOps
+    digest = file_sha256(src_path)
+    out_dir = os.path.join(derived_root, digest)
+    missing = {name: px for name, px in sizes.items() if not os.path.exists(os.path.join(out_dir, f"{name}.jpg"))}
+    if not missing:
+        return digest
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im).convert('RGB')
+        # Dalla più grande alla più piccola: ogni riduzione parte dalla precedente
+        for name, px in sorted(missing.items(), key=lambda kv: -kv[1]):
+            im.thumbnail((px, px), Image.LANCZOS)
+            tmp = os.path.join(out_dir, f".{name}.jpg.tmp")
+            im.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, os.path.join(out_dir, f"{name}.jpg"))
+    return digest
+
+def _stat_key(path):
+    st = os.stat(path)
+    return f"img_digest:{hashlib.sha1(f'{path}:{st.st_size}:{st.st_mtime_ns}'.encode()).hexdigest()}"
+
+def _remember(key):
+    def done(future):
+        if future.exception() is None:
+            cache.set(key, future.result(), None)
+    return done
+
+def schedule(src_path):
+    """Accoda la generazione dei derivati nel process pool (non blocca la richiesta)."""
+    key = _stat_key(src_path)
+    if cache.add(key + ':queued', 1, 300):
+        _executor().submit(build_derivatives, src_path, _derived_root()).add_done_callback(_remember(key))
+
+def derivative_path(src_path, size):
+    """Percorso del derivato se già generato; altrimenti None (e generazione accodata)."""
+    if not src_path or size not in SIZES or not os.path.exists(src_path):
+        return None
+    digest = cache.get(_stat_key(src_path))
+    if digest:
+        path = os.path.join(_derived_root(), digest, f"{size}.jpg")
+        if os.path.exists(path):
+            return path
+    schedule(src_path)
+    return None
+
+def thumbnail_url(url, size='sm'):
+    """URL della miniatura per un'immagine locale; per immagini remote o non ancora pronte l'originale."""
+    path = derivative_path(local_media_path(url), size)
+    if path is None:
+        return url
+    return settings.MEDIA_URL + os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+def build_all(paths):
+    """Generazione sincrona in parallelo (comando di manutenzione): {path: digest}."""
+    paths = [p for p in dict.fromkeys(paths) if p and os.path.exists(p)]
+    root = _derived_root()
+    out = {}
+    for path, digest in zip(paths, _executor().map(build_derivatives, paths, [root] * len(paths), chunksize=8)):
+        cache.set(_stat_key(path), digest, None)
+        out[path] = digest
+    return out
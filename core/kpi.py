@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .labor import project_labor_costs
+from .models import Project, DailyHours, CostDocument
+
+# ===== KPI PROGETTO (avanzamento, ore, manodopera, spese, budget) =====
+# I KPI di N progetti escono da un SELECT con subquery correlate più una query GROUP BY
+# per la manodopera (core.labor.project_labor_costs: tariffa snapshot delle timbrature,
+# come la schermata costi manodopera). Il risultato è in cache per progetto: i segnali
+# (timbrature, spese, lavorazioni, progetto) cancellano la chiave del singolo progetto.
+CACHE_TTL = 60 * 60
+VERSION_KEY = 'project_kpi:version'
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+CENT = Decimal('0.01')
+
+def bump_kpi_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+def _version():
+    v = cache.get(VERSION_KEY)
+    if v is None:
+        v = 1
+        cache.add(VERSION_KEY, v, None)
+    return v
+
+def _key(version, project_id):
+    return f"project_kpi:{version}:{project_id}"
+
+def invalidate_project_kpis(project_ids):
+    ids = {pk for pk in project_ids if pk}
+    if ids:
+        version = _version()
+        cache.delete_many([_key(version, pk) for pk in ids])
+
+def _sum(qs, expr, output_field):
+    return Coalesce(Subquery(qs.annotate(s=Sum(expr, output_field=output_field)).values('s')), Value(0), output_field=output_field)
+
+def kpi_queryset(qs=None):
+    """Progetti annotati con ore e spese (una sola query, qualunque sia il numero di progetti)."""
+    hours = DailyHours.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    costs = CostDocument.objects.filter(project=OuterRef('pk')).order_by().values('project')
+    return (qs if qs is not None else Project.objects.all()).annotate(
+        kpi_minutes=_sum(hours, 'minutes', IntegerField()),
+        kpi_approved_eur=_sum(costs.filter(status='approved'), 'amount_eur', MONEY),
+        kpi_pending_eur=_sum(costs.filter(status='pending'), 'amount_eur', MONEY),
+    )
+
+def _kpi(row, labor):
+    approved = Decimal(row['kpi_approved_eur']).quantize(CENT)
+    spent = labor + approved
+    budget = row['budget_eur'] or Decimal('0')
+    return {
+        'progress_pct': row['progress_pct'],
+        'hours': round(row['kpi_minutes'] / 60, 1),
+        'labor_eur': labor,
+        'approved_eur': approved,
+        'pending_eur': Decimal(row['kpi_pending_eur']).quantize(CENT),
+        'spent_eur': spent,
+        'budget_eur': budget,
+        'budget_burn_pct': (spent * 100 / budget).quantize(CENT) if budget else None,
+        'over_budget': bool(budget) and spent > budget,
+    }
+
+def project_kpis(project_ids):
+    """{project_id: kpi} dalla cache; i progetti mancanti sono calcolati insieme con due query."""
+    ids = list(dict.fromkeys(project_ids))
+    version = _version()
+    cached = cache.get_many([_key(version, pk) for pk in ids])
+    out = {pk: cached[_key(version, pk)] for pk in ids if _key(version, pk) in cached}
+    missing = [pk for pk in ids if pk not in out]
+    if missing:
+        rows = kpi_queryset(Project.objects.filter(pk__in=missing)).values(
+            'id', 'budget_eur', 'progress_pct', 'kpi_minutes', 'kpi_approved_eur', 'kpi_pending_eur',
+        )
+        labor = project_labor_costs(missing)
+        fresh = {r['id']: _kpi(r, labor.get(r['id'], Decimal('0.00'))) for r in rows}
+        cache.set_many({_key(version, pk): kpi for pk, kpi in fresh.items()}, CACHE_TTL)
+        out.update(fresh)
+    return out
+
+def attach_kpis(projects):
+    projects = list(projects)
+    kpis = project_kpis([p.pk for p in projects])
+    for p in projects:
+        p.kpi = kpis.get(p.pk)
+    return projects
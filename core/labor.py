@@ -0,0 +1,153 @@
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F, Sum, DecimalField, DurationField, ExpressionWrapper
+from django.db.models.functions import TruncMonth
+
+from .cost_totals import GRANULARITY
+from .models import HourlyRate, TimeSession, TimeSessionAllocation
+
+# ===== TARIFFE ORARIE (storico in memoria, ricerca per bisezione) =====
+# Lo storico di tutti gli utenti sta in memoria come date/tariffe ordinate per utente;
+# la chiave versione in cache (bump ad ogni modifica) dice ai processi quando ricaricarlo.
+RATES_VERSION_KEY = 'hourly_rates:version'
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+
+_table = {'version': None, 'rates': {}}
+
+def bump_rates_version():
+    try:
+        cache.incr(RATES_VERSION_KEY)
+    except ValueError:
+        cache.set(RATES_VERSION_KEY, 1, None)
+
+def _version():
+    v = cache.get(RATES_VERSION_KEY)
+    if v is None:
+        v = 1
+        cache.add(RATES_VERSION_KEY, v, None)
+    return v
+
+def _rates():
+    v = _version()
+    if _table['version'] != v:
+        rates = defaultdict(lambda: ([], []))
+        for user_id, valid_from, rate in HourlyRate.objects.order_by('user_id', 'valid_from').values_list('user_id', 'valid_from', 'rate_eur'):
+            rates[user_id][0].append(valid_from)
+            rates[user_id][1].append(rate)
+        _table.update(version=v, rates=dict(rates))
+    return _table['rates']
+
+def rate_for(user_id, day):
+    """Tariffa valida per l'utente nel giorno indicato (0 se non ancora definita)."""
+    dates, rates = _rates().get(user_id, ((), ()))
+    i = bisect_right(dates, day) - 1
+    return rates[i] if i >= 0 else ZERO
+
+# ===== COSTO MANODOPERA =====
+# Fonte unica del costo: durata delle timbrature chiuse × tariffa snapshot salvata all'avvio
+# (la stessa per questa schermata e per i KPI progetto, core.kpi).
+def _duration():
+    return ExpressionWrapper(F('time_session__end_time') - F('time_session__start_time'), output_field=DurationField())
+
+def _minutes(td):
+    return Decimal(td.total_seconds()) / 60 if td else ZERO
+
+def _add(acc, key, label, minutes, cost):
+    row = acc.setdefault(key, {'key': key, 'label': label, 'minutes': ZERO, 'cost': ZERO})
+    row['minutes'] += minutes
+    row['cost'] += cost
+    return row
+
+def _finish(rows):
+    for r in rows:
+        r['minutes'] = int(r['minutes'])
+        r['cost'] = r['cost'].quantize(CENT)
+    return sorted(rows, key=lambda r: -r['cost'])
+
+def project_labor_costs(project_ids):
+    """{project_id: costo manodopera} di tutte le timbrature chiuse, con una query GROUP BY
+    (progetto, tariffa): stessi importi di compute_labor_costs(...)['by_project'] sull'intero periodo."""
+    rows = (
+        TimeSession.objects.filter(completed=True, end_time__isnull=False, project_id__in=list(project_ids))
+        .values('project_id', 'hourly_rate_eur_snapshot')
+        .annotate(duration=Sum(ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())))
+        .order_by()
+    )
+    out = defaultdict(lambda: ZERO)
+    for r in rows:
+        out[r['project_id']] += _minutes(r['duration']) * r['hourly_rate_eur_snapshot'] / 60
+    return {pid: cost.quantize(CENT) for pid, cost in out.items()}
+
+def compute_labor_costs(start, end, granularity='month', project_id=None):
+    """Costo manodopera delle timbrature chiuse iniziate in [start, end), con tre query GROUP BY.
+
+    - allocazioni a minuti: SUM(minuti × tariffa) per lavorazione e periodo;
+    - allocazioni in percentuale: SUM(durata) per lavorazione, periodo, percentuale e tariffa;
+    - timbrature: SUM(durata) per progetto, periodo e tariffa (costo lavorato, anche non allocato).
+    La tariffa è lo snapshot salvato all'avvio della timbratura.
+    """
+    trunc = GRANULARITY.get(granularity, TruncMonth)
+    sessions = TimeSession.objects.filter(completed=True, end_time__isnull=False, start_time__gte=start, start_time__lt=end)
+    allocs = TimeSessionAllocation.objects.filter(
+        time_session__completed=True, time_session__end_time__isnull=False,
+        time_session__start_time__gte=start, time_session__start_time__lt=end,
+    )
+    if project_id:
+        sessions = sessions.filter(project_id=project_id)
+        allocs = allocs.filter(time_session__project_id=project_id)
+    allocs = allocs.annotate(period=trunc('time_session__start_time'))
+
+    by_work_item, allocated_by_project = {}, defaultdict(lambda: ZERO)
+    by_minutes = (
+        allocs.filter(minutes_allocated__isnull=False)
+        .values('work_item_id', 'work_item__name', 'time_session__project_id', 'period')
+        .annotate(
+            minutes=Sum('minutes_allocated'),
+            amount=Sum(F('minutes_allocated') * F('time_session__hourly_rate_eur_snapshot'), output_field=DecimalField()),
+        )
+        .order_by()
+    )
+    for r in by_minutes:
+        cost = Decimal(r['amount'] or 0) / 60
+        _add(by_work_item, r['work_item_id'], r['work_item__name'], Decimal(r['minutes'] or 0), cost)['project_id'] = r['time_session__project_id']
+        allocated_by_project[r['time_session__project_id']] += cost
+    by_percent = (
+        allocs.filter(minutes_allocated__isnull=True, percent_allocated__isnull=False)
+        .values('work_item_id', 'work_item__name', 'time_session__project_id', 'period', 'percent_allocated', 'time_session__hourly_rate_eur_snapshot')
+        .annotate(duration=Sum(_duration()))
+        .order_by()
+    )
+    for r in by_percent:
+        minutes = TimeSessionAllocation.resolve_minutes(_minutes(r['duration']), percent=r['percent_allocated'])
+        cost = minutes * r['time_session__hourly_rate_eur_snapshot'] / 60
+        _add(by_work_item, r['work_item_id'], r['work_item__name'], minutes, cost)['project_id'] = r['time_session__project_id']
+        allocated_by_project[r['time_session__project_id']] += cost
+
+    by_project, by_period = {}, {}
+    worked = (
+        sessions.annotate(period=trunc('start_time'))
+        .values('project_id', 'project__name', 'period', 'hourly_rate_eur_snapshot')
+        .annotate(duration=Sum(ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())))
+        .order_by()
+    )
+    for r in worked:
+        minutes = _minutes(r['duration'])
+        cost = minutes * r['hourly_rate_eur_snapshot'] / 60
+        _add(by_project, r['project_id'], r['project__name'], minutes, cost)
+        _add(by_period, r['period'], r['period'], minutes, cost)
+    for pid, row in by_project.items():
+        row['allocated_cost'] = allocated_by_project[pid].quantize(CENT)
+        row['unallocated_cost'] = max(row['cost'] - allocated_by_project[pid], ZERO).quantize(CENT)
+
+    projects = _finish(list(by_project.values()))
+    return {
+        'total': sum((r['cost'] for r in projects), ZERO),
+        'minutes': sum(r['minutes'] for r in projects),
+        'by_project': projects,
+        'by_work_item': _finish(list(by_work_item.values())),
+        'by_period': sorted(_finish(list(by_period.values())), key=lambda r: r['key']),
+    }
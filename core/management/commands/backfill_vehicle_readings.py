@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from core.models import VehicleSession, VehicleReading
+from core.telemetry import session_reading, BATCH
+
+class Command(BaseCommand):
+    help = "Crea le letture km/carburante mancanti dalle sessioni mezzo esistenti (ritiro e riconsegna)"
+
+    def handle(self, *args, **options):
+        def has(kind):
+            return Exists(VehicleReading.objects.filter(session=OuterRef('pk'), kind=kind))
+        qs = VehicleSession.objects.annotate(has_out=has('checkout'), has_in=has('checkin')).only(
+            'id', 'vehicle_id', 'project_id', 'start_time', 'end_time',
+            'start_odometer_km', 'end_odometer_km', 'start_fuel_percent', 'end_fuel_percent',
+        )
+        readings = []
+        for vs in qs.iterator(chunk_size=BATCH):
+            if not vs.has_out:
+                readings.append(session_reading(vs, 'checkout'))
+            if vs.end_time and vs.end_odometer_km is not None and not vs.has_in:
+                readings.append(session_reading(vs, 'checkin'))
+        with transaction.atomic():
+            VehicleReading.objects.bulk_create(readings, batch_size=BATCH)
+        self.stdout.write(self.style.SUCCESS(f"Create {len(readings)} letture"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.images import local_media_path, build_all
+from core.models import WorkPhoto, Vehicle, VehicleSession
+
+class Command(BaseCommand):
+    help = "Genera le miniature (tutte le taglie) per foto lavori, foto mezzi e foto di riconsegna"
+
+    def handle(self, *args, **options):
+        urls = list(WorkPhoto.objects.values_list('url', flat=True))
+        urls += Vehicle.objects.exclude(photo_url__isnull=True).values_list('photo_url', flat=True)
+        for text in VehicleSession.objects.exclude(photos_urls__isnull=True).values_list('photos_urls', flat=True).iterator():
+            urls += [u.strip() for u in text.splitlines() if u.strip()]
+        done = build_all(local_media_path(u) for u in urls)
+        self.stdout.write(self.style.SUCCESS(f"Miniature pronte per {len(done)} immagini locali (su {len(urls)} URL)"))
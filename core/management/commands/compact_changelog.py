@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.changes import compact_changelog
+
+class Command(BaseCommand):
+    help = "Compatta il journal del delta sync eliminando le cancellazioni più vecchie della retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Retention delle cancellazioni in giorni (default 30)")
+
+    def handle(self, *args, **options):
+        n = compact_changelog(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Journal compattato: {n} cancellazioni rimosse"))
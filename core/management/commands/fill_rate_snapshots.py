@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.kpi import bump_kpi_version
+from core.labor import rate_for
+from core.models import TimeSession
+
+class Command(BaseCommand):
+    help = "Compila la tariffa oraria delle timbrature salvate a 0 usando lo storico tariffe"
+
+    def handle(self, *args, **options):
+        changed = []
+        qs = TimeSession.objects.filter(hourly_rate_eur_snapshot=0).only('id', 'user_id', 'start_time', 'hourly_rate_eur_snapshot')
+        for ts in qs.iterator(chunk_size=2000):
+            rate = rate_for(ts.user_id, timezone.localdate(ts.start_time))
+            if rate:
+                ts.hourly_rate_eur_snapshot = rate
+                changed.append(ts)
+        with transaction.atomic():
+            TimeSession.objects.bulk_update(changed, ['hourly_rate_eur_snapshot'], batch_size=1000)
+        # bulk_update non emette segnali: i KPI manodopera in cache vanno ricalcolati
+        bump_kpi_version()
+        self.stdout.write(self.style.SUCCESS(f"Tariffe compilate su {len(changed)} timbrature"))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from core.rollups import rebuild_daily_hours
+
+class Command(BaseCommand):
+    help = "Ricostruisce il rollup delle ore giornaliere (utente × progetto × giorno) dalle timbrature"
+
+    def handle(self, *args, **options):
+        n = rebuild_daily_hours()
+        self.stdout.write(self.style.SUCCESS(f"Rollup ore ricostruito: {n} righe"))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from core.folders import rebuild_folder_paths
+
+class Command(BaseCommand):
+    help = "Ricostruisce l'indice ad albero (path/depth) delle cartelle HR"
+
+    def handle(self, *args, **options):
+        n = rebuild_folder_paths()
+        self.stdout.write(self.style.SUCCESS(f"Albero cartelle ricostruito: {n} cartelle"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.tree import rebuild_paths
+
+class Command(BaseCommand):
+    help = "Ricostruisce l'indice ad albero (path/depth) delle lavorazioni"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help="Solo le lavorazioni di questo progetto")
+
+    def handle(self, *args, **options):
+        n = rebuild_paths(options.get('project'))
+        self.stdout.write(self.style.SUCCESS(f"Albero lavorazioni ricostruito: {n} nodi"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from core.models import Project
+from core.rollups import recompute_project_progress
+
+class Command(BaseCommand):
+    help = "Ricalcola l'avanzamento pesato di lavorazioni e progetti (es. dopo un import)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help="Solo questo progetto (ripetibile)")
+
+    def handle(self, *args, **options):
+        ids = options.get('project') or Project.objects.values_list('id', flat=True)
+        total = 0
+        for pid in ids:
+            total += recompute_project_progress(pid)
+        self.stdout.write(self.style.SUCCESS(f"Avanzamento ricalcolato: {total} lavorazioni"))
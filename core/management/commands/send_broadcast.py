@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.broadcasts import fan_out, BroadcastError, BATCH_SIZE
+from core.models import BroadcastDoc
+
+class Command(BaseCommand):
+    help = "Consegna una circolare ai destinatari che non l'hanno ancora ricevuta"
+
+    def add_arguments(self, parser):
+        parser.add_argument('broadcast_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            n = fan_out(options['broadcast_id'], options['batch_size'])
+        except BroadcastDoc.DoesNotExist:
+            raise CommandError(f"Circolare #{options['broadcast_id']} inesistente")
+        except BroadcastError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Circolare consegnata a {n} destinatari"))
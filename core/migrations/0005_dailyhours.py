@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_broadcastdoc_userfile_userfolder_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyHours',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('minutes', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddField(
+            model_name='dailyhours',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_hours', to='core.project'),
+        ),
+        migrations.AddField(
+            model_name='dailyhours',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_hours', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='dailyhours',
+            index=models.Index(fields=['user', 'day'], name='core_dailyh_user_id_5f9318_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyhours',
+            index=models.Index(fields=['project', 'day'], name='core_dailyh_project_29082b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyhours',
+            unique_together={('user', 'project', 'day')},
+        ),
+    ]
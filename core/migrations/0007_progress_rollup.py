@@ -0,0 +1,66 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:36
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Copia congelata di core.rollups al momento della migrazione: il codice vivo può cambiare
+CENT = Decimal('0.01')
+
+
+def weighted_progress(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return Decimal('0')
+    total_w = sum((Decimal(w) for w, _ in pairs), Decimal('0'))
+    if total_w > 0:
+        value = sum((Decimal(w) * Decimal(p) for w, p in pairs), Decimal('0')) / total_w
+    else:
+        value = sum((Decimal(p) for _, p in pairs), Decimal('0')) / len(pairs)
+    return value.quantize(CENT)
+
+
+def compute_progress(rows):
+    rows = list(rows)
+    kids = defaultdict(list)
+    for pk, parent_id, _, _, _ in rows:
+        kids[parent_id].append(pk)
+    weight_of = {pk: weight for pk, _, weight, _, _ in rows}
+    rollup = {}
+    for pk, _, _, progress, _ in sorted(rows, key=lambda r: -r[4]):
+        children = kids.get(pk)
+        rollup[pk] = weighted_progress((weight_of[c], rollup[c]) for c in children) if children else Decimal(progress)
+    return rollup, weighted_progress((weight_of[c], rollup[c]) for c in kids.get(None, []))
+
+
+def fill_progress(apps, schema_editor):
+    Project = apps.get_model('core', 'Project')
+    WorkItem = apps.get_model('core', 'WorkItem')
+    for project_id in Project.objects.values_list('id', flat=True):
+        rollup, project_value = compute_progress(
+            WorkItem.objects.filter(project_id=project_id).values_list('id', 'parent_id', 'weight', 'progress', 'depth')
+        )
+        WorkItem.objects.bulk_update([WorkItem(pk=pk, rollup_progress=v) for pk, v in rollup.items()], ['rollup_progress'], batch_size=1000)
+        Project.objects.filter(pk=project_id).update(progress_pct=project_value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_workitem_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='progress_pct',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='workitem',
+            name='rollup_progress',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_progress_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='tree_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
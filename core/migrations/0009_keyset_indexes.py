@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_project_tree_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='costdocument',
+            index=models.Index(fields=['status', '-id'], name='core_costdo_status_f490a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesession',
+            index=models.Index(fields=['user', '-id'], name='core_timese_user_id_fb90b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesession',
+            index=models.Index(fields=['vehicle', '-id'], name='core_vehicl_vehicle_54eea5_idx'),
+        ),
+    ]
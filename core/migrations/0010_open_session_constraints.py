@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+CLOSED_NOTE = "[chiusa in migrazione: sessione aperta duplicata]"
+
+
+def close_duplicate_open_sessions(apps, schema_editor):
+    # I vincoli sotto falliscono se esistono già più sessioni aperte: resta aperta la più
+    # recente, le altre sono chiuse a durata zero (nessun effetto sul rollup ore) e annotate.
+    TimeSession = apps.get_model('core', 'TimeSession')
+    VehicleSession = apps.get_model('core', 'VehicleSession')
+
+    def extra(qs, key):
+        seen, out = set(), []
+        for row in qs.order_by(key, '-start_time', '-id'):
+            if getattr(row, key) in seen:
+                out.append(row)
+            seen.add(getattr(row, key))
+        return out
+
+    for ts in extra(TimeSession.objects.filter(completed=False, end_time__isnull=True), 'user_id'):
+        ts.end_time, ts.completed = ts.start_time, True
+        ts.note = '\n'.join(filter(None, [ts.note, CLOSED_NOTE]))
+        ts.save(update_fields=['end_time', 'completed', 'note'])
+    open_vs = VehicleSession.objects.filter(end_time__isnull=True)
+    for vs in {v.pk: v for v in extra(open_vs, 'vehicle_id') + extra(open_vs, 'user_id')}.values():
+        vs.end_time, vs.end_odometer_km, vs.end_fuel_percent = vs.start_time, vs.start_odometer_km, vs.start_fuel_percent
+        vs.notes_in = '\n'.join(filter(None, [vs.notes_in, CLOSED_NOTE]))
+        vs.save(update_fields=['end_time', 'end_odometer_km', 'end_fuel_percent', 'notes_in'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_duplicate_open_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('completed', False), ('end_time__isnull', True)), fields=('user',), name='uniq_open_timesession_per_user', violation_error_message="L'utente ha già una timbratura attiva."),
+        ),
+        migrations.AddConstraint(
+            model_name='vehiclesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_time__isnull', True)), fields=('vehicle',), name='uniq_open_vehiclesession_per_vehicle', violation_error_message='Il mezzo è già in uso.'),
+        ),
+        migrations.AddConstraint(
+            model_name='vehiclesession',
+            constraint=models.UniqueConstraint(condition=models.Q(('end_time__isnull', True)), fields=('user',), name='uniq_open_vehiclesession_per_user', violation_error_message="L'utente ha già un mezzo in uso."),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_open_session_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='costdocument',
+            index=models.Index(fields=['project', 'status', 'created_at'], name='core_costdo_project_97ab76_idx'),
+        ),
+    ]
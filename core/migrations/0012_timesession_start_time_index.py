@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_cost_totals_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timesession',
+            index=models.Index(fields=['start_time'], name='core_timese_start_t_7749df_idx'),
+        ),
+    ]
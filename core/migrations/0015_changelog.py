@@ -0,0 +1,65 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copia congelata di core.changes.TRACKED/seed_changelog al momento della migrazione:
+# tabelle aggiunte in seguito al journal non devono esistere già a questo punto
+TRACKED = {
+    'project': 'Project',
+    'workitem': 'WorkItem',
+    'vehicle': 'Vehicle',
+    'userfile': 'UserFile',
+    'broadcastdoc': 'BroadcastDoc',
+}
+
+
+def seed_journal(apps, schema_editor):
+    ChangeLog = apps.get_model('core', 'ChangeLog')
+    rows = []
+    for table, name in TRACKED.items():
+        model = apps.get_model('core', name)
+        owned = any(f.name == 'owner' for f in model._meta.fields)
+        for pk, owner_id in model.objects.values_list('pk', 'owner_id' if owned else 'pk'):
+            rows.append(ChangeLog(table=table, object_id=pk, owner_id=owner_id if owned else None))
+    ChangeLog.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_sync_client_uuid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=30)),
+                ('object_id', models.IntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Creato/modificato'), ('delete', 'Eliminato'), ('purge', 'Compattazione')], default='upsert', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['table', 'object_id'], name='core_change_table_8f3181_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['action', 'created_at'], name='core_change_action_285bba_idx'),
+        ),
+        migrations.RunPython(seed_journal, migrations.RunPython.noop),
+    ]
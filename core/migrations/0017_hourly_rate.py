@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_user_email_lower_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyRate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rate_eur', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valid_from', models.DateField()),
+                ('note', models.CharField(blank=True, default='', max_length=200)),
+            ],
+            options={
+                'ordering': ['user', 'valid_from'],
+            },
+        ),
+        migrations.AddField(
+            model_name='hourlyrate',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rates', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='hourlyrate',
+            unique_together={('user', 'valid_from')},
+        ),
+    ]
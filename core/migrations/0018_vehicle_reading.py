@@ -0,0 +1,52 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_hourly_rate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleReading',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('odometer_km', models.PositiveIntegerField()),
+                ('fuel_percent', models.PositiveSmallIntegerField()),
+                ('kind', models.CharField(choices=[('checkout', 'Ritiro'), ('checkin', 'Riconsegna'), ('manual', 'Manuale')], default='manual', max_length=10)),
+            ],
+            options={
+                'ordering': ['vehicle', 'recorded_at', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='tank_liters',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclereading',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.project'),
+        ),
+        migrations.AddField(
+            model_name='vehiclereading',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='readings', to='core.vehiclesession'),
+        ),
+        migrations.AddField(
+            model_name='vehiclereading',
+            name='vehicle',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='core.vehicle'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclereading',
+            index=models.Index(fields=['vehicle', 'recorded_at'], name='core_vehicl_vehicle_d73c74_idx'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_vehicle_reading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='site_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='site_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='site_radius_m',
+            field=models.PositiveIntegerField(default=200),
+        ),
+        migrations.AddField(
+            model_name='timesession',
+            name='start_accuracy_m',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='timesession',
+            name='start_geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='timesession',
+            name='start_in_geofence',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='timesession',
+            name='start_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='timesession',
+            name='start_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='end_accuracy_m',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='end_geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='end_in_geofence',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='end_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='end_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='start_accuracy_m',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='start_geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='start_in_geofence',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='start_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vehiclesession',
+            name='start_lng',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='timesession',
+            index=models.Index(fields=['start_geohash'], name='core_timese_start_g_04d8c6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesession',
+            index=models.Index(condition=models.Q(('start_in_geofence', False)), fields=['start_time'], name='ts_outside_site_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesession',
+            index=models.Index(fields=['start_geohash'], name='core_vehicl_start_g_2ea439_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesession',
+            index=models.Index(fields=['end_geohash'], name='core_vehicl_end_geo_6a6d44_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesession',
+            index=models.Index(condition=models.Q(('start_in_geofence', False), ('end_in_geofence', False), _connector='OR'), fields=['start_time'], name='vs_outside_site_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0019_geolocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastdoc',
+            name='audience',
+            field=models.CharField(choices=[('all', 'Tutti'), ('staff', 'Ufficio'), ('workers', 'Operai'), ('group', 'Gruppo'), ('project', 'Progetto')], default='all', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='broadcastdoc',
+            name='folder_name',
+            field=models.CharField(default='Circolari', max_length=120),
+        ),
+        migrations.AddField(
+            model_name='broadcastdoc',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auth.group'),
+        ),
+        migrations.AddField(
+            model_name='broadcastdoc',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.project'),
+        ),
+        migrations.AddField(
+            model_name='broadcastdoc',
+            name='requires_ack',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='broadcastdoc',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='userfile',
+            name='broadcast',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deliveries', to='core.broadcastdoc'),
+        ),
+        migrations.AddConstraint(
+            model_name='userfile',
+            constraint=models.UniqueConstraint(condition=models.Q(('broadcast__isnull', False)), fields=('broadcast', 'owner'), name='uniq_broadcast_delivery_per_user'),
+        ),
+    ]
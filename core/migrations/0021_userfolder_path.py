@@ -0,0 +1,67 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+# Copia congelata di core.tree al momento della migrazione: il codice vivo può cambiare
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+KEY_WIDTH = 7
+SORT_OFFSET = 2 ** 31
+
+
+def _b36(n, width=KEY_WIDTH):
+    out = ''
+    while n:
+        n, r = divmod(n, 36)
+        out = DIGITS[r] + out
+    return out.rjust(width, '0')
+
+
+def path_segment(sort_order, pk):
+    return _b36(sort_order + SORT_OFFSET) + _b36(pk)
+
+
+def compute_paths(rows):
+    rows = list(rows)
+    known = {pk for pk, _, _ in rows}
+    by_parent = {}
+    for pk, parent_id, sort_order in rows:
+        by_parent.setdefault(parent_id if parent_id in known else None, []).append((pk, sort_order))
+    stack = [(pk, so, '', 0) for pk, so in by_parent.get(None, [])]
+    while stack:
+        pk, sort_order, prefix, depth = stack.pop()
+        path = prefix + path_segment(sort_order, pk)
+        yield pk, path, depth
+        stack.extend((kid, so, path, depth + 1) for kid, so in by_parent.get(pk, []))
+
+
+def fill_paths(apps, schema_editor):
+    UserFolder = apps.get_model('core', 'UserFolder')
+    rows = ((pk, parent_id, 0) for pk, parent_id in UserFolder.objects.values_list('id', 'parent_id'))
+    out = [UserFolder(pk=pk, path=path, depth=depth) for pk, path, depth in compute_paths(rows)]
+    UserFolder.objects.bulk_update(out, ['path', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_broadcast_fanout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfolder',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userfolder',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=700),
+        ),
+        migrations.AddIndex(
+            model_name='userfolder',
+            index=models.Index(fields=['owner', 'path'], name='core_userfo_owner_i_d3b905_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_userfolder_path'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='workitem',
+            name='core_workit_project_4baed4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='workitem',
+            index=models.Index(fields=['project', 'path'], name='core_wi_project_path_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+    ]
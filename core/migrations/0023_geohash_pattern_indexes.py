@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_workitem_path_pattern_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timesession',
+            name='core_timese_start_g_04d8c6_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehiclesession',
+            name='core_vehicl_start_g_2ea439_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehiclesession',
+            name='core_vehicl_end_geo_6a6d44_idx',
+        ),
+        migrations.AddIndex(
+            model_name='timesession',
+            index=models.Index(fields=['start_geohash'], name='ts_start_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesession',
+            index=models.Index(fields=['start_geohash'], name='vs_start_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='vehiclesession',
+            index=models.Index(fields=['end_geohash'], name='vs_end_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_geohash_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='userfolder',
+            name='core_userfo_owner_i_d3b905_idx',
+        ),
+        migrations.AddIndex(
+            model_name='userfolder',
+            index=models.Index(fields=['owner', 'path'], name='core_uf_owner_path_idx', opclasses=['', 'varchar_pattern_ops']),
+        ),
+    ]
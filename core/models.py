@@ -1,6 +1,10 @@
+import uuid
+from decimal import Decimal
+
 from django.db import models
 from django.utils import timezone
 from django.conf import settings
+from django.core.exceptions import ValidationError
 
 # ===== PROGETTI =====
 class Project(models.Model):
@@ -13,12 +17,25 @@ class Project(models.Model):
     cover_url = models.URLField(blank=True, null=True)
     description = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='active')
+    # Area del cantiere (geofence circolare) per timbrature e ritiri/riconsegne mezzi
+    site_lat = models.FloatField(blank=True, null=True)
+    site_lng = models.FloatField(blank=True, null=True)
+    site_radius_m = models.PositiveIntegerField(default=200)
+    # Avanzamento pesato delle lavorazioni radice, mantenuto da core.rollups
+    progress_pct = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
+    # Incrementato a ogni modifica delle lavorazioni: chiave di cache del frammento albero
+    tree_version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
     class Meta: ordering = ['-id']
     def __str__(self): return self.name
 
 # ===== LAVORAZIONI =====
+class WorkItemQuerySet(models.QuerySet):
+    def preorder(self):
+        # Ordine dell'albero (padre, poi figli per sort_order/id) con una sola query
+        return self.order_by('path')
+
 class WorkItem(models.Model):
     STATUS_CHOICES = [('open','Aperta'),('in_progress','In corso'),('paused','In pausa'),('done','Completata')]
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='work_items')
@@ -26,14 +43,43 @@ class WorkItem(models.Model):
     parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
     weight = models.DecimalField(max_digits=10, decimal_places=2, default=1)
     progress = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    # Foglia: = progress; nodo con figli: media dei figli pesata per weight (core.rollups)
+    rollup_progress = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
     status = models.CharField(max_length=30, choices=STATUS_CHOICES, default='open')
     sort_order = models.IntegerField(default=0)
+    # Materialized path: un segmento per livello (sort_order + id), mantenuto da core.tree
+    path = models.CharField(max_length=700, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
+    objects = WorkItemQuerySet.as_manager()
+    # Campo che delimita l'albero (core.tree.sync_path filtra il sottoalbero su questo + path)
+    TREE_SCOPE = 'project_id'
     class Meta:
         ordering = ['sort_order','id']
-        indexes = [models.Index(fields=['project']), models.Index(fields=['parent'])]
+        indexes = [
+            models.Index(fields=['project']), models.Index(fields=['parent']),
+            # varchar_pattern_ops: su PostgreSQL il LIKE 'prefisso%' usa l'indice con qualunque collation
+            models.Index(fields=['project','path'], name='core_wi_project_path_idx', opclasses=['', 'varchar_pattern_ops']),
+        ]
     def __str__(self): return f"[{self.project_id}] {self.name}"
+    def clean(self):
+        if self.parent_id is None:
+            return
+        if self.parent.project_id != self.project_id:
+            raise ValidationError({'parent': "La lavorazione padre deve appartenere allo stesso progetto."})
+        if self.pk and (self.parent_id == self.pk or (self.path and self.parent.path.startswith(self.path))):
+            raise ValidationError({'parent': "Non puoi spostare una lavorazione sotto se stessa o una sua sotto-lavorazione."})
+    def get_descendants(self, include_self=False):
+        # Prefisso sul path (indice project+path): i discendenti iniziano tutti con self.path
+        qs = WorkItem.objects.filter(project_id=self.project_id, path__startswith=self.path)
+        return (qs if include_self else qs.exclude(pk=self.pk)).preorder()
+    def get_ancestors(self, include_self=False):
+        from .tree import path_ids
+        ids = path_ids(self.path)
+        if not include_self:
+            ids = ids[:-1]
+        return WorkItem.objects.filter(pk__in=ids).order_by('depth')
 
 # ===== TIMBRATURE =====
 class TimeSession(models.Model):
@@ -44,18 +90,52 @@ class TimeSession(models.Model):
     hourly_rate_eur_snapshot = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     note = models.TextField(blank=True, null=True)
     completed = models.BooleanField(default=False)
+    # Posizione alla timbratura (sola lettura, dal telefono) e esito geofence (core.geo)
+    start_lat = models.FloatField(blank=True, null=True, editable=False)
+    start_lng = models.FloatField(blank=True, null=True, editable=False)
+    start_accuracy_m = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    start_geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+    start_in_geofence = models.BooleanField(blank=True, null=True, editable=False)
+    # UUID generato dal client offline: rende idempotente il replay di un batch di sync
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         ordering = ['-id']
-        indexes = [models.Index(fields=['user']), models.Index(fields=['project'])]
+        indexes = [
+            models.Index(fields=['user']), models.Index(fields=['project']), models.Index(fields=['user','-id']), models.Index(fields=['start_time']),
+            models.Index(fields=['start_geohash'], name='ts_start_geohash_idx', opclasses=['varchar_pattern_ops']),
+            # Timbrature fuori dall'area di cantiere per periodo
+            models.Index(fields=['start_time'], condition=models.Q(start_in_geofence=False), name='ts_outside_site_idx'),
+        ]
+        constraints = [
+            # Una sola timbratura aperta per utente: indice unico parziale sulle sessioni aperte
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(end_time__isnull=True, completed=False),
+                name='uniq_open_timesession_per_user',
+                violation_error_message="L'utente ha già una timbratura attiva.",
+            ),
+        ]
     def __str__(self): return f"TS#{self.id} - {getattr(self.user,'username',self.user_id)} - {self.project.name}"
     @property
     def is_active(self): return self.end_time is None and not self.completed
     @property
-    def duration_minutes(self):
-        end = self.end_time or timezone.now()
-        return int((end - self.start_time).total_seconds() // 60)
+    def duration_minutes(self): return self.minutes_until()
+    def minutes_until(self, now=None):
+        """Minuti timbrati fino alla chiusura (o fino a now se ancora aperta), mai negativi."""
+        end = self.end_time or now or timezone.now()
+        return max(int((end - self.start_time).total_seconds() // 60), 0)
+
+class HourlyRate(models.Model):
+    # Storico tariffe: vale da valid_from fino alla riga successiva dello stesso utente
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hourly_rates')
+    rate_eur = models.DecimalField(max_digits=10, decimal_places=2)
+    valid_from = models.DateField()
+    note = models.CharField(max_length=200, blank=True, default='')
+    class Meta:
+        ordering = ['user','valid_from']
+        unique_together = [('user','valid_from')]
+    def __str__(self): return f"{getattr(self.user,'username',self.user_id)} {self.rate_eur} €/h dal {self.valid_from}"
 
 class TimeSessionAllocation(models.Model):
     time_session = models.ForeignKey(TimeSession, on_delete=models.CASCADE, related_name='allocations')
@@ -63,9 +143,35 @@ class TimeSessionAllocation(models.Model):
     minutes_allocated = models.IntegerField(blank=True, null=True)
     percent_allocated = models.DecimalField(max_digits=6, decimal_places=3, blank=True, null=True)
     note = models.TextField(blank=True, null=True)
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)
     class Meta:
         indexes = [models.Index(fields=['time_session']), models.Index(fields=['work_item'])]
     def __str__(self): return f"Alloc TS#{self.time_session_id} -> WI#{self.work_item_id}"
+    @staticmethod
+    def resolve_minutes(duration, minutes=None, percent=None):
+        """Regola unica (riepilogo timbrature, report di cantiere, costo manodopera): i minuti
+        espliciti prevalgono, altrimenti la percentuale della durata. Vale anche per totali
+        raggruppati: minutes somma le righe a minuti, percent solo quelle senza minuti."""
+        total = minutes or 0
+        if percent is not None:
+            total += Decimal(duration) * percent / 100
+        return total
+    def allocated_minutes(self, duration):
+        if self.minutes_allocated is not None:
+            return self.minutes_allocated
+        return int(self.resolve_minutes(duration, percent=self.percent_allocated))
+
+class DailyHours(models.Model):
+    # Rollup minuti per utente/progetto/giorno, aggiornato da core.rollups
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_hours')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_hours')
+    day = models.DateField()
+    minutes = models.IntegerField(default=0)
+    class Meta:
+        ordering = ['-day']
+        unique_together = [('user','project','day')]
+        indexes = [models.Index(fields=['user','day']), models.Index(fields=['project','day'])]
+    def __str__(self): return f"{self.day} - {self.user_id} - P{self.project_id}: {self.minutes}m"
 
 class WorkPhoto(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='work_photos')
@@ -74,6 +180,7 @@ class WorkPhoto(models.Model):
     work_item = models.ForeignKey(WorkItem, on_delete=models.SET_NULL, null=True, blank=True, related_name='photos')
     url = models.URLField()
     description = models.TextField(blank=True, null=True)
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta: ordering = ['-id']
     def __str__(self): return f"Photo#{self.id} - {self.project.name}"
@@ -96,7 +203,8 @@ class CostDocument(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         ordering = ['-id']
-        indexes = [models.Index(fields=['project']), models.Index(fields=['status'])]
+        indexes = [models.Index(fields=['project']), models.Index(fields=['status']), models.Index(fields=['status','-id']),
+                   models.Index(fields=['project','status','created_at'])]
     def __str__(self): return f"Cost#{self.id} - {self.project.name} - €{self.amount_eur}"
 
 # ===== FLOTTA MEZZI =====
@@ -109,6 +217,8 @@ class Vehicle(models.Model):
     status = models.CharField(max_length=20, choices=STATUS, default='available')
     odometer_km = models.IntegerField(default=0)
     fuel_level_percent = models.IntegerField(default=100)
+    # Capacità serbatoio: converte i punti % di carburante in litri (core.telemetry)
+    tank_liters = models.PositiveSmallIntegerField(blank=True, null=True)
     photo_url = models.URLField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -129,22 +239,83 @@ class VehicleSession(models.Model):
     notes_in = models.TextField(blank=True, null=True)
     damages_report = models.TextField(blank=True, null=True)
     photos_urls = models.TextField(blank=True, null=True)  # URL uno per riga
+    # Posizione al ritiro (start_) e alla riconsegna (end_), esito geofence sul progetto
+    start_lat = models.FloatField(blank=True, null=True, editable=False)
+    start_lng = models.FloatField(blank=True, null=True, editable=False)
+    start_accuracy_m = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    start_geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+    start_in_geofence = models.BooleanField(blank=True, null=True, editable=False)
+    end_lat = models.FloatField(blank=True, null=True, editable=False)
+    end_lng = models.FloatField(blank=True, null=True, editable=False)
+    end_accuracy_m = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    end_geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+    end_in_geofence = models.BooleanField(blank=True, null=True, editable=False)
+    client_uuid = models.UUIDField(unique=True, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    class Meta: ordering = ['-id']
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['vehicle','-id']),
+            models.Index(fields=['start_geohash'], name='vs_start_geohash_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['end_geohash'], name='vs_end_geohash_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['start_time'], condition=models.Q(start_in_geofence=False) | models.Q(end_in_geofence=False), name='vs_outside_site_idx'),
+        ]
+        constraints = [
+            # Una sola sessione aperta per mezzo e una per utente (indici unici parziali)
+            models.UniqueConstraint(
+                fields=['vehicle'], condition=models.Q(end_time__isnull=True),
+                name='uniq_open_vehiclesession_per_vehicle',
+                violation_error_message="Il mezzo è già in uso.",
+            ),
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(end_time__isnull=True),
+                name='uniq_open_vehiclesession_per_user',
+                violation_error_message="L'utente ha già un mezzo in uso.",
+            ),
+        ]
     def __str__(self): return f"VS#{self.id} - {self.vehicle.plate} - {getattr(self.user,'username', self.user_id)}"
     @property
     def is_active(self): return self.end_time is None
 
+# Storico letture km/carburante: append-only, una riga per ritiro/riconsegna/lettura manuale
+class VehicleReading(models.Model):
+    KINDS = [('checkout','Ritiro'),('checkin','Riconsegna'),('manual','Manuale')]
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='readings')
+    recorded_at = models.DateTimeField(default=timezone.now)
+    odometer_km = models.PositiveIntegerField()
+    fuel_percent = models.PositiveSmallIntegerField()
+    kind = models.CharField(max_length=10, choices=KINDS, default='manual')
+    session = models.ForeignKey(VehicleSession, on_delete=models.SET_NULL, null=True, blank=True, related_name='readings')
+    # Progetto della sessione al momento della lettura (attribuzione dei km)
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    class Meta:
+        ordering = ['vehicle','recorded_at','id']
+        indexes = [models.Index(fields=['vehicle','recorded_at'])]
+    def __str__(self): return f"{self.vehicle_id} @ {self.recorded_at:%Y-%m-%d %H:%M} - {self.odometer_km} km"
+
 # ===== DOCUMENTI HR =====
 class UserFolder(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hr_folders')
     name = models.CharField(max_length=120)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Materialized path (un segmento per livello, come WorkItem) mantenuto da core.tree.sync_path
+    path = models.CharField(max_length=700, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    TREE_SCOPE = 'owner_id'
     class Meta:
         ordering = ['name']
         unique_together = [('owner','parent','name')]
+        # Sottoalberi per prefisso del path: pattern ops come per WorkItem
+        indexes = [models.Index(fields=['owner','path'], name='core_uf_owner_path_idx', opclasses=['', 'varchar_pattern_ops'])]
     def __str__(self): return f"{self.owner_id}/{self.name}"
+    def clean(self):
+        if self.parent_id is None:
+            return
+        if self.parent.owner_id != self.owner_id:
+            raise ValidationError({'parent': "La cartella padre deve appartenere allo stesso utente."})
+        if self.pk and (self.parent_id == self.pk or (self.path and self.parent.path.startswith(self.path))):
+            raise ValidationError({'parent': "Non puoi spostare una cartella sotto se stessa o una sua sottocartella."})
 
 class UserFile(models.Model):
     CATEGORY = [('payslip','Busta paga'),('contract','Contratto'),('circular','Circolare'),('other','Altro')]
@@ -156,15 +327,74 @@ class UserFile(models.Model):
     requires_ack = models.BooleanField(default=False)
     read_at = models.DateTimeField(blank=True, null=True)
     ack_at = models.DateTimeField(blank=True, null=True)
+    # Copia consegnata da una circolare (core.broadcasts): una per destinatario
+    broadcast = models.ForeignKey('BroadcastDoc', on_delete=models.SET_NULL, null=True, blank=True, related_name='deliveries')
     created_at = models.DateTimeField(auto_now_add=True)
-    class Meta: ordering = ['-id']
+    class Meta:
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast','owner'], condition=models.Q(broadcast__isnull=False), name='uniq_broadcast_delivery_per_user'),
+        ]
     def __str__(self): return f"UF#{self.id} - {self.title}"
 
 class BroadcastDoc(models.Model):
+    AUDIENCE = [('all','Tutti'),('staff','Ufficio'),('workers','Operai'),('group','Gruppo'),('project','Progetto')]
     title = models.CharField(max_length=200)
     body = models.TextField(blank=True, null=True)
     file_url = models.URLField(blank=True, null=True)
+    requires_ack = models.BooleanField(default=True)
+    # Destinatari: tutti, per ruolo (staff/operai, gruppo) o chi ha timbrato sul progetto
+    audience = models.CharField(max_length=20, choices=AUDIENCE, default='all')
+    group = models.ForeignKey('auth.Group', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Cartella radice dell'utente in cui finisce la copia (creata se manca)
+    folder_name = models.CharField(max_length=120, default='Circolari')
+    sent_at = models.DateTimeField(blank=True, null=True, editable=False)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='broadcast_docs')
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta: ordering = ['-id']
     def __str__(self): return self.title
+
+# ===== UPLOAD =====
+class StoredFile(models.Model):
+    # Contenuto deduplicato per SHA-256: un file ricaricato più volte è salvato una volta sola
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField()
+    path = models.CharField(max_length=300)  # relativo a MEDIA_ROOT
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta: ordering = ['-id']
+    def __str__(self): return f"{self.sha256[:12]} ({self.size} B)"
+    @property
+    def url(self): return settings.MEDIA_URL + self.path
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=200)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    stored_file = models.ForeignKey(StoredFile, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['user','-created_at'])]
+    def __str__(self): return f"Upload {self.id} - {self.filename} ({self.received}/{self.size})"
+    @property
+    def is_complete(self): return self.stored_file_id is not None
+
+# ===== JOURNAL MODIFICHE (delta sync) =====
+class ChangeLog(models.Model):
+    # Una riga per oggetto (compattata in scrittura): l'id crescente fa da token di sync
+    ACTIONS = [('upsert','Creato/modificato'),('delete','Eliminato'),('purge','Compattazione')]
+    table = models.CharField(max_length=30)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=10, choices=ACTIONS, default='upsert')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')  # visibile solo a lui
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['table','object_id']), models.Index(fields=['action','created_at'])]
+    def __str__(self): return f"#{self.id} {self.action} {self.table}:{self.object_id}"
@@ -0,0 +1,55 @@
+import base64
+from dataclasses import dataclass
+
+PAGE_SIZE = 30
+
+# ===== PAGINAZIONE A CURSORE (keyset su -id) =====
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Cursore opaco -> ultimo id visto; None se assente o non valido (si riparte dalla prima pagina)."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        prefix, value = raw.split(':', 1)
+        return int(value) if prefix == 'id' else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+@dataclass
+class KeysetPage:
+    items: list
+    has_next: bool
+    next_url: str = ''
+    is_first: bool = True
+
+    def __iter__(self): return iter(self.items)
+    def __len__(self): return len(self.items)
+    def __bool__(self): return bool(self.items)
+
+def keyset_paginate(request, queryset, per_page=PAGE_SIZE):
+    """Pagina un queryset in ordine -id con WHERE id < cursore: costo O(pagina) anche con storici lunghi.
+
+    Stabile con inserimenti concorrenti: le righe nuove hanno id maggiori e non spostano le pagine successive.
+    Il link alla pagina successiva conserva gli altri parametri GET (filtri).
+    """
+    last_id = decode_cursor(request.GET.get('cursor'))
+    qs = queryset.order_by('-id')
+    if last_id is not None:
+        qs = qs.filter(id__lt=last_id)
+    rows = list(qs[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_url = ''
+    if has_next:
+        params = request.GET.copy()
+        params.pop('partial', None)
+        params['cursor'] = encode_cursor(rows[-1].id)
+        next_url = f"{request.path}?{params.urlencode()}"
+    return KeysetPage(items=rows, has_next=has_next, next_url=next_url, is_first=last_id is None)
+
+def wants_fragment(request):
+    # "Carica altri": il client chiede solo le righe da accodare
+    return request.GET.get('partial') == '1'
@@ -0,0 +1,157 @@
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum, Count, Avg, DecimalField, ExpressionWrapper
+from django.utils import timezone
+
+from .models import DailyHours, TimeSession, WorkItem, Project
+from .tree import path_ids
+from .kpi import invalidate_project_kpis, bump_kpi_version
+
+# ===== ORE GIORNALIERE =====
+def session_day_minutes(ts):
+    """Minuti di una timbratura chiusa ripartiti per giorno locale: {date: minuti}.
+
+    Il riparto usa i minuti cumulati, così la somma coincide con duration_minutes.
+    """
+    if not ts.completed or ts.end_time is None:
+        return {}
+    return interval_day_minutes(ts.start_time, ts.end_time)
+
+def interval_day_minutes(start, end):
+    """Minuti dell'intervallo [start, end) ripartiti per giorno locale, con i minuti cumulati."""
+    out = {}
+    cursor = start
+    while cursor < end:
+        day = timezone.localdate(cursor)
+        midnight = timezone.make_aware(datetime.combine(day + timezone.timedelta(days=1), time.min))
+        seg_end = min(midnight, end)
+        before = int((cursor - start).total_seconds() // 60)
+        after = int((seg_end - start).total_seconds() // 60)
+        if after > before:
+            out[day] = out.get(day, 0) + after - before
+        cursor = seg_end
+    return out
+
+def session_buckets(ts):
+    """Contributi di una timbratura al rollup: {(user_id, project_id, day): minuti}."""
+    return {(ts.user_id, ts.project_id, day): m for day, m in session_day_minutes(ts).items()}
+
+def apply_daily_delta(delta):
+    """Applica un delta {(user_id, project_id, day): minuti} a DailyHours."""
+    delta = {k: v for k, v in delta.items() if v}
+    if not delta:
+        return
+    with transaction.atomic():
+        for (user_id, project_id, day), minutes in delta.items():
+            row = DailyHours.objects.filter(user_id=user_id, project_id=project_id, day=day)
+            updated = row.update(minutes=F('minutes') + minutes)
+            if not updated and minutes > 0:
+                DailyHours.objects.create(user_id=user_id, project_id=project_id, day=day, minutes=minutes)
+            elif minutes < 0:
+                row.filter(minutes__lte=0).delete()
+    invalidate_project_kpis({project_id for _, project_id, _ in delta})
+
+def diff_buckets(old, new):
+    delta = defaultdict(int)
+    for k, v in old.items():
+        delta[k] -= v
+    for k, v in new.items():
+        delta[k] += v
+    return delta
+
+def rebuild_daily_hours():
+    """Ricostruisce da zero il rollup a partire da tutte le timbrature chiuse."""
+    totals = defaultdict(int)
+    qs = TimeSession.objects.filter(completed=True, end_time__isnull=False).only(
+        'user_id', 'project_id', 'start_time', 'end_time', 'completed'
+    )
+    for ts in qs.iterator(chunk_size=2000):
+        for k, v in session_buckets(ts).items():
+            totals[k] += v
+    with transaction.atomic():
+        DailyHours.objects.all().delete()
+        DailyHours.objects.bulk_create(
+            [DailyHours(user_id=u, project_id=p, day=d, minutes=m) for (u, p, d), m in totals.items() if m > 0],
+            batch_size=1000,
+        )
+    bump_kpi_version()
+    return len(totals)
+
+# ===== AVANZAMENTO PESATO =====
+CENT = Decimal('0.01')
+
+def weighted_progress(pairs):
+    """Media pesata di coppie (weight, progress); con pesi tutti nulli usa la media semplice."""
+    pairs = list(pairs)
+    if not pairs:
+        return Decimal('0')
+    total_w = sum((Decimal(w) for w, _ in pairs), Decimal('0'))
+    if total_w > 0:
+        value = sum((Decimal(w) * Decimal(p) for w, p in pairs), Decimal('0')) / total_w
+    else:
+        value = sum((Decimal(p) for _, p in pairs), Decimal('0')) / len(pairs)
+    return value.quantize(CENT)
+
+def _children_progress(qs):
+    agg = qs.aggregate(
+        n=Count('id'),
+        w=Sum('weight'),
+        wp=Sum(ExpressionWrapper(F('weight') * F('rollup_progress'), output_field=DecimalField())),
+        avg=Avg('rollup_progress'),
+    )
+    if not agg['n']:
+        return None
+    if agg['w']:
+        return (Decimal(agg['wp']) / Decimal(agg['w'])).quantize(CENT)
+    return Decimal(agg['avg'] or 0).quantize(CENT)
+
+def refresh_progress_chain(node_ids, project_id):
+    """Ricalcola rollup_progress per i nodi indicati (dal basso verso l'alto) e poi il progetto.
+
+    Ogni passo è un aggregato sui soli figli diretti: il costo è O(profondità), non O(albero).
+    """
+    for pk in node_ids:
+        value = _children_progress(WorkItem.objects.filter(parent_id=pk))
+        if value is None:
+            WorkItem.objects.filter(pk=pk).update(rollup_progress=F('progress'))
+        else:
+            WorkItem.objects.filter(pk=pk).update(rollup_progress=value)
+    value = _children_progress(WorkItem.objects.filter(project_id=project_id, parent__isnull=True))
+    Project.objects.filter(pk=project_id).update(progress_pct=value or 0)
+    invalidate_project_kpis([project_id])
+
+def refresh_progress_for(wi, old_path=''):
+    """Dopo il salvataggio di una lavorazione: la sua catena di antenati (e quella vecchia se spostata)."""
+    chain = path_ids(wi.path)[::-1]
+    old_chain = [pk for pk in path_ids(old_path)[:-1][::-1] if pk not in chain]
+    with transaction.atomic():
+        refresh_progress_chain(chain + old_chain, wi.project_id)
+
+def compute_progress(rows):
+    """Da righe (id, parent_id, weight, progress, depth) calcola ({id: rollup}, avanzamento progetto) senza ricorsione."""
+    rows = list(rows)
+    kids = defaultdict(list)
+    for pk, parent_id, _, _, _ in rows:
+        kids[parent_id].append(pk)
+    weight_of = {pk: weight for pk, _, weight, _, _ in rows}
+    rollup = {}
+    for pk, _, _, progress, _ in sorted(rows, key=lambda r: -r[4]):
+        children = kids.get(pk)
+        rollup[pk] = weighted_progress((weight_of[c], rollup[c]) for c in children) if children else Decimal(progress)
+    return rollup, weighted_progress((weight_of[c], rollup[c]) for c in kids.get(None, []))
+
+def recompute_project_progress(project_id):
+    """Ricalcolo completo di un progetto in memoria, dal livello più profondo alle radici."""
+    rollup, project_value = compute_progress(
+        WorkItem.objects.filter(project_id=project_id).values_list('id', 'parent_id', 'weight', 'progress', 'depth')
+    )
+    with transaction.atomic():
+        WorkItem.objects.bulk_update(
+            [WorkItem(pk=pk, rollup_progress=value) for pk, value in rollup.items()], ['rollup_progress'], batch_size=1000
+        )
+        Project.objects.filter(pk=project_id).update(progress_pct=project_value, tree_version=F('tree_version') + 1)
+    invalidate_project_kpis([project_id])
+    return len(rollup)
@@ -0,0 +1,151 @@
+import uuid
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .models import Project, WorkItem, Vehicle, UserFile, BroadcastDoc
+
+# ===== SYNC OFFLINE: operazioni accodate dal client =====
+# Ogni operazione che crea un oggetto porta un "uuid" generato dal telefono: il replay
+# dello stesso batch (risposta persa, riconnessione) non crea duplicati. I riferimenti a
+# timbrature/sessioni mezzo accettano l'id server oppure l'uuid client di un'operazione
+# precedente dello stesso batch o di un batch già sincronizzato.
+MAX_CLOCK_SKEW = timezone.timedelta(minutes=5)
+
+class ClientRefField(serializers.Field):
+    default_error_messages = {'invalid': "Riferimento non valido: atteso id numerico o uuid."}
+
+    def to_internal_value(self, data):
+        if isinstance(data, int) and not isinstance(data, bool):
+            return data
+        text = str(data).strip()
+        if text.isdigit():
+            return int(text)
+        try:
+            return uuid.UUID(text)
+        except ValueError:
+            self.fail('invalid')
+
+    def to_representation(self, value):
+        return str(value)
+
+class _OpSerializer(serializers.Serializer):
+    def validate(self, attrs):
+        limit = timezone.now() + MAX_CLOCK_SKEW
+        for name in ('start_time', 'end_time'):
+            if attrs.get(name) and attrs[name] > limit:
+                raise serializers.ValidationError({name: "Orario nel futuro."})
+        return attrs
+
+# Posizione opzionale rilevata dal telefono al momento dell'evento
+class _GeoOp(_OpSerializer):
+    lat = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    lng = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
+    accuracy = serializers.FloatField(required=False, allow_null=True, min_value=0)
+
+class TimeStartOp(_GeoOp):
+    uuid = serializers.UUIDField()
+    project = serializers.IntegerField()
+    start_time = serializers.DateTimeField(required=False)
+    note = serializers.CharField(required=False, allow_blank=True, default='')
+
+class TimeStopOp(_OpSerializer):
+    session = ClientRefField()
+    end_time = serializers.DateTimeField(required=False)
+
+class AllocationOp(_OpSerializer):
+    uuid = serializers.UUIDField()
+    session = ClientRefField()
+    work_item = serializers.IntegerField()
+    minutes_allocated = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+    percent_allocated = serializers.DecimalField(max_digits=6, decimal_places=3, required=False, allow_null=True, min_value=Decimal(0), max_value=Decimal(100))
+    note = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if not attrs.get('minutes_allocated') and not attrs.get('percent_allocated'):
+            raise serializers.ValidationError("Inserisci almeno minuti o percentuale.")
+        return super().validate(attrs)
+
+class PhotoOp(_OpSerializer):
+    uuid = serializers.UUIDField()
+    project = serializers.IntegerField()
+    session = ClientRefField(required=False, allow_null=True)
+    work_item = serializers.IntegerField(required=False, allow_null=True)
+    url = serializers.URLField()
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+
+class VehicleCheckoutOp(_GeoOp):
+    uuid = serializers.UUIDField()
+    vehicle = serializers.IntegerField()
+    project = serializers.IntegerField(required=False, allow_null=True)
+    start_time = serializers.DateTimeField(required=False)
+    start_odometer_km = serializers.IntegerField(min_value=0)
+    start_fuel_percent = serializers.IntegerField(min_value=0, max_value=100)
+    notes_out = serializers.CharField(required=False, allow_blank=True, default='')
+
+class VehicleCheckinOp(_GeoOp):
+    vehicle_session = ClientRefField()
+    end_time = serializers.DateTimeField(required=False)
+    end_odometer_km = serializers.IntegerField(min_value=0)
+    end_fuel_percent = serializers.IntegerField(min_value=0, max_value=100)
+    notes_in = serializers.CharField(required=False, allow_blank=True, default='')
+    damages_report = serializers.CharField(required=False, allow_blank=True, default='')
+    photos_urls = serializers.CharField(required=False, allow_blank=True, default='')
+
+SYNC_OPS = {
+    'time_start': TimeStartOp,
+    'time_stop': TimeStopOp,
+    'allocation': AllocationOp,
+    'photo': PhotoOp,
+    'vehicle_checkout': VehicleCheckoutOp,
+    'vehicle_checkin': VehicleCheckinOp,
+}
+
+class SyncBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+
+# ===== DELTA SYNC: rappresentazione degli oggetti nel journal =====
+class ProjectSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Project
+        fields = ['id','name','client_name','start_date','end_date','budget_eur','cover_url','description','status','progress_pct','updated_at']
+
+class WorkItemSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WorkItem
+        fields = ['id','project','parent','name','weight','progress','rollup_progress','status','sort_order']
+
+class VehicleSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Vehicle
+        fields = ['id','plate','name','vehicle_type','status','odometer_km','fuel_level_percent','photo_url','notes']
+
+class UserFileSyncSerializer(serializers.ModelSerializer):
+    folder_name = serializers.CharField(source='folder.name', read_only=True)
+    class Meta:
+        model = UserFile
+        fields = ['id','folder','folder_name','title','file_url','category','requires_ack','read_at','ack_at','created_at']
+
+class BroadcastDocSyncSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BroadcastDoc
+        fields = ['id','title','body','file_url','created_at']
+
+SYNC_SERIALIZERS = {
+    'project': ProjectSyncSerializer,
+    'workitem': WorkItemSyncSerializer,
+    'vehicle': VehicleSyncSerializer,
+    'userfile': UserFileSyncSerializer,
+    'broadcastdoc': BroadcastDocSyncSerializer,
+}
+
+# ===== JWT: claims di ruolo nel token =====
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff or user.is_superuser
+        return token
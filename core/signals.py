@@ -0,0 +1,147 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import TimeSession, WorkItem, CostDocument, Project, Vehicle, VehicleSession, UserFolder, UserFile, BroadcastDoc, HourlyRate
+from .changes import record, record_changes
+from .authentication import claims_cache
+from .rollups import session_buckets, diff_buckets, apply_daily_delta, refresh_progress_for, refresh_progress_chain
+from .cost_totals import bump_cost_totals_version
+from .labor import bump_rates_version
+from .kpi import invalidate_project_kpis
+from .fleet_board import bump_fleet_version
+from .geo import refresh_geofence_flags
+from .tree import sync_path, check_parent, detach_descendants, path_ids, bump_tree_version
+
+# ===== TIMBRATURE -> ORE GIORNALIERE =====
+@receiver(pre_save, sender=TimeSession)
+def _ts_remember_buckets(sender, instance, raw=False, **kwargs):
+    old = None
+    if instance.pk and not raw:
+        old = TimeSession.objects.filter(pk=instance.pk).only(
+            'user_id', 'project_id', 'start_time', 'end_time', 'completed'
+        ).first()
+    instance._old_day_buckets = session_buckets(old) if old else {}
+
+@receiver(post_save, sender=TimeSession)
+def _ts_update_daily_hours(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_old_day_buckets', {})
+    apply_daily_delta(diff_buckets(old, session_buckets(instance)))
+    # Anche la sola tariffa snapshot cambia la manodopera del progetto
+    invalidate_project_kpis([instance.project_id])
+    instance._old_day_buckets = session_buckets(instance)
+
+@receiver(post_delete, sender=TimeSession)
+def _ts_remove_daily_hours(sender, instance, **kwargs):
+    apply_daily_delta(diff_buckets(session_buckets(instance), {}))
+
+# ===== LAVORAZIONI -> MATERIALIZED PATH + AVANZAMENTO =====
+TREE_FIELDS = {'parent', 'parent_id', 'sort_order'}
+PROGRESS_FIELDS = {'progress', 'weight'}
+
+@receiver(pre_save, sender=WorkItem)
+@receiver(pre_save, sender=UserFolder)
+def _tree_check_parent(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Stesso controllo di clean() per chi salva senza form (shell, comandi, script)
+    if not raw and (update_fields is None or TREE_FIELDS & set(update_fields)):
+        check_parent(instance)
+
+@receiver(post_save, sender=WorkItem)
+def _wi_sync_tree(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    changed = set(update_fields) if update_fields else None
+    old_path = instance.path
+    if changed is None or TREE_FIELDS & changed:
+        sync_path(instance, created=created)
+    if changed is None or (TREE_FIELDS | PROGRESS_FIELDS) & changed:
+        refresh_progress_for(instance, old_path=old_path)
+    bump_tree_version(instance.project_id)
+    # Il nodo e gli antenati (rollup aggiornati via UPDATE) + avanzamento del progetto
+    record_changes('workitem', path_ids(instance.path))
+    record_changes('project', [instance.project_id])
+
+@receiver(post_delete, sender=WorkItem)
+def _wi_detach_descendants(sender, instance, **kwargs):
+    # Figli diretti: parent messo a NULL dal delete senza segnali
+    children = list(WorkItem.objects.filter(
+        project_id=instance.project_id, path__startswith=instance.path, depth=instance.depth + 1
+    ).values_list('id', flat=True)) if instance.path else []
+    detach_descendants(instance)
+    ancestors = path_ids(instance.path)[:-1]
+    refresh_progress_chain(ancestors[::-1], instance.project_id)
+    bump_tree_version(instance.project_id)
+    record(instance, 'delete')
+    record_changes('workitem', ancestors + children)
+    record_changes('project', [instance.project_id])
+
+# ===== CARTELLE HR -> MATERIALIZED PATH =====
+@receiver(post_save, sender=UserFolder)
+def _folder_sync_path(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if not raw and (update_fields is None or TREE_FIELDS & set(update_fields)):
+        sync_path(instance, created=created)
+
+# ===== SPESE -> TOTALI PERIODO IN CACHE =====
+@receiver(post_save, sender=CostDocument)
+@receiver(post_delete, sender=CostDocument)
+def _cost_invalidate_totals(sender, instance, **kwargs):
+    bump_cost_totals_version()
+    invalidate_project_kpis([instance.project_id])
+
+# ===== TARIFFE ORARIE -> STORICO IN MEMORIA =====
+@receiver(post_save, sender=HourlyRate)
+@receiver(post_delete, sender=HourlyRate)
+def _rates_invalidate(sender, **kwargs):
+    # I KPI non cambiano: il costo usa la tariffa snapshot delle timbrature
+    bump_rates_version()
+
+# ===== RITIRI/RICONSEGNE -> BACHECA FLOTTA =====
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_save, sender=VehicleSession)
+@receiver(post_delete, sender=VehicleSession)
+def _fleet_invalidate_board(sender, **kwargs):
+    bump_fleet_version()
+
+# ===== AREA CANTIERE -> FLAG GEOFENCE =====
+SITE_FIELDS = ('site_lat', 'site_lng', 'site_radius_m')
+
+@receiver(pre_save, sender=Project)
+def _project_remember_site(sender, instance, raw=False, **kwargs):
+    instance._old_site = None
+    if instance.pk and not raw:
+        instance._old_site = Project.objects.filter(pk=instance.pk).values_list(*SITE_FIELDS).first()
+
+@receiver(post_save, sender=Project)
+def _project_refresh_geofence(sender, instance, created=False, raw=False, **kwargs):
+    old = getattr(instance, '_old_site', None)
+    if not raw and not created and old is not None and old != tuple(getattr(instance, f) for f in SITE_FIELDS):
+        refresh_geofence_flags(instance)
+
+# ===== JOURNAL PER IL DELTA SYNC =====
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Vehicle)
+@receiver(post_save, sender=UserFile)
+@receiver(post_save, sender=BroadcastDoc)
+def _journal_upsert(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record(instance)
+
+@receiver(post_save, sender=Project)
+def _project_invalidate_kpis(sender, instance, **kwargs):
+    invalidate_project_kpis([instance.pk])
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_delete, sender=UserFile)
+@receiver(post_delete, sender=BroadcastDoc)
+def _journal_delete(sender, instance, **kwargs):
+    record(instance, 'delete')
+
+# ===== UTENTI -> CACHE CLAIMS JWT =====
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def _user_forget_claims(sender, instance, **kwargs):
+    claims_cache.forget(instance.pk)
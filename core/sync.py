@@ -0,0 +1,310 @@
+import uuid
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Project, WorkItem, TimeSession, TimeSessionAllocation, WorkPhoto, Vehicle, VehicleSession
+from .changes import record_changes
+from .fleet_board import bump_fleet_version
+from .telemetry import record_session_readings
+from .geo import location_fields
+from .labor import rate_for
+from .rollups import session_buckets, diff_buckets, apply_daily_delta
+from .serializers import SYNC_OPS
+
+# ===== SYNC OFFLINE A BATCH =====
+# Il batch è validato per intero simulando le operazioni in ordine sullo stato caricato
+# con poche query; solo se tutte sono valide viene scritto con bulk_create/bulk_update in
+# un'unica transazione. bulk_* non emette segnali: il rollup DailyHours è aggiornato qui.
+TS_UPDATE_FIELDS = ['end_time', 'completed', 'updated_at']
+VS_UPDATE_FIELDS = ['end_time', 'end_odometer_km', 'end_fuel_percent', 'notes_in', 'damages_report', 'photos_urls',
+                    'end_lat', 'end_lng', 'end_accuracy_m', 'end_geohash', 'end_in_geofence']
+VEHICLE_UPDATE_FIELDS = ['status', 'odometer_km', 'fuel_level_percent']
+
+class SyncConflict(Exception):
+    """Vincolo violato in scrittura da una richiesta concorrente: il client può ritentare."""
+
+def parse_operations(raw_ops):
+    """Valida la forma di ogni operazione: [(op, dati validati | None, errori | None)]."""
+    parsed = []
+    for raw in raw_ops:
+        kind = raw.get('op')
+        if kind not in SYNC_OPS:
+            parsed.append((kind, None, {'op': [f"Operazione sconosciuta: {kind}"]}))
+            continue
+        ser = SYNC_OPS[kind](data=raw)
+        if ser.is_valid():
+            parsed.append((kind, ser.validated_data, None))
+        else:
+            parsed.append((kind, None, ser.errors))
+    return parsed
+
+def _refs(parsed, *names):
+    ids, uuids = set(), set()
+    for _, data, _ in parsed:
+        for name in names:
+            value = (data or {}).get(name)
+            if isinstance(value, uuid.UUID):
+                uuids.add(value)
+            elif value is not None:
+                ids.add(value)
+    return ids, uuids
+
+class _Plan:
+    """Stato simulato del batch: oggetti esistenti, nuovi e modificati."""
+
+    def __init__(self, user, parsed):
+        self.user = user
+        self.now = timezone.now()
+        self.results = []
+        self.new_ts, self.new_alloc, self.new_photo, self.new_vs = [], [], [], []
+        self.dirty_ts, self.dirty_vs, self.dirty_vehicles = {}, {}, {}
+        self.old_buckets = {}
+        self._load(parsed)
+
+    # --- caricamento (una query per tabella) ---
+    def _load(self, parsed):
+        def ints(name):
+            return {d[name] for _, d, _ in parsed if d and isinstance(d.get(name), int)}
+
+        op_uuids = {d['uuid'] for _, d, _ in parsed if d and 'uuid' in d}
+        ts_ids, ts_uuids = _refs(parsed, 'session')
+        vs_ids, vs_uuids = _refs(parsed, 'vehicle_session')
+        # Solo i campi dell'area di cantiere, per il controllo geofence
+        self.projects = Project.objects.only('id', 'site_lat', 'site_lng', 'site_radius_m').in_bulk(ints('project'))
+        self.work_items = dict(WorkItem.objects.filter(pk__in=ints('work_item')).values_list('id', 'project_id'))
+        self.vehicles = Vehicle.objects.in_bulk(ints('vehicle'))
+
+        self.ts = {}
+        self.open_ts = None
+        qs = TimeSession.objects.filter(user=self.user).filter(
+            Q(pk__in=ts_ids) | Q(client_uuid__in=ts_uuids | op_uuids) | Q(end_time__isnull=True, completed=False)
+        )
+        for ts in qs:
+            self._index_ts(ts)
+            if ts.is_active:
+                self.open_ts = ts
+
+        self.vs = {}
+        self.busy_vehicles = {}
+        self.open_vs = None
+        vehicle_ids = set(self.vehicles)
+        qs = VehicleSession.objects.select_related('vehicle', 'project').filter(
+            Q(user=self.user, pk__in=vs_ids) | Q(user=self.user, client_uuid__in=vs_uuids | op_uuids)
+            | Q(end_time__isnull=True, vehicle_id__in=vehicle_ids) | Q(end_time__isnull=True, user=self.user)
+        )
+        for vs in qs:
+            if vs.user_id == self.user.id:
+                self._index_vs(vs)
+            if vs.end_time is None:
+                self.busy_vehicles[vs.vehicle_id] = vs
+                if vs.user_id == self.user.id:
+                    self.open_vs = vs
+
+        self.seen_alloc = set(TimeSessionAllocation.objects.filter(client_uuid__in=op_uuids).values_list('client_uuid', flat=True))
+        self.seen_photo = set(WorkPhoto.objects.filter(client_uuid__in=op_uuids).values_list('client_uuid', flat=True))
+
+    def _index_ts(self, ts):
+        if ts.pk:
+            self.ts[ts.pk] = ts
+        if ts.client_uuid:
+            self.ts[ts.client_uuid] = ts
+
+    def _index_vs(self, vs):
+        if vs.pk:
+            self.vs[vs.pk] = vs
+        if vs.client_uuid:
+            self.vs[vs.client_uuid] = vs
+
+    # --- esiti ---
+    def ok(self, status, obj):
+        self.results.append({'status': status, 'obj': obj})
+
+    def fail(self, errors):
+        self.results.append({'status': 'error', 'errors': errors})
+
+    def _session(self, ref):
+        ts = self.ts.get(ref)
+        if ts is None:
+            raise _OpError({'session': ["Timbratura non trovata."]})
+        return ts
+
+    # --- operazioni ---
+    def time_start(self, d):
+        if d['uuid'] in self.ts:
+            return self.ok('duplicate', self.ts[d['uuid']])
+        if d['project'] not in self.projects:
+            raise _OpError({'project': ["Progetto non trovato."]})
+        if self.open_ts is not None:
+            raise _OpError({'session': ["Hai già una timbratura attiva. Chiudila prima di avviarne un'altra."]})
+        start = d.get('start_time') or self.now
+        ts = TimeSession(
+            project_id=d['project'], user=self.user, start_time=start, note=d['note'] or None,
+            hourly_rate_eur_snapshot=rate_for(self.user.id, timezone.localdate(start)), client_uuid=d['uuid'],
+            **location_fields('start_', self.projects[d['project']], d.get('lat'), d.get('lng'), d.get('accuracy')),
+        )
+        self.new_ts.append(ts)
+        self._index_ts(ts)
+        self.open_ts = ts
+        self.ok('created', ts)
+
+    def time_stop(self, d):
+        ts = self._session(d['session'])
+        if not ts.is_active:
+            return self.ok('duplicate', ts)
+        end = d.get('end_time') or self.now
+        if end < ts.start_time:
+            raise _OpError({'end_time': ["La fine precede l'inizio della timbratura."]})
+        if ts.pk and ts.pk not in self.dirty_ts:
+            self.old_buckets[ts.pk] = session_buckets(ts)
+            self.dirty_ts[ts.pk] = ts
+        ts.end_time, ts.completed, ts.updated_at = end, True, self.now
+        if self.open_ts is ts:
+            self.open_ts = None
+        self.ok('updated', ts)
+
+    def allocation(self, d):
+        if d['uuid'] in self.seen_alloc:
+            return self.ok('duplicate', None)
+        ts = self._session(d['session'])
+        if self.work_items.get(d['work_item']) != ts.project_id:
+            raise _OpError({'work_item': ["La lavorazione selezionata non appartiene al progetto della timbratura."]})
+        alloc = TimeSessionAllocation(
+            time_session=ts, work_item_id=d['work_item'], minutes_allocated=d.get('minutes_allocated'),
+            percent_allocated=d.get('percent_allocated'), note=d['note'] or None, client_uuid=d['uuid'],
+        )
+        self.new_alloc.append(alloc)
+        self.seen_alloc.add(d['uuid'])
+        self.ok('created', alloc)
+
+    def photo(self, d):
+        if d['uuid'] in self.seen_photo:
+            return self.ok('duplicate', None)
+        if d['project'] not in self.projects:
+            raise _OpError({'project': ["Progetto non trovato."]})
+        ts = self._session(d['session']) if d.get('session') is not None else None
+        if ts is not None and ts.project_id != d['project']:
+            raise _OpError({'session': ["La timbratura appartiene a un altro progetto."]})
+        if d.get('work_item') is not None and self.work_items.get(d['work_item']) != d['project']:
+            raise _OpError({'work_item': ["La lavorazione selezionata non appartiene al progetto scelto."]})
+        photo = WorkPhoto(
+            project_id=d['project'], user=self.user, time_session=ts, work_item_id=d.get('work_item'),
+            url=d['url'], description=d['description'] or None, client_uuid=d['uuid'],
+        )
+        self.new_photo.append(photo)
+        self.seen_photo.add(d['uuid'])
+        self.ok('created', photo)
+
+    def vehicle_checkout(self, d):
+        if d['uuid'] in self.vs:
+            return self.ok('duplicate', self.vs[d['uuid']])
+        v = self.vehicles.get(d['vehicle'])
+        if v is None:
+            raise _OpError({'vehicle': ["Mezzo non trovato."]})
+        if d.get('project') is not None and d['project'] not in self.projects:
+            raise _OpError({'project': ["Progetto non trovato."]})
+        if self.open_vs is not None:
+            raise _OpError({'vehicle': ["Hai già un mezzo in uso. Riconsegnalo prima di ritirarne un altro."]})
+        if v.pk in self.busy_vehicles:
+            raise _OpError({'vehicle': ["Il mezzo è già in uso."]})
+        vs = VehicleSession(
+            vehicle=v, user=self.user, project_id=d.get('project'), start_time=d.get('start_time') or self.now,
+            start_odometer_km=d['start_odometer_km'], start_fuel_percent=d['start_fuel_percent'],
+            notes_out=d['notes_out'] or None, client_uuid=d['uuid'],
+            **location_fields('start_', self.projects.get(d.get('project')), d.get('lat'), d.get('lng'), d.get('accuracy')),
+        )
+        v.status, v.odometer_km, v.fuel_level_percent = 'in_use', vs.start_odometer_km, vs.start_fuel_percent
+        self.dirty_vehicles[v.pk] = v
+        self.new_vs.append(vs)
+        self._index_vs(vs)
+        self.busy_vehicles[v.pk] = self.open_vs = vs
+        self.ok('created', vs)
+
+    def vehicle_checkin(self, d):
+        vs = self.vs.get(d['vehicle_session'])
+        if vs is None:
+            raise _OpError({'vehicle_session': ["Sessione mezzo non trovata."]})
+        if vs.end_time is not None:
+            return self.ok('duplicate', vs)
+        end = d.get('end_time') or self.now
+        if end < vs.start_time:
+            raise _OpError({'end_time': ["La riconsegna precede il ritiro."]})
+        if d['end_odometer_km'] < vs.start_odometer_km:
+            raise _OpError({'end_odometer_km': ["I km finali non possono essere inferiori a quelli iniziali."]})
+        vs.end_time, vs.end_odometer_km, vs.end_fuel_percent = end, d['end_odometer_km'], d['end_fuel_percent']
+        vs.notes_in, vs.damages_report, vs.photos_urls = d['notes_in'] or None, d['damages_report'] or None, d['photos_urls'] or None
+        project = self.projects.get(vs.project_id) or (vs.project if vs.pk and vs.project_id else None)
+        for name, value in location_fields('end_', project, d.get('lat'), d.get('lng'), d.get('accuracy')).items():
+            setattr(vs, name, value)
+        if vs.pk:
+            self.dirty_vs[vs.pk] = vs
+        v = self.vehicles.setdefault(vs.vehicle_id, vs.vehicle)
+        v.status, v.odometer_km, v.fuel_level_percent = 'available', vs.end_odometer_km, vs.end_fuel_percent
+        self.dirty_vehicles[v.pk] = v
+        self.busy_vehicles.pop(v.pk, None)
+        if self.open_vs is vs:
+            self.open_vs = None
+        self.ok('updated', vs)
+
+    # --- scrittura ---
+    def write(self):
+        try:
+            with transaction.atomic():
+                TimeSession.objects.bulk_create(self.new_ts)
+                TimeSession.objects.bulk_update(self.dirty_ts.values(), TS_UPDATE_FIELDS)
+                TimeSessionAllocation.objects.bulk_create(self.new_alloc)
+                WorkPhoto.objects.bulk_create(self.new_photo)
+                VehicleSession.objects.bulk_create(self.new_vs)
+                VehicleSession.objects.bulk_update(self.dirty_vs.values(), VS_UPDATE_FIELDS)
+                Vehicle.objects.bulk_update(self.dirty_vehicles.values(), VEHICLE_UPDATE_FIELDS)
+                record_session_readings(self.new_vs, 'checkout')
+                record_session_readings([vs for vs in self.new_vs + list(self.dirty_vs.values()) if vs.end_time], 'checkin')
+                record_changes('vehicle', self.dirty_vehicles)
+                delta = defaultdict(int)
+                changes = [({}, ts) for ts in self.new_ts] + [(self.old_buckets[pk], ts) for pk, ts in self.dirty_ts.items()]
+                for old, ts in changes:
+                    for key, minutes in diff_buckets(old, session_buckets(ts)).items():
+                        delta[key] += minutes
+                apply_daily_delta(delta)
+        except IntegrityError as exc:
+            raise SyncConflict(str(exc)) from exc
+        if self.new_vs or self.dirty_vs:
+            bump_fleet_version()
+
+class _OpError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+def apply_batch(user, raw_ops):
+    """Valida e applica un batch di operazioni offline. Restituisce (ok, esiti per operazione).
+
+    Se anche una sola operazione non è valida non viene scritto nulla; le operazioni già
+    sincronizzate (stesso uuid, sessione già chiusa) risultano 'duplicate' e non sono errori.
+    """
+    parsed = parse_operations(raw_ops)
+    plan = _Plan(user, parsed)
+    for kind, data, errors in parsed:
+        if errors:
+            plan.fail(errors)
+            continue
+        try:
+            getattr(plan, kind)(data)
+        except _OpError as e:
+            plan.fail(e.errors)
+    ok = all(r['status'] != 'error' for r in plan.results)
+    if ok:
+        plan.write()
+    results = []
+    for i, ((kind, data, _), r) in enumerate(zip(parsed, plan.results)):
+        item = {'index': i, 'op': kind, 'status': r['status'] if ok or r['status'] == 'error' else 'skipped'}
+        if data and 'uuid' in data:
+            item['uuid'] = str(data['uuid'])
+        if r.get('errors'):
+            item['errors'] = r['errors']
+        elif ok and r.get('obj') is not None:
+            item['id'] = r['obj'].pk
+        results.append(item)
+    return ok, results
@@ -0,0 +1,126 @@
+from collections import defaultdict
+
+from django.db.models import F, OuterRef, Subquery, Value, Window
+from django.db.models.functions import Coalesce, FirstValue, Lag
+from django.db.models.expressions import RowRange
+
+from .models import Vehicle, VehicleReading, Project
+
+# ===== TELEMETRIA MEZZI (letture km/carburante) =====
+# Le letture sono append-only. L'analisi lavora sugli intervalli tra due letture consecutive
+# dello stesso mezzo: LAG() in SQL fornisce la lettura precedente, l'intero parco passa in
+# un SELECT letto a blocchi e aggregato in un'unica scansione.
+BATCH = 2000
+FUEL_DROP_NO_KM = 10  # punti % persi senza km percorsi
+MAX_ANOMALIES = 500
+ANOMALY_LABELS = {
+    'odometer_rollback': "Contachilometri tornato indietro",
+    'fuel_drop_no_km': "Calo carburante senza km",
+    'km_outside_session': "Km percorsi fuori sessione",
+}
+
+def session_reading(vs, kind):
+    """Lettura di ritiro (inizio sessione) o riconsegna (fine sessione)."""
+    if kind == 'checkout':
+        at, km, fuel = vs.start_time, vs.start_odometer_km, vs.start_fuel_percent
+    else:
+        at, km, fuel = vs.end_time, vs.end_odometer_km, vs.end_fuel_percent
+    return VehicleReading(vehicle_id=vs.vehicle_id, recorded_at=at, odometer_km=km, fuel_percent=fuel,
+                          kind=kind, session_id=vs.pk, project_id=vs.project_id)
+
+def record_session_readings(sessions, kind):
+    return VehicleReading.objects.bulk_create([session_reading(vs, kind) for vs in sessions], batch_size=BATCH)
+
+def interval_rows(start, end, vehicle_ids=None):
+    """Intervalli (lettura precedente -> lettura) che terminano nel periodo, in ordine per mezzo.
+
+    LAG lavora solo sulle letture del periodo più, per ogni mezzo, l'ultima precedente: il
+    limite inferiore è una subquery correlata sul mezzo (ricerca sull'indice vehicle+recorded_at),
+    quindi l'SQL ha dimensione fissa qualunque sia il parco.
+    """
+    last_before = VehicleReading.objects.filter(
+        vehicle_id=OuterRef('vehicle_id'), recorded_at__lt=start,
+    ).order_by('-recorded_at').values('recorded_at')[:1]
+    w = {'partition_by': [F('vehicle_id')], 'order_by': [F('recorded_at').asc(), F('id').asc()]}
+    qs = VehicleReading.objects.filter(recorded_at__gte=Coalesce(Subquery(last_before), Value(start)), recorded_at__lt=end)
+    if vehicle_ids is not None:
+        qs = qs.filter(vehicle_id__in=vehicle_ids)
+    return qs.annotate(
+        prev_km=Window(Lag('odometer_km'), **w),
+        prev_fuel=Window(Lag('fuel_percent'), **w),
+        prev_at=Window(Lag('recorded_at'), **w),
+        prev_kind=Window(Lag('kind'), **w),
+        prev_session=Window(Lag('session_id'), **w),
+        # recorded_at come espressione window: il filtro sul periodo finisce nella query
+        # esterna, dopo LAG, così il primo intervallo vede la lettura precedente al periodo
+        at=Window(FirstValue('recorded_at'), frame=RowRange(start=0, end=0), **w),
+    ).filter(at__gte=start, prev_at__isnull=False).order_by('vehicle_id', 'recorded_at', 'id').values_list(
+        'vehicle_id', 'project_id', 'session_id', 'kind', 'odometer_km', 'fuel_percent', 'recorded_at',
+        'prev_km', 'prev_fuel', 'prev_at', 'prev_kind', 'prev_session',
+    ).iterator(chunk_size=BATCH)
+
+def fleet_analytics(start, end, vehicle_ids=None):
+    """Km per progetto, consumi per 100 km, tempo fermo e anomalie di tutto il parco nel periodo [start, end).
+
+    Il consumo conta i cali di carburante negli intervalli con km percorsi; i rifornimenti
+    (aumenti) sono sommati a parte. Il fermo è il tempo tra una riconsegna e la lettura successiva.
+    """
+    per_vehicle = defaultdict(lambda: {'km': 0, 'fuel_used_pct': 0, 'refuel_pct': 0, 'idle_seconds': 0, 'anomalies': 0})
+    per_project = defaultdict(lambda: {'km': 0, 'fuel_used_pct': 0})
+    anomalies = []
+
+    def flag(vehicle_id, at, kind, detail):
+        per_vehicle[vehicle_id]['anomalies'] += 1
+        if len(anomalies) < MAX_ANOMALIES:
+            anomalies.append({'vehicle_id': vehicle_id, 'at': at, 'kind': kind, 'label': ANOMALY_LABELS[kind], 'detail': detail})
+
+    for (vehicle_id, project_id, session_id, kind, km, fuel, at,
+         prev_km, prev_fuel, prev_at, prev_kind, prev_session) in interval_rows(start, end, vehicle_ids):
+        v = per_vehicle[vehicle_id]
+        d_km, d_fuel = km - prev_km, fuel - prev_fuel
+        in_session = session_id is not None and session_id == prev_session
+        if d_km < 0:
+            flag(vehicle_id, at, 'odometer_rollback', f"{prev_km} → {km} km")
+            d_km = 0
+        elif d_km > 0 and not in_session:
+            flag(vehicle_id, at, 'km_outside_session', f"{d_km} km")
+        if d_fuel <= -FUEL_DROP_NO_KM and d_km == 0:
+            flag(vehicle_id, at, 'fuel_drop_no_km', f"{prev_fuel}% → {fuel}%")
+        elif d_fuel < 0:
+            v['fuel_used_pct'] -= d_fuel
+            if in_session and project_id:
+                per_project[project_id]['fuel_used_pct'] -= d_fuel
+        elif d_fuel > 0:
+            v['refuel_pct'] += d_fuel
+        v['km'] += d_km
+        if in_session and project_id:
+            per_project[project_id]['km'] += d_km
+        if prev_kind == 'checkin':
+            v['idle_seconds'] += (at - max(prev_at, start)).total_seconds()
+
+    vehicles = Vehicle.objects.in_bulk(list(per_vehicle))
+    projects = Project.objects.only('id', 'name').in_bulk(list(per_project))
+    vehicle_rows = []
+    for pk, v in per_vehicle.items():
+        vehicle = vehicles.get(pk)
+        if vehicle is None:
+            continue
+        pct_100 = round(v['fuel_used_pct'] * 100 / v['km'], 2) if v['km'] else None
+        vehicle_rows.append({
+            'vehicle_id': pk, 'plate': vehicle.plate, 'name': vehicle.name,
+            'km': v['km'], 'fuel_used_pct': v['fuel_used_pct'], 'refuel_pct': v['refuel_pct'],
+            'fuel_pct_per_100km': pct_100,
+            'liters_per_100km': round(pct_100 * vehicle.tank_liters / 100, 2) if pct_100 is not None and vehicle.tank_liters else None,
+            'idle_hours': round(v['idle_seconds'] / 3600, 1),
+            'anomalies': v['anomalies'],
+        })
+    for a in anomalies:
+        a['plate'] = vehicles[a['vehicle_id']].plate if a['vehicle_id'] in vehicles else ''
+    return {
+        'total_km': sum(r['km'] for r in vehicle_rows),
+        'vehicles': sorted(vehicle_rows, key=lambda r: r['plate']),
+        'projects': sorted(({'project_id': pk, 'name': projects[pk].name if pk in projects else f"#{pk}", **p}
+                            for pk, p in per_project.items()), key=lambda r: -r['km']),
+        'anomalies': anomalies,
+        'anomaly_count': sum(v['anomalies'] for v in per_vehicle.values()),
+    }
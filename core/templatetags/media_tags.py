@@ -0,0 +1,15 @@
+from django import template
+
+from core.images import thumbnail_url
+
+register = template.Library()
+
+@register.simple_tag
+def thumb(url, size='sm'):
+    """{% thumb url 'sm' %} -> URL della miniatura (o dell'originale se non disponibile)."""
+    return thumbnail_url(url, size)
+
+@register.filter
+def lines(value):
+    """Testo con un URL per riga -> lista di URL non vuoti."""
+    return [line.strip() for line in (value or '').splitlines() if line.strip()]
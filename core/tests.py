@@ -0,0 +1,506 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import uploads
+from .authentication import CachedJWTAuthentication, ClaimsCache, claims_cache
+from .broadcasts import fan_out
+from .changes import changes_since
+from .folders import breadcrumbs, folder_tree
+from .geo import location_fields, within
+from .kpi import project_kpis
+from .labor import compute_labor_costs
+from .telemetry import interval_rows
+from .time_summary import summarize_sessions
+from .sync import apply_batch
+from .images import local_media_path, thumbnail_url
+from .models import (
+    Project, WorkItem, StoredFile, TimeSession, TimeSessionAllocation, WorkPhoto, Vehicle, VehicleSession,
+    VehicleReading, DailyHours, ChangeLog, BroadcastDoc, HourlyRate, UserFile, UserFolder,
+)
+from .tree import path_ids
+
+# ===== ALBERO LAVORAZIONI (materialized path) =====
+class WorkItemTreeTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name='Cantiere')
+        self.a = WorkItem.objects.create(project=self.project, name='A')
+        self.a1 = WorkItem.objects.create(project=self.project, name='A1', parent=self.a)
+        self.a11 = WorkItem.objects.create(project=self.project, name='A11', parent=self.a1)
+        self.b = WorkItem.objects.create(project=self.project, name='B')
+
+    def fresh(self, wi):
+        return WorkItem.objects.get(pk=wi.pk)
+
+    def test_paths_follow_parents(self):
+        a11 = self.fresh(self.a11)
+        self.assertEqual(path_ids(a11.path), [self.a.pk, self.a1.pk, self.a11.pk])
+        self.assertEqual(a11.depth, 2)
+        self.assertEqual(list(self.fresh(self.a).get_descendants()), [self.fresh(self.a1), a11])
+
+    def test_move_subtree_rewrites_descendants(self):
+        a1 = self.fresh(self.a1)
+        a1.parent = self.b
+        a1.save()
+        a11 = self.fresh(self.a11)
+        self.assertEqual(path_ids(a11.path), [self.b.pk, self.a1.pk, self.a11.pk])
+        self.assertEqual(a11.depth, 2)
+        self.assertEqual([w.pk for w in self.fresh(self.b).get_descendants()], [self.a1.pk, self.a11.pk])
+        self.assertFalse(self.fresh(self.a).get_descendants().exists())
+
+    def test_move_to_root_shortens_paths(self):
+        a1 = self.fresh(self.a1)
+        a1.parent = None
+        a1.save()
+        self.assertEqual(self.fresh(self.a1).depth, 0)
+        self.assertEqual(path_ids(self.fresh(self.a11).path), [self.a1.pk, self.a11.pk])
+
+    def test_move_under_own_descendant_is_rejected(self):
+        a = self.fresh(self.a)
+        a.parent = self.a11
+        with self.assertRaises(ValidationError):
+            a.full_clean()
+        with self.assertRaises(ValueError):
+            a.save()
+        # Rifiutato in pre_save: parent e path restano quelli di prima anche senza transazione
+        self.assertIsNone(self.fresh(self.a).parent_id)
+        self.assertEqual(path_ids(self.fresh(self.a11).path), [self.a.pk, self.a1.pk, self.a11.pk])
+
+    def test_delete_detaches_descendants(self):
+        self.fresh(self.a).delete()
+        a1, a11 = self.fresh(self.a1), self.fresh(self.a11)
+        self.assertIsNone(a1.parent_id)
+        self.assertEqual((path_ids(a1.path), a1.depth), ([self.a1.pk], 0))
+        self.assertEqual((path_ids(a11.path), a11.depth), ([self.a1.pk, self.a11.pk], 1))
+
+# ===== MINIATURE: URL locali =====
+class LocalMediaPathTests(TestCase):
+    def test_url_inside_media_root(self):
+        path = local_media_path('http://host/media/photos/a.jpg')
+        self.assertEqual(path, os.path.join(os.path.realpath(settings.MEDIA_ROOT), 'photos', 'a.jpg'))
+
+    def test_dot_dot_url_is_rejected(self):
+        for url in ('http://host/media/../../etc/x.jpg', 'http://host/media/photos/../../settings.py',
+                    'http://host/media/%2e%2e/%2e%2e/etc/x.jpg', 'http://host/media/'):
+            self.assertIsNone(local_media_path(url), url)
+        self.assertEqual(thumbnail_url('http://host/media/../../etc/x.jpg'), 'http://host/media/../../etc/x.jpg')
+
+    def test_remote_url(self):
+        self.assertIsNone(local_media_path('https://cdn.example.com/a.jpg'))
+
+# ===== UPLOAD A BLOCCHI =====
+class ChunkedUploadTests(TestCase):
+    DATA = b'0123456789' * 10
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('operaio')
+
+    def start(self, user=None, **kwargs):
+        return uploads.start_upload(user or self.user, 'foto.jpg', len(self.DATA), **kwargs)
+
+    def put(self, upload, offset, data):
+        return uploads.write_chunk(upload.pk, upload.user, offset, io.BytesIO(data))
+
+    def test_chunks_resume_and_finalize(self):
+        upload = self.start()
+        self.assertEqual(self.put(upload, 0, self.DATA[:40]).received, 40)
+        # Ripresa dopo una risposta persa: l'offset sbagliato riporta quello corrente
+        with self.assertRaises(uploads.UploadError) as ctx:
+            self.put(upload, 0, self.DATA[:40])
+        self.assertEqual((ctx.exception.status, ctx.exception.offset), (409, 40))
+        self.assertEqual(uploads.current_offset(upload), 40)
+        done = self.put(upload, 40, self.DATA[40:])
+        self.assertTrue(done.is_complete)
+        self.assertEqual(done.stored_file.sha256, hashlib.sha256(self.DATA).hexdigest())
+        with open(os.path.join(self.media, done.stored_file.path), 'rb') as fh:
+            self.assertEqual(fh.read(), self.DATA)
+        self.assertEqual(os.listdir(os.path.join(self.media, uploads.TMP_DIR)), [])
+
+    def test_chunk_past_declared_size_is_rejected(self):
+        upload = self.start()
+        self.put(upload, 0, self.DATA[:90])
+        with self.assertRaises(uploads.UploadError) as ctx:
+            self.put(upload, 90, self.DATA[:20])
+        self.assertEqual(ctx.exception.status, 413)
+        self.assertEqual(uploads.current_offset(upload), 90)
+        self.assertEqual(os.listdir(os.path.join(self.media, uploads.TMP_DIR)), [f"{upload.pk}.part"])
+
+    def test_declared_hash_completes_only_for_own_files(self):
+        upload = self.put(self.start(), 0, self.DATA)
+        digest = hashlib.sha256(self.DATA).hexdigest()
+        self.assertTrue(self.start(sha256=digest).is_complete)
+        other = self.start(user=User.objects.create_user('altro'), sha256=digest)
+        self.assertFalse(other.is_complete)
+        # Con i byte il contenuto è comunque deduplicato
+        self.assertEqual(self.put(other, 0, self.DATA).stored_file, upload.stored_file)
+        self.assertEqual(StoredFile.objects.count(), 1)
+
+# ===== SYNC OFFLINE A BATCH =====
+class SyncBatchReplayTests(TestCase):
+    TS, ALLOC, PHOTO, VS = (str(uuid.UUID(int=i)) for i in range(1, 5))
+
+    def setUp(self):
+        self.user = User.objects.create_user('operaio')
+        self.project = Project.objects.create(name='Cantiere')
+        self.wi = WorkItem.objects.create(project=self.project, name='Getto')
+        self.vehicle = Vehicle.objects.create(plate='AB123CD', name='Furgone', odometer_km=1000, fuel_level_percent=80)
+        start = timezone.now() - timezone.timedelta(hours=3)
+        self.ops = [
+            {'op': 'time_start', 'uuid': self.TS, 'project': self.project.pk, 'start_time': start.isoformat()},
+            {'op': 'allocation', 'uuid': self.ALLOC, 'session': self.TS, 'work_item': self.wi.pk, 'minutes_allocated': 60},
+            {'op': 'photo', 'uuid': self.PHOTO, 'project': self.project.pk, 'session': self.TS, 'url': 'https://example.com/a.jpg'},
+            {'op': 'vehicle_checkout', 'uuid': self.VS, 'vehicle': self.vehicle.pk, 'project': self.project.pk,
+             'start_time': start.isoformat(), 'start_odometer_km': 1000, 'start_fuel_percent': 80},
+            {'op': 'vehicle_checkin', 'vehicle_session': self.VS, 'end_odometer_km': 1040, 'end_fuel_percent': 70},
+            {'op': 'time_stop', 'session': self.TS},
+        ]
+
+    def state(self):
+        return (
+            TimeSession.objects.count(), TimeSessionAllocation.objects.count(), WorkPhoto.objects.count(),
+            VehicleSession.objects.count(), VehicleReading.objects.count(),
+            list(DailyHours.objects.values_list('day', 'minutes')),
+            Vehicle.objects.values_list('status', 'odometer_km').get(pk=self.vehicle.pk),
+        )
+
+    def test_replay_is_idempotent(self):
+        ok, results = apply_batch(self.user, self.ops)
+        self.assertTrue(ok)
+        self.assertEqual([r['status'] for r in results], ['created'] * 4 + ['updated'] * 2)
+        first = self.state()
+        self.assertEqual(first[:5], (1, 1, 1, 1, 2))
+        self.assertEqual(sum(m for _, m in first[5]), 180)
+        self.assertEqual(first[6], ('available', 1040))
+
+        ok, results = apply_batch(self.user, self.ops)
+        self.assertTrue(ok)
+        self.assertEqual([r['status'] for r in results], ['duplicate'] * 6)
+        self.assertEqual(self.state(), first)
+
+    def test_partial_replay_then_rest(self):
+        # Risposta persa dopo i primi tre: il telefono rimanda tutta la coda
+        self.assertTrue(apply_batch(self.user, self.ops[:3])[0])
+        ok, results = apply_batch(self.user, self.ops)
+        self.assertTrue(ok)
+        self.assertEqual([r['status'] for r in results], ['duplicate'] * 3 + ['created', 'updated', 'updated'])
+        self.assertEqual(self.state()[:5], (1, 1, 1, 1, 2))
+
+    def test_invalid_operation_writes_nothing(self):
+        ops = self.ops + [{'op': 'allocation', 'uuid': str(uuid.uuid4()), 'session': self.TS, 'work_item': 999999, 'minutes_allocated': 5}]
+        ok, results = apply_batch(self.user, ops)
+        self.assertFalse(ok)
+        self.assertEqual(results[-1]['status'], 'error')
+        self.assertEqual(results[0]['status'], 'skipped')
+        self.assertEqual(self.state()[:6], (0, 0, 0, 0, 0, []))
+
+# ===== DELTA SYNC: token del journal =====
+class ChangesSinceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('operaio')
+        self.old = [Project.objects.create(name=f'P{i}') for i in range(3)]
+        # Righe del journal ormai consolidate (più vecchie del margine)
+        ChangeLog.objects.update(created_at=timezone.now() - timezone.timedelta(minutes=5))
+        self.settled = ChangeLog.objects.order_by('-id').first().id
+
+    def test_token_stops_before_recent_rows(self):
+        fresh = Project.objects.create(name='Nuovo')
+        delta = changes_since(self.user, 0)
+        # Tutto consegnato, ma il token resta sotto le righe che potrebbero avere vicini ancora in volo
+        self.assertEqual(delta['tables']['project']['upsert'], {p.pk for p in self.old} | {fresh.pk})
+        self.assertEqual(delta['token'], self.settled)
+        again = changes_since(self.user, delta['token'])
+        self.assertEqual(again['tables']['project']['upsert'], {fresh.pk})
+        self.assertEqual(again['token'], self.settled)
+
+    @override_settings(SYNC_TOKEN_LAG_SECONDS=0)
+    def test_token_reaches_head_once_rows_settle(self):
+        Project.objects.create(name='Nuovo')
+        delta = changes_since(self.user, 0)
+        self.assertEqual(delta['token'], ChangeLog.objects.order_by('-id').first().id)
+        self.assertEqual(changes_since(self.user, delta['token'])['tables'], {})
+
+    def test_paging_never_passes_safe_point(self):
+        fresh = [Project.objects.create(name=f'N{i}') for i in range(3)]
+        first = changes_since(self.user, 0, limit=2)
+        self.assertTrue(first['more'])
+        second = changes_since(self.user, first['token'], limit=2)
+        self.assertEqual((second['token'], second['more']), (self.settled, True))
+        self.assertEqual(second['tables']['project']['upsert'], {self.old[2].pk, fresh[0].pk})
+        # Da qui in poi solo righe recenti: nessun avanzamento, il client riprova al prossimo giro
+        third = changes_since(self.user, second['token'], limit=2)
+        self.assertEqual((third['token'], third['more']), (self.settled, False))
+        self.assertEqual(third['tables']['project']['upsert'], {fresh[0].pk, fresh[1].pk})
+
+    def test_broadcasts_only_reach_recipients(self):
+        staff = User.objects.create_user('ufficio', is_staff=True)
+        doc = BroadcastDoc.objects.create(title='Circolare', file_url='https://example.com/c.pdf', audience='staff')
+        self.assertNotIn('broadcastdoc', changes_since(staff, 0)['tables'])
+        fan_out(doc.pk)
+        self.assertEqual(changes_since(staff, 0)['tables']['broadcastdoc']['upsert'], {doc.pk})
+        self.assertNotIn('broadcastdoc', changes_since(self.user, 0)['tables'])
+        doc_id = doc.pk
+        doc.delete()
+        self.assertEqual(changes_since(self.user, 0)['tables']['broadcastdoc']['delete'], {doc_id})
+
+# ===== CIRCOLARI: invio a blocchi =====
+class BroadcastFanOutTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'operaio{i}') for i in range(5)]
+        self.doc = BroadcastDoc.objects.create(title='Circolare', file_url='https://example.com/c.pdf', audience='workers')
+
+    def copies(self):
+        return sorted(UserFile.objects.filter(broadcast=self.doc).values_list('owner_id', flat=True))
+
+    def test_resend_only_reaches_new_recipients(self):
+        self.assertEqual(fan_out(self.doc.pk, batch_size=2), 5)
+        self.assertEqual(fan_out(self.doc.pk, batch_size=2), 0)
+        late = User.objects.create_user('nuovo')
+        self.assertEqual(fan_out(self.doc.pk, batch_size=2), 1)
+        self.assertEqual(self.copies(), sorted([u.pk for u in self.users] + [late.pk]))
+        self.assertEqual(UserFolder.objects.filter(owner=late, name='Circolari').count(), 1)
+
+    def test_interrupted_send_keeps_committed_batches_and_resumes(self):
+        real = UserFile.objects.bulk_create
+        calls = []
+        def failing(objs, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('interrotto')
+            return real(objs, *args, **kwargs)
+        with mock.patch.object(UserFile.objects, 'bulk_create', side_effect=failing):
+            with self.assertRaises(RuntimeError):
+                fan_out(self.doc.pk, batch_size=2)
+        self.assertEqual(len(self.copies()), 2)
+        self.doc.refresh_from_db()
+        self.assertIsNone(self.doc.sent_at)
+        self.assertEqual(fan_out(self.doc.pk, batch_size=2), 3)
+        self.assertEqual(self.copies(), sorted(u.pk for u in self.users))
+
+    def test_send_view_404_for_missing_broadcast(self):
+        self.client.force_login(User.objects.create_user('ufficio', is_staff=True))
+        response = self.client.post(reverse('broadcasts_send', args=[self.doc.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+# ===== CARTELLE HR =====
+class FolderTreeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('operaio')
+        self.other = User.objects.create_user('altro')
+        self.root = UserFolder.objects.create(owner=self.user, name='Buste paga')
+        self.year = UserFolder.objects.create(owner=self.user, name='2026', parent=self.root)
+        self.month = UserFolder.objects.create(owner=self.user, name='Marzo', parent=self.year)
+        self.docs = UserFolder.objects.create(owner=self.user, name='Contratti')
+
+    def add_file(self, folder, **kwargs):
+        return UserFile.objects.create(owner=folder.owner, folder=folder, title='Documento', file_url='https://example.com/d.pdf', **kwargs)
+
+    def counts(self):
+        return {f.name: (f.depth, f.n_files, f.n_unread, f.n_pending_ack, f.n_children) for f in folder_tree(self.user)}
+
+    def test_counts_include_subfolders_in_one_query(self):
+        self.add_file(self.root)
+        self.add_file(self.month, requires_ack=True)
+        self.add_file(self.month, read_at=timezone.now())
+        self.add_file(self.docs)
+        self.add_file(UserFolder.objects.create(owner=self.other, name='Buste paga'))
+        with self.assertNumQueries(1):
+            counts = self.counts()
+        self.assertEqual(counts, {
+            'Buste paga': (0, 3, 2, 1, 1), '2026': (1, 2, 1, 1, 1), 'Marzo': (2, 2, 1, 1, 0), 'Contratti': (0, 1, 1, 0, 0),
+        })
+        self.assertEqual([f.name for f in folder_tree(self.user)], ['Buste paga', '2026', 'Marzo', 'Contratti'])
+
+    def test_move_rewrites_subtree_and_counts(self):
+        self.add_file(self.month)
+        self.year.parent = self.docs
+        self.year.save()
+        self.month.refresh_from_db()
+        self.assertEqual(path_ids(self.month.path), [self.docs.pk, self.year.pk, self.month.pk])
+        self.assertEqual(self.month.depth, 2)
+        self.assertEqual([f.pk for f in breadcrumbs(self.month)], [self.docs.pk, self.year.pk])
+        counts = self.counts()
+        self.assertEqual(counts['Buste paga'][1], 0)
+        self.assertEqual(counts['Contratti'][1], 1)
+        self.year.parent = self.month
+        with self.assertRaises(ValidationError):
+            self.year.full_clean()
+        with self.assertRaises(ValueError):
+            self.year.save()
+        self.year.refresh_from_db()
+        self.assertEqual(self.year.parent_id, self.docs.pk)
+
+# ===== JWT: cache utenti in processo =====
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        claims_cache.clear()
+        self.addCleanup(claims_cache.clear)
+        self.user = User.objects.create_user('operaio', email='op@example.com', is_staff=True)
+        self.token = AccessToken.for_user(self.user)
+        self.auth = CachedJWTAuthentication()
+
+    def test_cached_hits_build_a_fresh_user_without_queries(self):
+        first = self.auth.get_user(self.token)
+        with self.assertNumQueries(0):
+            second = self.auth.get_user(self.token)
+            third = self.auth.get_user(self.token)
+        self.assertIsNot(second, third)
+        self.assertEqual((second.pk, second.username, second.email, second.is_staff), (first.pk, 'operaio', 'op@example.com', True))
+        second._request_only = True
+        self.assertFalse(hasattr(third, '_request_only'))
+
+    @override_settings(JWT_USER_STAMP_CACHE='default')
+    def test_deactivation_is_seen_by_other_processes_with_stamp_cache(self):
+        self.auth.get_user(self.token)
+        other = ClaimsCache()
+        other.put(self.user.pk, self.user)
+        self.assertIsNotNone(other.get(self.user.pk))
+        self.user.is_active = False
+        self.user.save()
+        # Il signal invalida la cache del processo e, col timbro condiviso, anche l'altra
+        self.assertIsNone(other.get(self.user.pk))
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+    def test_without_stamp_cache_other_processes_wait_for_ttl(self):
+        other, expired = ClaimsCache(), ClaimsCache(ttl=-1)
+        other.put(self.user.pk, self.user)
+        expired.put(self.user.pk, self.user)
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+        self.assertTrue(other.get(self.user.pk)[0].is_active)
+        self.assertIsNone(expired.get(self.user.pk))
+
+    def test_password_change_revokes_cached_token(self):
+        self.auth.get_user(self.token)
+        self.user.set_password('nuova-password')
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+# ===== KPI PROGETTO / COSTI MANODOPERA =====
+class LaborCostConsistencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('operaio')
+        self.project = Project.objects.create(name='Cantiere', budget_eur=1000)
+        self.start = timezone.now() - timezone.timedelta(days=10)
+        HourlyRate.objects.create(user=self.user, valid_from=self.start.date() - timezone.timedelta(days=30), rate_eur=20)
+        for days, hours, rate in ((9, 8, 20), (5, 4, 20), (2, 3, 25)):
+            begin = timezone.now() - timezone.timedelta(days=days)
+            TimeSession.objects.create(user=self.user, project=self.project, start_time=begin,
+                                       end_time=begin + timezone.timedelta(hours=hours), completed=True, hourly_rate_eur_snapshot=rate)
+
+    def labor_screen(self):
+        rows = compute_labor_costs(self.start - timezone.timedelta(days=1), timezone.now(), project_id=self.project.pk)['by_project']
+        return rows[0]['cost']
+
+    def test_kpi_and_labor_screen_agree(self):
+        self.assertEqual(project_kpis([self.project.pk])[self.project.pk]['labor_eur'], self.labor_screen())
+        self.assertEqual(self.labor_screen(), Decimal('315.00'))
+
+    def test_retroactive_rate_edit_changes_neither(self):
+        before = project_kpis([self.project.pk])[self.project.pk]['labor_eur']
+        HourlyRate.objects.create(user=self.user, valid_from=self.start.date(), rate_eur=40)
+        self.assertEqual(project_kpis([self.project.pk])[self.project.pk]['labor_eur'], before)
+        self.assertEqual(self.labor_screen(), before)
+
+    def test_snapshot_edit_refreshes_cached_kpi(self):
+        project_kpis([self.project.pk])
+        ts = TimeSession.objects.get(hourly_rate_eur_snapshot=25)
+        ts.hourly_rate_eur_snapshot = 30
+        ts.save()
+        self.assertEqual(project_kpis([self.project.pk])[self.project.pk]['labor_eur'], self.labor_screen())
+        self.assertEqual(self.labor_screen(), Decimal('330.00'))
+
+# ===== RIEPILOGO TIMBRATURE =====
+class SessionSummaryTests(TestCase):
+    def test_summary_uses_the_model_allocation_rule(self):
+        user = User.objects.create_user('operaio')
+        project = Project.objects.create(name='Cantiere')
+        wi = WorkItem.objects.create(project=project, name='Getto')
+        start = timezone.now() - timezone.timedelta(hours=4)
+        ts = TimeSession.objects.create(user=user, project=project, start_time=start, end_time=start + timezone.timedelta(minutes=240), completed=True)
+        both = TimeSessionAllocation.objects.create(time_session=ts, work_item=wi, minutes_allocated=30, percent_allocated=50)
+        pct = TimeSessionAllocation.objects.create(time_session=ts, work_item=wi, percent_allocated=Decimal('12.5'))
+        summary = summarize_sessions([ts])[ts.pk]
+        self.assertEqual([m for _, m in summary.rows], [both.allocated_minutes(240), pct.allocated_minutes(240)])
+        self.assertEqual((summary.duration, summary.allocated, summary.remaining), (240, 60, 180))
+        self.assertEqual(TimeSessionAllocation.resolve_minutes(240, 30, Decimal('12.5')), 60)
+        ts.end_time = start - timezone.timedelta(minutes=5)
+        self.assertEqual(ts.minutes_until(), 0)
+
+# ===== TELEMETRIA MEZZI =====
+class IntervalRowsTests(TestCase):
+    def setUp(self):
+        self.van = Vehicle.objects.create(plate='AA000AA', name='Furgone')
+        self.truck = Vehicle.objects.create(plate='BB000BB', name='Camion')
+        self.start = timezone.now() - timezone.timedelta(days=10)
+        self.end = timezone.now()
+        for days, km in ((400, 100), (200, 500), (30, 900), (8, 950), (3, 990)):
+            self.read(self.van, days, km)
+        self.read(self.truck, 5, 10)
+        self.read(self.truck, 1, 40)
+
+    def read(self, vehicle, days_ago, km):
+        return VehicleReading.objects.create(vehicle=vehicle, recorded_at=timezone.now() - timezone.timedelta(days=days_ago),
+                                             odometer_km=km, fuel_percent=50, kind='manual')
+
+    def test_first_interval_sees_last_reading_before_period(self):
+        rows = [(v, km, prev_km) for v, _, _, _, km, _, _, prev_km, *_ in interval_rows(self.start, self.end)]
+        self.assertEqual(rows, [(self.van.pk, 950, 900), (self.van.pk, 990, 950), (self.truck.pk, 40, 10)])
+
+    def test_vehicle_filter(self):
+        rows = list(interval_rows(self.start, self.end, [self.truck.pk]))
+        self.assertEqual([r[4] for r in rows], [40])
+
+# ===== GEOFENCE =====
+class GeofenceTests(TestCase):
+    SITE = (45.4642, 9.19)
+
+    def setUp(self):
+        self.user = User.objects.create_user('operaio')
+        self.project = Project.objects.create(name='Cantiere', site_lat=self.SITE[0], site_lng=self.SITE[1], site_radius_m=200)
+
+    def clock_in(self, lat, lng, accuracy=None):
+        ts = TimeSession.objects.create(user=self.user, project=self.project, start_time=timezone.now(), end_time=timezone.now(),
+                                        completed=True, **location_fields('start_', self.project, lat, lng, accuracy))
+        return ts.pk
+
+    def test_within_matches_distance(self):
+        near = self.clock_in(self.SITE[0] + 0.0012, self.SITE[1])   # ~133 m
+        far = self.clock_in(self.SITE[0] + 0.0030, self.SITE[1])    # ~333 m
+        ids = set(within(TimeSession.objects.all(), 'start_', *self.SITE, 200).values_list('pk', flat=True))
+        self.assertEqual(ids, {near})
+        self.assertEqual(dict(TimeSession.objects.values_list('pk', 'start_in_geofence')), {near: True, far: False})
+
+    def test_moving_the_site_refreshes_flags(self):
+        near = self.clock_in(self.SITE[0] + 0.0012, self.SITE[1])
+        far = self.clock_in(self.SITE[0] + 0.0030, self.SITE[1])
+        self.project.site_radius_m = 400
+        self.project.save()
+        self.assertEqual(dict(TimeSession.objects.values_list('pk', 'start_in_geofence')), {near: True, far: True})
+        self.project.site_lat += 0.01  # ~1,1 km più a nord
+        self.project.save()
+        self.assertEqual(dict(TimeSession.objects.values_list('pk', 'start_in_geofence')), {near: False, far: False})
@@ -0,0 +1,40 @@
+from dataclasses import dataclass, field
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+
+from .models import TimeSessionAllocation
+
+# ===== RIEPILOGO TIMBRATURE (allocato / residuo / sovra-allocato) =====
+@dataclass
+class SessionSummary:
+    duration: int
+    allocated: int = 0
+    rows: list = field(default_factory=list)  # [(allocazione, minuti)]
+
+    @property
+    def remaining(self): return max(self.duration - self.allocated, 0)
+    @property
+    def over(self): return max(self.allocated - self.duration, 0)
+    @property
+    def allocated_pct(self): return min(100, self.allocated * 100 // self.duration) if self.duration else 0
+
+def summarize_sessions(sessions, now=None):
+    """Riepilogo per molte timbrature con una sola query sulle allocazioni (lavorazioni incluse).
+
+    Imposta ts.summary su ogni timbratura e restituisce {id: SessionSummary}.
+    """
+    sessions = list(sessions)
+    now = now or timezone.now()
+    prefetch_related_objects(sessions, Prefetch(
+        'allocations',
+        queryset=TimeSessionAllocation.objects.select_related('work_item').order_by('id'),
+    ))
+    out = {}
+    for ts in sessions:
+        summary = SessionSummary(duration=ts.minutes_until(now))
+        for alloc in ts.allocations.all():
+            minutes = alloc.allocated_minutes(summary.duration)
+            summary.rows.append((alloc, minutes))
+            summary.allocated += minutes
+        ts.summary = out[ts.pk] = summary
+    return out
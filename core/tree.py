@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+
+from .models import WorkItem, Project
+
+# ===== ALBERO LAVORAZIONI (materialized path) =====
+# Ogni livello del path è un segmento a larghezza fissa: sort_order (spostato in
+# positivo) + id, in base 36. L'ordine lessicografico del path è quindi il
+# pre-order dell'albero con i figli ordinati per (sort_order, id).
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+KEY_WIDTH = 7
+SEGMENT_WIDTH = KEY_WIDTH * 2
+SORT_OFFSET = 2 ** 31
+
+def _b36(n, width=KEY_WIDTH):
+    out = ''
+    while n:
+        n, r = divmod(n, 36)
+        out = DIGITS[r] + out
+    return out.rjust(width, '0')
+
+def path_segment(sort_order, pk):
+    return _b36(sort_order + SORT_OFFSET) + _b36(pk)
+
+def path_ids(path):
+    return [int(path[i + KEY_WIDTH:i + SEGMENT_WIDTH], 36) for i in range(0, len(path), SEGMENT_WIDTH)]
+
+def bump_tree_version(project_id):
+    """Invalida il frammento HTML in cache dell'albero del progetto."""
+    Project.objects.filter(pk=project_id).update(tree_version=F('tree_version') + 1)
+
+def sync_path(wi, created=False):
+    """Ricalcola path/depth di un nodo e, se cambiati, riscrive il sottoalbero con un solo UPDATE.
+
+    Vale per ogni modello con parent/path/depth (lavorazioni, cartelle HR); senza sort_order
+    i fratelli sono ordinati per id.
+    """
+    model = type(wi)
+    parent_path, parent_depth = '', -1
+    if wi.parent_id:
+        parent_path, parent_depth = model.objects.values_list('path', 'depth').get(pk=wi.parent_id)
+    old_path, old_depth = ('', 0) if created else model.objects.values_list('path', 'depth').get(pk=wi.pk)
+    new_path = parent_path + path_segment(getattr(wi, 'sort_order', 0), wi.pk)
+    new_depth = parent_depth + 1
+    if new_path != old_path or new_depth != old_depth:
+        if old_path:
+            # Nodo e discendenti in un solo UPDATE (prefisso, non range: indipendente dalla collation)
+            model.objects.filter(**{model.TREE_SCOPE: getattr(wi, model.TREE_SCOPE)}, path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        else:
+            model.objects.filter(pk=wi.pk).update(path=new_path, depth=new_depth)
+    wi.path, wi.depth = new_path, new_depth
+
+def check_parent(node):
+    """Rifiuta un padre che è il nodo stesso o sta nel suo sottoalbero (pre_save: il ciclo non arriva al DB)."""
+    if node.pk is None or node.parent_id is None:
+        return
+    paths = dict(type(node).objects.filter(pk__in=[node.pk, node.parent_id]).values_list('pk', 'path'))
+    own = paths.get(node.pk)
+    if node.parent_id == node.pk or (own and paths.get(node.parent_id, '').startswith(own)):
+        raise ValueError(f"{type(node).__name__} #{node.pk}: il nuovo padre è nel suo sottoalbero")
+
+def detach_descendants(wi):
+    """Dopo la cancellazione di un nodo i figli diventano radici (parent SET_NULL): accorcia i loro path."""
+    if not wi.path:
+        return
+    WorkItem.objects.filter(project_id=wi.project_id, path__startswith=wi.path).update(
+        path=Substr('path', len(wi.path) + 1),
+        depth=F('depth') - (wi.depth + 1),
+    )
+
+def compute_paths(rows):
+    """Da righe (id, parent_id, sort_order) calcola (id, path, depth) per tutti i nodi, senza ricorsione."""
+    rows = list(rows)
+    known = {pk for pk, _, _ in rows}
+    by_parent = {}
+    for pk, parent_id, sort_order in rows:
+        by_parent.setdefault(parent_id if parent_id in known else None, []).append((pk, sort_order))
+    stack = [(pk, so, '', 0) for pk, so in by_parent.get(None, [])]
+    while stack:
+        pk, sort_order, prefix, depth = stack.pop()
+        path = prefix + path_segment(sort_order, pk)
+        yield pk, path, depth
+        stack.extend((kid, so, path, depth + 1) for kid, so in by_parent.get(pk, []))
+
+def rebuild_paths(project_id=None):
+    """Ricostruisce path/depth di tutte le lavorazioni (o di un progetto) partendo dai parent."""
+    qs = WorkItem.objects.all()
+    if project_id is not None:
+        qs = qs.filter(project_id=project_id)
+    changed = [WorkItem(pk=pk, path=path, depth=depth)
+               for pk, path, depth in compute_paths(qs.values_list('id', 'parent_id', 'sort_order'))]
+    with transaction.atomic():
+        WorkItem.objects.bulk_update(changed, ['path', 'depth'], batch_size=1000)
+        projects = Project.objects.all() if project_id is None else Project.objects.filter(pk=project_id)
+        projects.update(tree_version=F('tree_version') + 1)
+    return len(changed)
@@ -0,0 +1,161 @@
+import os
+import re
+import shutil
+import uuid
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+
+from .images import file_sha256
+from .models import StoredFile, UploadSession, WorkPhoto, TimeSession, WorkItem, CostDocument, UserFile, VehicleSession
+
+# ===== UPLOAD A BLOCCHI, RIPRENDIBILI, DEDUPLICATI =====
+CHUNK = 64 * 1024
+TMP_DIR = 'uploads/tmp'
+BLOB_DIR = 'blobs'
+
+class UploadError(Exception):
+    """Errore di protocollo: status HTTP e, se utile, offset corrente lato server."""
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+def max_bytes():
+    return getattr(settings, 'UPLOAD_MAX_BYTES', 50 * 1024 * 1024)
+
+def _media(rel):
+    return os.path.join(settings.MEDIA_ROOT, rel)
+
+def part_path(upload):
+    return _media(os.path.join(TMP_DIR, f"{upload.pk}.part"))
+
+def _extension(filename):
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return ext if re.fullmatch(r'[a-z0-9]{1,8}', ext) else 'bin'
+
+def start_upload(user, filename, size, sha256=None, content_type=''):
+    """Apre una sessione di upload.
+
+    Se il client dichiara lo SHA-256 di un file che lo stesso utente ha già caricato la
+    sessione è chiusa subito (dedup senza reinvio). Per contenuti caricati da altri i byte
+    vanno inviati comunque: conoscere hash e dimensione non basta per ottenere il file.
+    """
+    if size < 0 or size > max_bytes():
+        raise UploadError("Dimensione file non consentita.", status=413)
+    upload = UploadSession(user=user, filename=(filename or 'file')[:200], size=size, content_type=(content_type or '')[:100])
+    if sha256:
+        existing = StoredFile.objects.filter(sha256=sha256.lower(), size=size, uploads__user=user).first()
+        if existing:
+            upload.stored_file = existing
+            upload.received = size
+    upload.save()
+    return upload
+
+def current_offset(upload):
+    path = part_path(upload)
+    return upload.size if upload.is_complete else (os.path.getsize(path) if os.path.exists(path) else 0)
+
+def _spool(upload, offset, stream):
+    """Legge il blocco dal client in un file temporaneo proprio della richiesta (nessun lock aperto)."""
+    path = part_path(upload) + f".{uuid.uuid4().hex}"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    limit, written = upload.size - offset, 0
+    try:
+        with open(path, 'wb') as fh:
+            for block in iter(lambda: stream.read(CHUNK), b''):
+                written += len(block)
+                if written > limit:
+                    raise UploadError("Dati oltre la dimensione dichiarata.", status=413, offset=offset)
+                fh.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def write_chunk(upload_id, user, offset, stream):
+    """Accoda un blocco letto in streaming (memoria costante) e, a file completo, lo finalizza.
+
+    Il body arriva dal client (anche lentamente) in un file temporaneo fuori da ogni
+    transazione; il lock sulla riga della sessione copre solo il confronto dell'offset e
+    l'accodamento su disco, così PUT concorrenti sullo stesso upload restano serializzati.
+    """
+    upload = UploadSession.objects.get(pk=upload_id, user=user)
+    if upload.is_complete:
+        return upload
+    if offset != current_offset(upload):
+        raise UploadError("Offset non valido.", status=409, offset=current_offset(upload))
+    spool = _spool(upload, offset, stream)
+    try:
+        with transaction.atomic():
+            upload = UploadSession.objects.select_for_update().get(pk=upload_id, user=user)
+            if upload.is_complete:
+                return upload
+            current = current_offset(upload)
+            if offset != current:
+                raise UploadError("Offset non valido.", status=409, offset=current)
+            with open(spool, 'rb') as src, open(part_path(upload), 'ab') as dst:
+                shutil.copyfileobj(src, dst, CHUNK)
+            upload.received = current + os.path.getsize(spool)
+            upload.save(update_fields=['received', 'updated_at'])
+    finally:
+        os.remove(spool)
+    if upload.received == upload.size:
+        finalize(upload)
+    return upload
+
+def finalize(upload):
+    """Calcola lo SHA-256 del file ricevuto e lo sposta nello storage content-addressed (o riusa il blob esistente)."""
+    path = part_path(upload)
+    digest = file_sha256(path)
+    stored = StoredFile.objects.filter(sha256=digest).first()
+    if stored is None:
+        rel = os.path.join(BLOB_DIR, digest[:2], f"{digest}.{_extension(upload.filename)}").replace(os.sep, '/')
+        os.makedirs(os.path.dirname(_media(rel)), exist_ok=True)
+        os.replace(path, _media(rel))
+        try:
+            stored = StoredFile.objects.create(sha256=digest, size=upload.size, path=rel, content_type=upload.content_type)
+        except IntegrityError:
+            # Stesso contenuto finalizzato in parallelo da un altro upload
+            stored = StoredFile.objects.get(sha256=digest)
+    elif os.path.exists(path):
+        os.remove(path)
+    UploadSession.objects.filter(pk=upload.pk).update(stored_file=stored, received=upload.size)
+    upload.stored_file = stored
+    return stored
+
+# ===== COLLEGAMENTO AI MODELLI ESISTENTI =====
+def attach(upload, user, target, data, absolute_url):
+    """Collega il file completato a foto lavori, spesa, documento HR o sessione mezzo. Restituisce l'oggetto."""
+    if not upload.is_complete:
+        raise UploadError("Upload non completato.", status=409, offset=current_offset(upload))
+    if target == 'work_photo':
+        project_id = data.get('project')
+        if not project_id:
+            raise UploadError("Progetto obbligatorio.")
+        ts = TimeSession.objects.filter(pk=data['time_session'], user=user, project_id=project_id).first() if data.get('time_session') else None
+        wi = WorkItem.objects.filter(pk=data['work_item'], project_id=project_id).first() if data.get('work_item') else None
+        return WorkPhoto.objects.create(project_id=project_id, user=user, time_session=ts, work_item=wi,
+                                        url=absolute_url, description=data.get('description') or None)
+    if target == 'cost_document':
+        doc = CostDocument.objects.filter(pk=data.get('id')).first()
+        if doc is None or (doc.user_id != user.id and not user.is_staff):
+            raise UploadError("Spesa non trovata.", status=404)
+        doc.doc_url = absolute_url
+        doc.save(update_fields=['doc_url'])
+        return doc
+    if target == 'user_file':
+        uf = UserFile.objects.filter(pk=data.get('id')).first()
+        if uf is None or not user.is_staff:
+            raise UploadError("Documento non trovato.", status=404)
+        uf.file_url = absolute_url
+        uf.save(update_fields=['file_url'])
+        return uf
+    if target == 'vehicle_session':
+        vs = VehicleSession.objects.filter(pk=data.get('id'), user=user).first()
+        if vs is None:
+            raise UploadError("Sessione mezzo non trovata.", status=404)
+        vs.photos_urls = '\n'.join(filter(None, [vs.photos_urls, absolute_url]))
+        vs.save(update_fields=['photos_urls'])
+        return vs
+    raise UploadError("Destinazione non valida.")
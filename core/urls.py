@@ -1,5 +1,6 @@
 from django.urls import path
-from . import views
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from . import views, api
 
 urlpatterns = [
     path('', views.redirect_home, name='home'),
@@ -28,6 +29,7 @@ urlpatterns = [
     # Spese
     path('costs/', views.costs_list, name='costs_list'),
     path('costs/new/', views.costs_new, name='costs_new'),
+    path('costs/totals/', views.costs_totals, name='costs_totals'),
     path('costs/<int:pk>/', views.costs_detail, name='costs_detail'),
     path('costs/<int:pk>/approve/', views.costs_approve, name='costs_approve'),
     path('costs/<int:pk>/reject/', views.costs_reject, name='costs_reject'),
@@ -35,6 +37,8 @@ urlpatterns = [
 
     # Flotta
     path('fleet/', views.fleet_list, name='fleet_list'),
+    path('fleet/analytics/', views.fleet_analytics, name='fleet_analytics'),
+    path('geofence/', views.geofence_report, name='geofence_report'),
     path('fleet/<int:pk>/', views.fleet_detail, name='fleet_detail'),
     path('fleet/<int:vehicle_id>/checkout/', views.fleet_checkout, name='fleet_checkout'),
     path('fleet/session/<int:pk>/checkin/', views.fleet_checkin, name='fleet_checkin'),
@@ -43,6 +47,23 @@ urlpatterns = [
     path('documents/', views.docs_home, name='docs_home'),
     path('documents/folder/<int:pk>/', views.docs_folder, name='docs_folder'),
     path('documents/file/<int:pk>/', views.docs_file, name='docs_file'),
+    path('documents/broadcasts/', views.broadcasts_list, name='broadcasts_list'),
+    path('documents/broadcasts/new/', views.broadcasts_new, name='broadcasts_new'),
+    path('documents/broadcasts/<int:pk>/', views.broadcasts_detail, name='broadcasts_detail'),
+    path('documents/broadcasts/<int:pk>/send/', views.broadcasts_send, name='broadcasts_send'),
+
+    # Upload
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:pk>/', views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:pk>/attach/', views.upload_attach, name='upload_attach'),
+
+    # API
+    path('api/token/', TokenObtainPairView.as_view(), name='api_token'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='api_token_refresh'),
+    path('api/sync/', api.SyncBatchView.as_view(), name='api_sync'),
+    path('api/changes/', api.ChangesView.as_view(), name='api_changes'),
+    path('api/projects/kpi/', api.ProjectKpiView.as_view(), name='api_project_kpi'),
+    path('api/fleet/board/', api.FleetBoardView.as_view(), name='api_fleet_board'),
 ]
 
 
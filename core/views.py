@@ -1,21 +1,38 @@
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.contrib.auth import authenticate, login, logout
 from django.views.decorators.csrf import csrf_protect
 from django.contrib import messages
+from django.http import JsonResponse, Http404
+from django.views.decorators.http import require_http_methods, require_POST
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
 from django.utils import timezone
 
 from .models import (
     Project, WorkItem,
-    TimeSession, TimeSessionAllocation,
+    TimeSession, TimeSessionAllocation, DailyHours,
     CostDocument,
     Vehicle, VehicleSession,
-    UserFolder, UserFile
+    UserFolder, UserFile, BroadcastDoc, UploadSession
 )
+from .pagination import keyset_paginate, wants_fragment
+from .backends import login_throttled
+from .time_summary import summarize_sessions
+from .labor import rate_for, compute_labor_costs
+from .kpi import attach_kpis
+from .fleet_board import fleet_board, board_summary
+from .telemetry import record_session_readings
+from .geo import location_fields, outside_site
+from .broadcasts import fan_out, ack_report, rates, BroadcastError
+from .folders import folder_tree, breadcrumbs, subfolders
+from . import telemetry
+from .cost_totals import cost_totals, GRANULARITY
+from . import uploads
 from .forms import (
     WorkItemForm, TimeStartForm, AllocationForm,
     VehicleCheckoutForm, VehicleCheckinForm,
-    CostForm
+    CostForm, BroadcastForm
 )
 
 def redirect_home(request):
@@ -26,19 +43,15 @@ def login_view(request):
     if request.method == 'POST':
         user_or_email = request.POST.get('email','').strip()
         password = request.POST.get('password','').strip()
-        username = user_or_email
-        if '@' in user_or_email:
-            User = get_user_model()
-            try:
-                u = User.objects.get(email__iexact=user_or_email)
-                username = u.get_username()
-            except User.DoesNotExist:
-                pass
-        user = authenticate(request, username=username, password=password)
+        # EmailOrUsernameBackend risolve username o email in una sola query
+        user = authenticate(request, username=user_or_email, password=password)
         if user:
             login(request, user)
             return redirect('dashboard')
-        messages.error(request, 'Credenziali non valide')
+        if login_throttled(user_or_email):
+            messages.error(request, 'Troppi tentativi falliti: riprova tra qualche minuto')
+        else:
+            messages.error(request, 'Credenziali non valide')
     return render(request, 'core/login.html')
 
 def logout_view(request):
@@ -48,13 +61,19 @@ def logout_view(request):
 @login_required
 def dashboard(request):
     kpi_projects = Project.objects.count()
-    last_7 = timezone.now() - timezone.timedelta(days=7)
-    total_minutes = 0
-    for ts in TimeSession.objects.filter(user=request.user, completed=True, end_time__gte=last_7):
-        total_minutes += ts.duration_minutes
-    kpi_hours_week = round(total_minutes / 60, 1)
-    recent_projects = Project.objects.all()[:5]
-    bars = [4,6,3,7,5,8,6]
+    first_day = timezone.localdate() - timezone.timedelta(days=6)
+    per_day = dict(
+        DailyHours.objects.filter(user=request.user, day__gte=first_day)
+        .values_list('day').annotate(m=Sum('minutes')).order_by()
+    )
+    days = [first_day + timezone.timedelta(days=i) for i in range(7)]
+    kpi_hours_week = round(sum(per_day.values()) / 60, 1)
+    top = max(per_day.values(), default=0) or 1
+    bars = [
+        {'day': d, 'hours': round(per_day.get(d, 0) / 60, 1), 'pct': round(per_day.get(d, 0) * 100 / top)}
+        for d in days
+    ]
+    recent_projects = attach_kpis(Project.objects.all()[:5])
     return render(request, 'core/dashboard.html', {
         'kpi_projects': kpi_projects,
         'kpi_hours_week': kpi_hours_week,
@@ -64,35 +83,25 @@ def dashboard(request):
 
 @login_required
 def projects_list(request):
-    items = Project.objects.all()
-    return render(request, 'core/projects_list.html', {'items': items})
+    page = keyset_paginate(request, Project.objects.all())
+    attach_kpis(page.items)
+    if wants_fragment(request):
+        return render(request, 'core/partials/projects_rows.html', {'page': page})
+    return render(request, 'core/projects_list.html', {'page': page})
 
 # ===== Lavorazioni =====
-def _build_tree(items):
-    by_parent = {}
-    for it in items:
-        by_parent.setdefault(it.parent_id, []).append(it)
-    for k in by_parent:
-        by_parent[k].sort(key=lambda x: (x.sort_order, x.id))
-    def walk(pid):
-        nodes = []
-        for n in by_parent.get(pid, []):
-            nodes.append({'node': n, 'children': walk(n.id)})
-        return nodes
-    return walk(None)
-
 @login_required
 def project_detail(request, pk):
     p = get_object_or_404(Project, pk=pk)
-    items = list(WorkItem.objects.filter(project=p).select_related('parent'))
-    tree = _build_tree(items)
-    return render(request, 'core/project_detail.html', {'p': p, 'tree': tree})
+    # Queryset lazy: viene eseguito solo se il frammento non è già in cache
+    items = WorkItem.objects.filter(project=p).preorder()
+    return render(request, 'core/project_detail.html', {'p': p, 'items': items})
 
 @login_required
 def workitem_create(request, project_id):
     p = get_object_or_404(Project, pk=project_id)
     if request.method == 'POST':
-        form = WorkItemForm(request.POST)
+        form = WorkItemForm(request.POST, instance=WorkItem(project=p))
         form.fields['parent'].queryset = WorkItem.objects.filter(project=p)
         if form.is_valid():
             wi = form.save(commit=False)
@@ -111,22 +120,23 @@ def workitem_edit(request, pk):
     p = wi.project
     if request.method == 'POST':
         form = WorkItemForm(request.POST, instance=wi)
-        form.fields['parent'].queryset = WorkItem.objects.filter(project=p).exclude(pk=wi.pk)
+        form.fields['parent'].queryset = WorkItem.objects.filter(project=p).exclude(pk__in=wi.get_descendants(include_self=True).values('pk'))
         if form.is_valid():
             form.save()
             messages.success(request, "Lavorazione aggiornata.")
             return redirect('project_detail', pk=p.id)
     else:
         form = WorkItemForm(instance=wi)
-        form.fields['parent'].queryset = WorkItem.objects.filter(project=p).exclude(pk=wi.pk)
+        form.fields['parent'].queryset = WorkItem.objects.filter(project=p).exclude(pk__in=wi.get_descendants(include_self=True).values('pk'))
     return render(request, 'core/work_item_form.html', {'form': form, 'project': p, 'title': 'Modifica lavorazione'})
 
 @login_required
 def workitem_delete(request, pk):
     wi = get_object_or_404(WorkItem, pk=pk)
     pid = wi.project_id
-    if wi.children.exists():
-        messages.error(request, "Impossibile eliminare: esistono sotto-lavorazioni. Elimina prima i figli.")
+    n_desc = wi.get_descendants().count()
+    if n_desc:
+        messages.error(request, f"Impossibile eliminare: esistono {n_desc} sotto-lavorazioni. Elimina prima i figli.")
         return redirect('project_detail', pk=pid)
     wi.delete()
     messages.success(request, "Lavorazione eliminata.")
@@ -157,8 +167,12 @@ def workitem_set_progress(request, pk, value):
 @login_required
 def times_list(request):
     my_sessions = TimeSession.objects.filter(user=request.user).select_related('project')
+    page = keyset_paginate(request, my_sessions)
+    summarize_sessions(page.items)
+    if wants_fragment(request):
+        return render(request, 'core/partials/times_rows.html', {'page': page})
     active = my_sessions.filter(end_time__isnull=True, completed=False).first()
-    return render(request, 'core/times_list.html', {'items': my_sessions, 'active': active})
+    return render(request, 'core/times_list.html', {'page': page, 'active': active})
 
 @login_required
 def times_active(request):
@@ -167,27 +181,39 @@ def times_active(request):
 
 @login_required
 def times_start(request):
-    already = TimeSession.objects.filter(user=request.user, end_time__isnull=True, completed=False).exists()
-    if already:
-        messages.error(request, "Hai già una timbratura attiva. Chiudila prima di avviarne un'altra.")
-        return redirect('times_active')
+    already_msg = "Hai già una timbratura attiva. Chiudila prima di avviarne un'altra."
     if request.method == 'POST':
         form = TimeStartForm(request.POST)
         if form.is_valid():
             p = form.cleaned_data['project']
             note = form.cleaned_data['note']
-            ts = TimeSession.objects.create(project=p, user=request.user, note=note, hourly_rate_eur_snapshot=0)
+            # Il vincolo uniq_open_timesession_per_user garantisce l'unicità anche con tap concorrenti
+            try:
+                with transaction.atomic():
+                    ts = TimeSession.objects.create(
+                        project=p, user=request.user, note=note,
+                        hourly_rate_eur_snapshot=rate_for(request.user.id, timezone.localdate()),
+                        **location_fields('start_', p, *form.location()),
+                    )
+            except IntegrityError:
+                messages.error(request, already_msg)
+                return redirect('times_active')
+            if ts.start_in_geofence is False:
+                messages.warning(request, "Timbratura registrata fuori dall'area del cantiere.")
             messages.success(request, "Timbratura avviata.")
             return redirect('times_detail', pk=ts.id)
     else:
+        if TimeSession.objects.filter(user=request.user, end_time__isnull=True, completed=False).exists():
+            messages.error(request, already_msg)
+            return redirect('times_active')
         form = TimeStartForm()
     return render(request, 'core/times_start.html', {'form': form})
 
 @login_required
 def times_detail(request, pk):
-    ts = get_object_or_404(TimeSession, pk=pk, user=request.user)
-    wi_qs = WorkItem.objects.filter(project=ts.project)
-    return render(request, 'core/times_detail.html', {'ts': ts, 'wi_qs': wi_qs})
+    ts = get_object_or_404(TimeSession.objects.select_related('project'), pk=pk, user=request.user)
+    summarize_sessions([ts])
+    return render(request, 'core/times_detail.html', {'ts': ts})
 
 @login_required
 def times_stop(request, pk):
@@ -239,7 +265,33 @@ def costs_list(request):
     qs = CostDocument.objects.select_related('project','user','work_item')
     if state in {'pending','approved','rejected'}:
         qs = qs.filter(status=state)
-    return render(request, 'core/costs_list.html', {'items': qs, 'state': state})
+    page = keyset_paginate(request, qs)
+    if wants_fragment(request):
+        return render(request, 'core/partials/costs_rows.html', {'page': page})
+    return render(request, 'core/costs_list.html', {'page': page, 'state': state})
+
+def _parse_day(value, default):
+    try:
+        return timezone.datetime.strptime(value, '%Y-%m-%d').date() if value else default
+    except ValueError:
+        return default
+
+@login_required
+def costs_totals(request):
+    today = timezone.localdate()
+    day_from = _parse_day(request.GET.get('from'), today.replace(day=1))
+    day_to = _parse_day(request.GET.get('to'), today)
+    granularity = request.GET.get('by') if request.GET.get('by') in GRANULARITY else 'month'
+    state = request.GET.get('state') if request.GET.get('state') in {'pending','approved','rejected'} else None
+    project_id = request.GET.get('project') if (request.GET.get('project') or '').isdigit() else None
+    start = timezone.make_aware(timezone.datetime.combine(day_from, timezone.datetime.min.time()))
+    end = timezone.make_aware(timezone.datetime.combine(day_to + timezone.timedelta(days=1), timezone.datetime.min.time()))
+    totals = cost_totals(start, end, granularity, project_id, state)
+    labor = compute_labor_costs(start, end, granularity, project_id)
+    return render(request, 'core/costs_totals.html', {
+        'totals': totals, 'labor': labor, 'day_from': day_from, 'day_to': day_to, 'granularity': granularity,
+        'state': state, 'project_id': project_id, 'projects': Project.objects.only('id','name'),
+    })
 
 @login_required
 def costs_new(request):
@@ -302,42 +354,87 @@ def costs_delete(request, pk):
 # ===== Flotta =====
 @login_required
 def fleet_list(request):
-    vehicles = Vehicle.objects.all()
-    return render(request, 'core/fleet_list.html', {'items': vehicles})
+    # Bacheca: mezzi con sessione aperta, utente, progetto e ultima lettura in una query (in cache)
+    rows = fleet_board()
+    status = request.GET.get('status')
+    items = [r for r in rows if r['status'] == status] if status in dict(Vehicle.STATUS) else rows
+    return render(request, 'core/fleet_list.html', {'items': items, 'summary': board_summary(rows), 'status': status})
+
+@user_passes_test(_is_staff)
+@login_required
+def fleet_analytics(request):
+    today = timezone.localdate()
+    day_from = _parse_day(request.GET.get('from'), today.replace(day=1))
+    day_to = _parse_day(request.GET.get('to'), today)
+    start = timezone.make_aware(timezone.datetime.combine(day_from, timezone.datetime.min.time()))
+    end = timezone.make_aware(timezone.datetime.combine(day_to + timezone.timedelta(days=1), timezone.datetime.min.time()))
+    return render(request, 'core/fleet_analytics.html', {
+        'a': telemetry.fleet_analytics(start, min(end, timezone.now())), 'day_from': day_from, 'day_to': day_to,
+    })
+
+@user_passes_test(_is_staff)
+@login_required
+def geofence_report(request):
+    today = timezone.localdate()
+    day_from = _parse_day(request.GET.get('from'), today.replace(day=1))
+    day_to = _parse_day(request.GET.get('to'), today)
+    start = timezone.make_aware(timezone.datetime.combine(day_from, timezone.datetime.min.time()))
+    end = timezone.make_aware(timezone.datetime.combine(day_to + timezone.timedelta(days=1), timezone.datetime.min.time()))
+    sessions, vehicle_sessions = outside_site(start, end)
+    return render(request, 'core/geofence_report.html', {
+        'sessions': sessions.select_related('user', 'project').order_by('-start_time')[:200],
+        'vehicle_sessions': vehicle_sessions.select_related('user', 'project', 'vehicle').order_by('-start_time')[:200],
+        'day_from': day_from, 'day_to': day_to,
+    })
 
 @login_required
 def fleet_detail(request, pk):
     v = get_object_or_404(Vehicle, pk=pk)
-    active = VehicleSession.objects.filter(vehicle=v, end_time__isnull=True).select_related('user','project').first()
     history = VehicleSession.objects.filter(vehicle=v).select_related('user','project')
-    return render(request, 'core/fleet_detail.html', {'v': v, 'active': active, 'history': history})
+    page = keyset_paginate(request, history)
+    if wants_fragment(request):
+        return render(request, 'core/partials/fleet_history_rows.html', {'page': page})
+    active = VehicleSession.objects.filter(vehicle=v, end_time__isnull=True).select_related('user','project').first()
+    return render(request, 'core/fleet_detail.html', {'v': v, 'active': active, 'page': page})
 
-@login_required
-def fleet_checkout(request, vehicle_id):
-    v = get_object_or_404(Vehicle, pk=vehicle_id)
+def _fleet_checkout_busy(request, v):
     if VehicleSession.objects.filter(vehicle=v, end_time__isnull=True).exists():
         messages.error(request, "Il mezzo è già in uso.")
         return redirect('fleet_detail', pk=v.id)
-    if VehicleSession.objects.filter(user=request.user, end_time__isnull=True).exists():
-        messages.error(request, "Hai già un mezzo in uso. Riconsegnalo prima di prenderne un altro.")
-        return redirect('fleet_list')
+    messages.error(request, "Hai già un mezzo in uso. Riconsegnalo prima di prenderne un altro.")
+    return redirect('fleet_list')
+
+@login_required
+def fleet_checkout(request, vehicle_id):
+    v = get_object_or_404(Vehicle, pk=vehicle_id)
     if request.method == 'POST':
         form = VehicleCheckoutForm(request.POST)
         if form.is_valid():
-            vs = VehicleSession.objects.create(
-                vehicle=v, user=request.user,
-                project=form.cleaned_data['project'],
-                start_odometer_km=form.cleaned_data['start_odometer_km'],
-                start_fuel_percent=form.cleaned_data['start_fuel_percent'],
-                notes_out=form.cleaned_data['notes_out'],
-            )
-            v.status = 'in_use'
-            v.odometer_km = vs.start_odometer_km
-            v.fuel_level_percent = vs.start_fuel_percent
-            v.save(update_fields=['status','odometer_km','fuel_level_percent'])
+            # Vincoli uniq_open_vehiclesession_per_vehicle/_per_user: un solo INSERT, niente pre-check
+            try:
+                with transaction.atomic():
+                    vs = VehicleSession.objects.create(
+                        vehicle=v, user=request.user,
+                        project=form.cleaned_data['project'],
+                        start_odometer_km=form.cleaned_data['start_odometer_km'],
+                        start_fuel_percent=form.cleaned_data['start_fuel_percent'],
+                        notes_out=form.cleaned_data['notes_out'],
+                        **location_fields('start_', form.cleaned_data['project'], *form.location()),
+                    )
+                    v.status = 'in_use'
+                    v.odometer_km = vs.start_odometer_km
+                    v.fuel_level_percent = vs.start_fuel_percent
+                    v.save(update_fields=['status','odometer_km','fuel_level_percent'])
+                    record_session_readings([vs], 'checkout')
+            except IntegrityError:
+                return _fleet_checkout_busy(request, v)
+            if vs.start_in_geofence is False:
+                messages.warning(request, "Ritiro registrato fuori dall'area del cantiere.")
             messages.success(request, "Ritiro effettuato.")
             return redirect('fleet_detail', pk=v.id)
     else:
+        if VehicleSession.objects.filter(end_time__isnull=True).filter(Q(vehicle=v) | Q(user=request.user)).exists():
+            return _fleet_checkout_busy(request, v)
         form = VehicleCheckoutForm(initial={'start_odometer_km': v.odometer_km,'start_fuel_percent': v.fuel_level_percent})
     return render(request, 'core/fleet_checkout.html', {'v': v, 'form': form})
 
@@ -361,12 +458,18 @@ def fleet_checkin(request, pk):
             vs.notes_in = form.cleaned_data['notes_in']
             vs.damages_report = form.cleaned_data['damages_report']
             vs.photos_urls = form.cleaned_data['photos_urls']
-            vs.save()
-            v = vs.vehicle
-            v.status = 'available'
-            v.odometer_km = end_km
-            v.fuel_level_percent = end_fuel
-            v.save(update_fields=['status','odometer_km','fuel_level_percent'])
+            for name, value in location_fields('end_', vs.project, *form.location()).items():
+                setattr(vs, name, value)
+            with transaction.atomic():
+                vs.save()
+                v = vs.vehicle
+                v.status = 'available'
+                v.odometer_km = end_km
+                v.fuel_level_percent = end_fuel
+                v.save(update_fields=['status','odometer_km','fuel_level_percent'])
+                record_session_readings([vs], 'checkin')
+            if vs.end_in_geofence is False:
+                messages.warning(request, "Riconsegna registrata fuori dall'area del cantiere.")
             messages.success(request, "Riconsegna effettuata.")
             return redirect('fleet_detail', pk=v.id)
     else:
@@ -376,15 +479,16 @@ def fleet_checkin(request, pk):
 # ===== Documenti HR =====
 @login_required
 def docs_home(request):
-    roots = UserFolder.objects.filter(owner=request.user, parent__isnull=True).order_by('name')
-    return render(request, 'core/docs_home.html', {'roots': roots})
+    # Intero albero dell'utente con i badge (non letti, prese visione) in una query
+    return render(request, 'core/docs_home.html', {'tree': folder_tree(request.user)})
 
 @login_required
 def docs_folder(request, pk):
     folder = get_object_or_404(UserFolder, pk=pk, owner=request.user)
-    subfolders = folder.children.all().order_by('name')
     files = folder.files.all().order_by('-id')
-    return render(request, 'core/docs_folder.html', {'folder': folder, 'subfolders': subfolders, 'files': files})
+    return render(request, 'core/docs_folder.html', {
+        'folder': folder, 'crumbs': breadcrumbs(folder), 'subfolders': subfolders(folder), 'files': files,
+    })
 
 @login_required
 def docs_file(request, pk):
@@ -398,3 +502,120 @@ def docs_file(request, pk):
         messages.success(request, "Presa visione confermata.")
         return redirect('docs_file', pk=uf.id)
     return render(request, 'core/docs_file.html', {'f': uf})
+
+# ===== Circolari (consegna e prese visione) =====
+@user_passes_test(_is_staff)
+@login_required
+def broadcasts_list(request):
+    page = keyset_paginate(request, ack_report())
+    for doc in page:
+        doc.rates = rates(doc)
+    if wants_fragment(request):
+        return render(request, 'core/partials/broadcast_rows.html', {'page': page})
+    return render(request, 'core/broadcasts_list.html', {'page': page})
+
+@user_passes_test(_is_staff)
+@login_required
+def broadcasts_new(request):
+    if request.method == 'POST':
+        form = BroadcastForm(request.POST)
+        if form.is_valid():
+            doc = form.save(commit=False)
+            doc.created_by = request.user
+            doc.save()
+            messages.success(request, "Circolare creata. Controlla i destinatari e inviala.")
+            return redirect('broadcasts_detail', pk=doc.id)
+    else:
+        form = BroadcastForm()
+    return render(request, 'core/broadcasts_form.html', {'form': form})
+
+@user_passes_test(_is_staff)
+@login_required
+def broadcasts_detail(request, pk):
+    doc = get_object_or_404(ack_report().select_related('group', 'project'), pk=pk)
+    # Destinatari che non hanno ancora letto (o confermato, se richiesto)
+    pending = UserFile.objects.filter(broadcast=doc).filter(
+        Q(ack_at__isnull=True) if doc.requires_ack else Q(read_at__isnull=True)
+    ).select_related('owner')
+    page = keyset_paginate(request, pending)
+    if wants_fragment(request):
+        return render(request, 'core/partials/broadcast_pending_rows.html', {'page': page})
+    return render(request, 'core/broadcasts_detail.html', {'doc': doc, 'rates': rates(doc), 'page': page})
+
+@user_passes_test(_is_staff)
+@login_required
+@require_POST
+def broadcasts_send(request, pk):
+    doc = get_object_or_404(BroadcastDoc, pk=pk)
+    try:
+        n = fan_out(doc.pk)
+    except BroadcastError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, f"Circolare consegnata a {n} nuovi destinatari." if n else "Tutti i destinatari hanno già la circolare.")
+    return redirect('broadcasts_detail', pk=pk)
+
+# ===== Upload (a blocchi, riprendibili) =====
+def _upload_json(request, upload, status=200, **extra):
+    data = {
+        'upload_id': str(upload.pk), 'size': upload.size, 'offset': uploads.current_offset(upload),
+        'complete': upload.is_complete, **extra,
+    }
+    if upload.is_complete:
+        data['url'] = request.build_absolute_uri(upload.stored_file.url)
+        data['sha256'] = upload.stored_file.sha256
+    return JsonResponse(data, status=status)
+
+def _upload_error(e):
+    data = {'error': str(e)}
+    if e.offset is not None:
+        data['offset'] = e.offset
+    return JsonResponse(data, status=e.status)
+
+@login_required
+@require_POST
+def upload_start(request):
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': "Dimensione mancante."}, status=400)
+    try:
+        upload = uploads.start_upload(
+            request.user, request.POST.get('filename', ''), size,
+            sha256=request.POST.get('sha256'), content_type=request.POST.get('content_type', ''),
+        )
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return _upload_json(request, upload, status=201)
+
+@login_required
+@require_http_methods(['GET', 'HEAD', 'PUT'])
+def upload_chunk(request, pk):
+    """GET/HEAD: offset da cui riprendere. PUT: blocco grezzo nel body, offset nell'header Upload-Offset."""
+    if request.method in ('GET', 'HEAD'):
+        return _upload_json(request, get_object_or_404(UploadSession.objects.select_related('stored_file'), pk=pk, user=request.user))
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return JsonResponse({'error': "Header Upload-Offset mancante."}, status=400)
+    try:
+        # Il body non viene mai caricato in memoria: write_chunk legge da request a blocchi
+        upload = uploads.write_chunk(pk, request.user, offset, request)
+    except UploadSession.DoesNotExist:
+        raise Http404("Upload non trovato")
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return _upload_json(request, upload)
+
+@login_required
+@require_POST
+def upload_attach(request, pk):
+    upload = get_object_or_404(UploadSession.objects.select_related('stored_file'), pk=pk, user=request.user)
+    try:
+        obj = uploads.attach(
+            upload, request.user, request.POST.get('target'), request.POST,
+            request.build_absolute_uri(upload.stored_file.url) if upload.is_complete else '',
+        )
+    except uploads.UploadError as e:
+        return _upload_error(e)
+    return _upload_json(request, upload, attached={'model': obj._meta.model_name, 'id': obj.pk})
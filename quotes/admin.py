@@ -1,3 +1,16 @@
 from django.contrib import admin
+from .models import Quote, QuoteLine
 
-# Register your models here.
+class QuoteLineInline(admin.TabularInline):
+    model = QuoteLine
+    extra = 0
+    fields = ('parent','catalog_item','description','unit','quantity','unit_price_eur','weight','sort_order')
+    autocomplete_fields = ('catalog_item',)
+
+@admin.register(Quote)
+class QuoteAdmin(admin.ModelAdmin):
+    list_display = ('title','client_name','status','project','created_at')
+    list_filter = ('status',)
+    search_fields = ('title','client_name')
+    readonly_fields = ('project',)
+    inlines = [QuoteLineInline]
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from core.changes import record_changes
+from core.models import Project, WorkItem
+from core.tree import path_segment
+from .models import Quote, QuoteLine
+
+# ===== PREVENTIVO -> PROGETTO =====
+# L'albero delle righe è istanziato un livello alla volta con bulk_create (le pk dei
+# padri servono ai figli): O(profondità) INSERT invece di un save() per nodo. I segnali
+# di WorkItem non scattano, quindi path/depth sono calcolati qui in memoria; avanzamento
+# e rollup partono da zero e non vanno ricalcolati.
+BATCH_SIZE = 1000
+
+class ConversionError(Exception):
+    """Preventivo già convertito o senza righe."""
+
+def quote_total(lines):
+    return sum((l.amount_eur for l in lines), Decimal('0.00'))
+
+def convert_quote(quote_id, **project_fields):
+    """Crea il progetto e l'albero lavorazioni del preventivo in un'unica transazione. Restituisce il progetto.
+
+    project_fields sovrascrive i default (nome = titolo, cliente, budget = totale righe).
+    """
+    with transaction.atomic():
+        quote = Quote.objects.select_for_update().get(pk=quote_id)
+        if quote.project_id:
+            raise ConversionError(f"Il preventivo è già stato convertito nel progetto #{quote.project_id}.")
+        lines = list(QuoteLine.objects.filter(quote=quote).only(
+            'id', 'parent_id', 'description', 'quantity', 'unit_price_eur', 'weight', 'sort_order'))
+        if not lines:
+            raise ConversionError("Il preventivo non ha righe.")
+        fields = {'name': quote.title, 'client_name': quote.client_name or None,
+                  'budget_eur': quote_total(lines), 'description': quote.notes or None}
+        fields.update(project_fields)
+        project = Project.objects.create(**fields)
+
+        known = {line.id for line in lines}
+        by_parent = {}
+        for line in lines:
+            by_parent.setdefault(line.parent_id if line.parent_id in known else None, []).append(line)
+        # line.id -> WorkItem creato (con pk e path)
+        created = {}
+        level = by_parent.get(None, [])
+        depth = 0
+        while level:
+            parents = [created.get(line.parent_id) for line in level]
+            items = [WorkItem(
+                project=project, name=line.description[:200], weight=line.weight, sort_order=line.sort_order,
+                parent=parent, depth=depth,
+            ) for line, parent in zip(level, parents)]
+            WorkItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+            for line, parent, wi in zip(level, parents, items):
+                wi.path = (parent.path if parent else '') + path_segment(wi.sort_order, wi.pk)
+                created[line.id] = wi
+            level = [kid for line in level for kid in by_parent.get(line.id, [])]
+            depth += 1
+        WorkItem.objects.bulk_update(created.values(), ['path'], batch_size=BATCH_SIZE)
+
+        quote.project, quote.status = project, 'converted'
+        quote.save(update_fields=['project', 'status', 'updated_at'])
+        record_changes('workitem', [wi.pk for wi in created.values()])
+    return project
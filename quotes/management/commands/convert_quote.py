@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quotes.conversion import convert_quote, ConversionError
+from quotes.models import Quote
+
+class Command(BaseCommand):
+    help = "Converte un preventivo in progetto istanziando l'albero delle lavorazioni"
+
+    def add_arguments(self, parser):
+        parser.add_argument('quote_id', type=int)
+        parser.add_argument('--name', help="Nome del progetto (default: titolo del preventivo)")
+
+    def handle(self, *args, **options):
+        fields = {'name': options['name']} if options['name'] else {}
+        try:
+            project = convert_quote(options['quote_id'], **fields)
+        except Quote.DoesNotExist:
+            raise CommandError(f"Preventivo #{options['quote_id']} inesistente")
+        except ConversionError as e:
+            raise CommandError(str(e))
+        n = project.work_items.count()
+        self.stdout.write(self.style.SUCCESS(f"Creato progetto #{project.id} '{project.name}' con {n} lavorazioni"))
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0001_initial'),
+        ('core', '0017_hourly_rate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Quote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('client_name', models.CharField(blank=True, default='', max_length=200)),
+                ('status', models.CharField(choices=[('draft', 'Bozza'), ('sent', 'Inviato'), ('accepted', 'Accettato'), ('converted', 'Convertito')], default='draft', max_length=20)),
+                ('notes', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quote', to='core.project')),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuoteLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=200)),
+                ('unit', models.CharField(blank=True, default='', max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=3, default=1, max_digits=12)),
+                ('unit_price_eur', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('weight', models.DecimalField(decimal_places=2, default=1, max_digits=10)),
+                ('sort_order', models.IntegerField(default=0)),
+                ('catalog_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.item')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='quotes.quoteline')),
+                ('quote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='quotes.quote')),
+            ],
+            options={
+                'ordering': ['sort_order', 'id'],
+                'indexes': [models.Index(fields=['quote', 'parent'], name='quotes_quot_quote_i_37cccb_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,45 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 
-# Create your models here.
+from core.models import Project
+from catalog.models import Item
+
+# ===== PREVENTIVI =====
+class Quote(models.Model):
+    STATUS_CHOICES = [('draft','Bozza'),('sent','Inviato'),('accepted','Accettato'),('converted','Convertito')]
+    title = models.CharField(max_length=200)
+    client_name = models.CharField(max_length=200, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    notes = models.TextField(blank=True, default='')
+    # Valorizzato dalla conversione (quotes.conversion): un preventivo genera al più un progetto
+    project = models.OneToOneField(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='quote')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta: ordering = ['-id']
+    def __str__(self): return self.title
+
+# Righe ad albero: ogni riga diventa una lavorazione con lo stesso parent/weight/sort_order
+class QuoteLine(models.Model):
+    quote = models.ForeignKey(Quote, on_delete=models.CASCADE, related_name='lines')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    catalog_item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    description = models.CharField(max_length=200)
+    unit = models.CharField(max_length=20, blank=True, default='')
+    quantity = models.DecimalField(max_digits=12, decimal_places=3, default=1)
+    unit_price_eur = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    weight = models.DecimalField(max_digits=10, decimal_places=2, default=1)
+    sort_order = models.IntegerField(default=0)
+    class Meta:
+        ordering = ['sort_order','id']
+        indexes = [models.Index(fields=['quote','parent'])]
+    def __str__(self): return f"[{self.quote_id}] {self.description}"
+    def clean(self):
+        if self.parent_id and self.parent.quote_id != self.quote_id:
+            raise ValidationError({'parent': "La riga padre deve appartenere allo stesso preventivo."})
+    @property
+    def amount_eur(self):
+        return (self.quantity * self.unit_price_eur).quantize(Decimal('0.01'))
@@ -1,3 +1,63 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import WorkItem
+from core.tree import path_ids
+from .conversion import convert_quote, ConversionError
+from .models import Quote, QuoteLine
+
+# ===== PREVENTIVO -> PROGETTO =====
+class ConvertQuoteTests(TestCase):
+    def make_quote(self, depth, width):
+        """Preventivo con `width` radici, ognuna con una catena di `depth` livelli."""
+        quote = Quote.objects.create(title=f"Preventivo {depth}x{width}", client_name='Cliente')
+        for w in range(width):
+            parent = None
+            for d in range(depth):
+                parent = QuoteLine.objects.create(
+                    quote=quote, parent=parent, description=f"Riga {w}.{d}", quantity=2,
+                    unit_price_eur=Decimal('10.00'), weight=d + 1, sort_order=width - w,
+                )
+        return quote
+
+    def count_queries(self, quote):
+        with CaptureQueriesContext(connection) as ctx:
+            convert_quote(quote.pk)
+        return len(ctx.captured_queries)
+
+    def test_queries_grow_with_depth_not_nodes(self):
+        narrow = self.count_queries(self.make_quote(depth=3, width=1))
+        wide = self.count_queries(self.make_quote(depth=3, width=20))
+        deeper = self.count_queries(self.make_quote(depth=4, width=1))
+        self.assertEqual(narrow, wide)
+        self.assertEqual(deeper, narrow + 1)
+
+    def test_tree_mirrors_quote_lines(self):
+        quote = self.make_quote(depth=3, width=2)
+        project = convert_quote(quote.pk)
+        quote.refresh_from_db()
+        self.assertEqual((quote.project_id, quote.status), (project.pk, 'converted'))
+        self.assertEqual(project.budget_eur, Decimal('120.00'))
+        items = {wi.name: wi for wi in WorkItem.objects.filter(project=project)}
+        self.assertEqual(len(items), 6)
+        for w in range(2):
+            root, mid, leaf = (items[f"Riga {w}.{d}"] for d in range(3))
+            self.assertEqual([root.parent_id, mid.parent_id, leaf.parent_id], [None, root.pk, mid.pk])
+            self.assertEqual([root.depth, mid.depth, leaf.depth], [0, 1, 2])
+            self.assertEqual(path_ids(leaf.path), [root.pk, mid.pk, leaf.pk])
+            self.assertEqual({root.sort_order, mid.sort_order, leaf.sort_order}, {2 - w})
+            self.assertEqual(leaf.weight, 3)
+        # Il path ordina i fratelli per sort_order come l'albero delle lavorazioni
+        roots = sorted((wi for wi in items.values() if wi.depth == 0), key=lambda wi: wi.path)
+        self.assertEqual([wi.name for wi in roots], ['Riga 1.0', 'Riga 0.0'])
+        with self.assertRaises(ConversionError):
+            convert_quote(quote.pk)
 
-# Create your tests here.
+    def test_convert_view_404_for_missing_quote(self):
+        self.client.force_login(User.objects.create_user('ufficio', is_staff=True))
+        response = self.client.post('/quotes/999/convert/')
+        self.assertEqual(response.status_code, 404)
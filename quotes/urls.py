@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.quotes_list, name='quotes_list'),
+    path('<int:pk>/', views.quote_detail, name='quote_detail'),
+    path('<int:pk>/convert/', views.quote_convert, name='quote_convert'),
+    path('<int:pk>/export/', views.quote_export, name='quote_export'),
+]
@@ -1,3 +1,68 @@
-from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
 
-# Create your views here.
+from core.pagination import keyset_paginate, wants_fragment
+from reports import exports
+from .conversion import convert_quote, quote_total, ConversionError
+from .models import Quote, QuoteLine
+
+def _is_staff(user): return user.is_staff or user.is_superuser
+
+@login_required
+def quotes_list(request):
+    page = keyset_paginate(request, Quote.objects.select_related('project'))
+    if wants_fragment(request):
+        return render(request, 'quotes/partials/quote_rows.html', {'page': page})
+    return render(request, 'quotes/list.html', {'page': page})
+
+def _preorder(lines):
+    # Righe in pre-order (padre, poi figli per sort_order) con indentazione per livello
+    by_parent = {}
+    for line in lines:
+        by_parent.setdefault(line.parent_id, []).append(line)
+    rows, stack = [], [(line, 0) for line in reversed(by_parent.get(None, []))]
+    while stack:
+        line, depth = stack.pop()
+        line.depth = depth
+        rows.append(line)
+        stack.extend((kid, depth + 1) for kid in reversed(by_parent.get(line.id, [])))
+    return rows
+
+@login_required
+def quote_detail(request, pk):
+    q = get_object_or_404(Quote.objects.select_related('project'), pk=pk)
+    lines = list(QuoteLine.objects.filter(quote=q).select_related('catalog_item'))
+    return render(request, 'quotes/detail.html', {'q': q, 'rows': _preorder(lines), 'total': quote_total(lines)})
+
+@login_required
+@require_POST
+def quote_export(request, pk):
+    # PDF nel process pool di reports.exports; lo stato si interroga su /reports/export/<job>/
+    q = get_object_or_404(Quote, pk=pk)
+    lines = list(QuoteLine.objects.filter(quote=q))
+    payload = {
+        'title': q.title, 'client': q.client_name, 'status': q.get_status_display(), 'notes': q.notes,
+        'date': q.updated_at.date().isoformat(), 'total': str(quote_total(lines)),
+        'rows': [
+            {'depth': l.depth, 'description': l.description, 'unit': l.unit, 'quantity': f"{l.quantity.normalize():f}",
+             'unit_price_eur': str(l.unit_price_eur), 'amount_eur': str(l.amount_eur)}
+            for l in _preorder(lines)
+        ],
+    }
+    return JsonResponse(exports.job_status(exports.submit('quote', payload)))
+
+@user_passes_test(_is_staff)
+@login_required
+@require_POST
+def quote_convert(request, pk):
+    q = get_object_or_404(Quote, pk=pk)
+    try:
+        project = convert_quote(q.pk)
+    except ConversionError as e:
+        messages.error(request, str(e))
+        return redirect('quote_detail', pk=pk)
+    messages.success(request, "Preventivo convertito in progetto.")
+    return redirect('project_detail', pk=project.id)
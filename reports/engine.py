@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from core.models import TimeSessionAllocation, DailyHours
+from core.rollups import interval_day_minutes
+
+# ===== CALENDARIO REPORT DI CANTIERE (utente × lavorazione × giorno) =====
+MODES = ('day', 'week', 'month')
+UNALLOCATED = None  # work_item_id della riga "non allocato"
+
+def period_bounds(mode, anchor):
+    """Intervallo di date [start, end) che contiene anchor per la vista giorno/settimana/mese."""
+    if mode == 'day':
+        return anchor, anchor + timezone.timedelta(days=1)
+    if mode == 'week':
+        start = anchor - timezone.timedelta(days=anchor.weekday())
+        return start, start + timezone.timedelta(days=7)
+    start = anchor.replace(day=1)
+    end = (start + timezone.timedelta(days=32)).replace(day=1)
+    return start, end
+
+def aware_midnight(day):
+    return timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()))
+
+def _allocations(start, end, project_id=None):
+    # Anche le timbrature iniziate prima del periodo e chiuse dentro (turni a cavallo di mezzanotte)
+    qs = TimeSessionAllocation.objects.filter(
+        time_session__completed=True,
+        time_session__start_time__lt=aware_midnight(end),
+        time_session__end_time__gt=aware_midnight(start),
+    )
+    if project_id:
+        qs = qs.filter(time_session__project_id=project_id)
+    # Un gruppo per (timbratura, lavorazione): minuti espliciti e percentuali sommati in SQL
+    return qs.values(
+        'time_session_id', 'time_session__start_time', 'time_session__end_time',
+        'time_session__user_id', 'time_session__user__username',
+        'work_item_id', 'work_item__name', 'work_item__project__name',
+    ).annotate(
+        minutes=Sum('minutes_allocated'),
+        percent=Sum('percent_allocated', filter=Q(minutes_allocated__isnull=True)),
+    ).order_by()
+
+def split_by_day(minutes, day_minutes):
+    """Ripartisce minuti allocati sui giorni della timbratura in proporzione ai minuti timbrati
+    di ciascun giorno (stesso riparto di DailyHours); somme cumulate, nessun minuto perso."""
+    total = sum(day_minutes.values())
+    out, done, cum = {}, 0, 0
+    for day in sorted(day_minutes):
+        cum += day_minutes[day]
+        share = minutes * cum // total - done
+        done += share
+        out[day] = share
+    return out
+
+def build_matrix(start, end, project_id=None):
+    """Matrice minuti [utente × lavorazione] × giorno per [start, end).
+
+    - allocazioni (a minuti o in percentuale della durata) sommate in SQL per timbratura e
+      lavorazione, ripartite sui giorni con il riparto del rollup DailyHours (calcolato una
+      volta per timbratura): un turno notturno non lascia resti sulla riga "non allocato";
+    - minuti timbrati totali dal rollup DailyHours, per la riga "non allocato".
+    """
+    days = [start + timezone.timedelta(days=i) for i in range((end - start).days)]
+    col = {d: i for i, d in enumerate(days)}
+    cells = defaultdict(lambda: [0] * len(days))
+    labels = {}
+
+    splits = {}
+    for a in _allocations(start, end, project_id):
+        ts_id = a['time_session_id']
+        if ts_id not in splits:
+            splits[ts_id] = interval_day_minutes(a['time_session__start_time'], a['time_session__end_time'])
+        day_minutes = splits[ts_id]
+        if not day_minutes:
+            continue
+        minutes = int(TimeSessionAllocation.resolve_minutes(sum(day_minutes.values()), a['minutes'], a['percent']))
+        if not minutes:
+            continue
+        key = (a['time_session__user_id'], a['work_item_id'])
+        labels[key] = (a['time_session__user__username'], a['work_item__name'], a['work_item__project__name'])
+        for day, m in split_by_day(minutes, day_minutes).items():
+            if day in col:
+                cells[key][col[day]] += m
+
+    # Minuti timbrati non coperti da allocazioni
+    worked = DailyHours.objects.filter(day__gte=start, day__lt=end)
+    if project_id:
+        worked = worked.filter(project_id=project_id)
+    allocated_by_user = defaultdict(lambda: [0] * len(days))
+    for (user_id, _), row in cells.items():
+        for i, m in enumerate(row):
+            allocated_by_user[user_id][i] += m
+    for r in worked.values('user_id', 'user__username', 'day').annotate(m=Sum('minutes')).order_by():
+        i = col[r['day']]
+        free = r['m'] - allocated_by_user[r['user_id']][i]
+        if free > 0:
+            key = (r['user_id'], UNALLOCATED)
+            labels[key] = (r['user__username'], '(non allocato)', '')
+            cells[key][i] += free
+
+    rows = [
+        {'user_id': u, 'user': labels[(u, w)][0], 'work_item_id': w, 'work_item': labels[(u, w)][1],
+         'project': labels[(u, w)][2], 'cells': row, 'total': sum(row)}
+        for (u, w), row in cells.items()
+    ]
+    rows.sort(key=lambda r: (r['user'], r['work_item_id'] is None, r['project'], r['work_item']))
+    day_totals = [sum(r['cells'][i] for r in rows) for i in range(len(days))]
+    return {'start': start, 'end': end, 'days': days, 'rows': rows, 'day_totals': day_totals, 'total': sum(day_totals)}
+
+def matrix_as_json(matrix):
+    return {
+        'start': matrix['start'].isoformat(),
+        'end': matrix['end'].isoformat(),
+        'days': [d.isoformat() for d in matrix['days']],
+        'rows': matrix['rows'],
+        'day_totals': matrix['day_totals'],
+        'total': matrix['total'],
+    }
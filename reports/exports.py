@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .pdf import render_job, RENDERERS
+
+# ===== EXPORT PDF IN BACKGROUND =====
+# Lo stato del job vive su disco accanto al PDF (<hash>.pdf / .pending / .error), così
+# qualunque worker web può rispondere allo status indipendentemente da chi l'ha avviato.
+RENDER_VERSION = 1
+PENDING_TIMEOUT = 15 * 60
+
+_pool = None
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=getattr(settings, 'PDF_WORKERS', 2))
+    return _pool
+
+def export_dir():
+    path = getattr(settings, 'PDF_EXPORT_DIR', os.path.join(settings.MEDIA_ROOT, 'exports'))
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+def job_id_for(kind, payload):
+    """Hash del contenuto: stessi dati in input -> stesso PDF, rigenerarlo non costa nulla."""
+    raw = json.dumps({'kind': kind, 'v': RENDER_VERSION, 'payload': payload}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def _paths(job_id):
+    base = os.path.join(export_dir(), f"{job_id}.pdf")
+    return base, base + '.pending', base + '.error'
+
+def submit(kind, payload):
+    if kind not in RENDERERS:
+        raise ValueError(f"Export PDF sconosciuto: {kind}")
+    job_id = job_id_for(kind, payload)
+    pdf, pending, error = _paths(job_id)
+    if os.path.exists(pdf):
+        return job_id
+    if os.path.exists(pending) and time.time() - os.path.getmtime(pending) < PENDING_TIMEOUT:
+        return job_id
+    if os.path.exists(error):
+        os.remove(error)
+    with open(pending, 'w') as fh:
+        fh.write(kind)
+    _executor().submit(render_job, kind, payload, pdf)
+    return job_id
+
+def status(job_id):
+    pdf, pending, error = _paths(job_id)
+    if os.path.exists(pdf):
+        return {'status': 'done'}
+    if os.path.exists(error):
+        with open(error) as fh:
+            return {'status': 'failed', 'error': fh.read()}
+    if os.path.exists(pending):
+        if time.time() - os.path.getmtime(pending) >= PENDING_TIMEOUT:
+            return {'status': 'failed', 'error': 'timeout'}
+        return {'status': 'running'}
+    return {'status': 'unknown'}
+
+def job_status(job_id):
+    """Stato per le risposte JSON delle view di export, con l'URL di download a PDF pronto."""
+    data = {'job': job_id, 'status_url': f"/reports/export/{job_id}/", **status(job_id)}
+    if data['status'] == 'done':
+        data['download_url'] = f"/reports/export/{job_id}/download/"
+    return data
+
+def pdf_path(job_id):
+    return _paths(job_id)[0]
@@ -0,0 +1,159 @@
+"""Rendering PDF con Pillow, eseguito nei processi worker (nessuna dipendenza da Django qui)."""
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+PAGE_W, PAGE_H = 1240, 1754  # A4 a 150 dpi
+MARGIN = 70
+LINE = 26
+THUMB = 260
+INK = (20, 20, 20)
+MUTED = (110, 110, 110)
+ACCENT = (244, 176, 0)
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, OSError):
+        return ImageFont.load_default()
+
+class _Doc:
+    """Impaginatore minimale: righe di testo e miniature con salto pagina automatico."""
+    def __init__(self, title):
+        self.pages = []
+        self.title = title
+        self.font = _font(18)
+        self.bold = _font(22)
+        self.big = _font(34)
+        self._new_page()
+
+    def _new_page(self):
+        self.page = Image.new('RGB', (PAGE_W, PAGE_H), 'white')
+        self.draw = ImageDraw.Draw(self.page)
+        self.pages.append(self.page)
+        self.y = MARGIN
+        self.draw.text((MARGIN, PAGE_H - MARGIN), f"{self.title} · pag. {len(self.pages)}", font=self.font, fill=MUTED)
+
+    def _room(self, h):
+        if self.y + h > PAGE_H - MARGIN - LINE:
+            self._new_page()
+
+    def heading(self, text):
+        self._room(LINE * 2)
+        self.draw.text((MARGIN, self.y), text, font=self.big, fill=INK)
+        self.y += LINE * 2
+
+    def line(self, text, bold=False, color=INK, indent=0):
+        self._room(LINE)
+        self.draw.text((MARGIN + indent, self.y), text, font=self.bold if bold else self.font, fill=color)
+        self.y += LINE
+
+    def row(self, cols, widths, bold=False):
+        self._room(LINE)
+        x = MARGIN
+        for text, w in zip(cols, widths):
+            self.draw.text((x, self.y), str(text), font=self.bold if bold else self.font, fill=INK)
+            x += w
+        self.y += LINE
+
+    def rule(self):
+        self._room(LINE)
+        self.draw.line((MARGIN, self.y + 6, PAGE_W - MARGIN, self.y + 6), fill=ACCENT, width=2)
+        self.y += LINE // 2 + 6
+
+    def thumbnails(self, photos):
+        per_row = (PAGE_W - 2 * MARGIN) // (THUMB + 20)
+        for i, ph in enumerate(photos):
+            if i % per_row == 0:
+                self._room(THUMB + LINE * 2)
+                row_y = self.y
+                self.y += THUMB + LINE * 2
+            x = MARGIN + (i % per_row) * (THUMB + 20)
+            img = _load_thumb(ph.get('path'))
+            if img is not None:
+                self.page.paste(img, (x + (THUMB - img.width) // 2, row_y + (THUMB - img.height) // 2))
+            else:
+                self.draw.rectangle((x, row_y, x + THUMB, row_y + THUMB), outline=MUTED)
+                self.draw.text((x + 10, row_y + THUMB // 2), "foto remota", font=self.font, fill=MUTED)
+            self.draw.text((x, row_y + THUMB + 4), (ph.get('caption') or '')[:28], font=self.font, fill=MUTED)
+
+    def save(self, path):
+        first, rest = self.pages[0], self.pages[1:]
+        first.save(path, 'PDF', resolution=150.0, save_all=True, append_images=rest)
+
+def _load_thumb(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as im:
+            im = im.convert('RGB')
+            im.thumbnail((THUMB, THUMB))
+            return im
+    except OSError:
+        return None
+
+def _hours(minutes):
+    return f"{minutes / 60:.1f} h"
+
+def render_site_report(payload, path):
+    m = payload['matrix']
+    doc = _Doc(f"Report di cantiere {m['start']} – {m['end']}")
+    doc.heading("Report di cantiere")
+    doc.line(f"Periodo: {m['start']} → {m['end']} (escluso)" + (f" · Progetto: {payload['project']}" if payload.get('project') else ''), color=MUTED)
+    doc.rule()
+    widths = [260, 420, 320, 120]
+    doc.row(["Utente", "Lavorazione", "Progetto", "Totale"], widths, bold=True)
+    for r in m['rows']:
+        doc.row([r['user'], r['work_item'][:40], (r['project'] or '')[:30], _hours(r['total'])], widths)
+    doc.rule()
+    doc.line(f"Totale periodo: {_hours(m['total'])}", bold=True)
+    doc.y += LINE
+    doc.line("Totali per giorno", bold=True)
+    for day, total in zip(m['days'], m['day_totals']):
+        if total:
+            doc.line(f"{day}: {_hours(total)}", indent=20)
+    if payload.get('photos'):
+        doc.y += LINE
+        doc.line(f"Foto ({len(payload['photos'])})", bold=True)
+        doc.thumbnails(payload['photos'])
+    doc.save(path)
+
+def render_quote(payload, path):
+    doc = _Doc(f"Preventivo {payload['title']}")
+    doc.heading(payload['title'])
+    doc.line(f"Cliente: {payload.get('client') or '—'} · Stato: {payload['status']} · {payload['date']}", color=MUTED)
+    doc.rule()
+    widths = [560, 200, 180, 160]
+    doc.row(["Voce", "Quantità", "Prezzo", "Importo"], widths, bold=True)
+    for r in payload['rows']:
+        label = ('  ' * r['depth'] + r['description'])[:60]
+        doc.row([label, f"{r['quantity']} {r['unit']}", f"€ {r['unit_price_eur']}", f"€ {r['amount_eur']}"], widths, bold=not r['depth'])
+    doc.rule()
+    doc.line(f"Totale: € {payload['total']}", bold=True)
+    if payload.get('notes'):
+        doc.y += LINE
+        doc.line("Note", bold=True)
+        for text in payload['notes'].splitlines():
+            doc.line(text[:100])
+    doc.save(path)
+
+RENDERERS = {
+    'site_report': render_site_report,
+    'quote': render_quote,
+}
+
+def render_job(kind, payload, out_path):
+    """Entry point del worker: scrive il PDF in modo atomico; in caso di errore lascia un file .error."""
+    tmp = out_path + '.tmp'
+    try:
+        RENDERERS[kind](payload, tmp)
+        os.replace(tmp, out_path)
+    except Exception as exc:  # noqa: BLE001 - l'errore va riportato allo stato del job
+        with open(out_path + '.error', 'w') as fh:
+            fh.write(f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        for leftover in (tmp, out_path + '.pending'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return out_path
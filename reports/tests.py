@@ -1,3 +1,59 @@
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Project, WorkItem, TimeSession, TimeSessionAllocation
+from .engine import build_matrix, UNALLOCATED
+
+def at(day, hour):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+# ===== CALENDARIO REPORT =====
+class BuildMatrixTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('operaio')
+        self.project = Project.objects.create(name='Cantiere')
+        self.wi = WorkItem.objects.create(project=self.project, name='Getto')
+        self.day = date(2026, 3, 9)
+
+    def session(self, start, end, **alloc):
+        ts = TimeSession.objects.create(user=self.user, project=self.project, start_time=start, end_time=end, completed=True)
+        TimeSessionAllocation.objects.create(time_session=ts, work_item=self.wi, **alloc)
+        return ts
+
+    def rows(self, start, end):
+        return {r['work_item_id']: r['cells'] for r in build_matrix(start, end)['rows']}
+
+    def test_overnight_allocation_follows_daily_split(self):
+        # 22:00 -> 04:00: 120 minuti il primo giorno, 240 il secondo, tutti allocati
+        self.session(at(self.day, 22), at(self.day + timedelta(days=1), 4), minutes_allocated=360)
+        rows = self.rows(self.day, self.day + timedelta(days=2))
+        self.assertEqual(rows[self.wi.pk], [120, 240])
+        self.assertNotIn(UNALLOCATED, rows)
+
+    def test_percent_allocation_leaves_remainder_on_each_day(self):
+        self.session(at(self.day, 22), at(self.day + timedelta(days=1), 4), percent_allocated=50)
+        rows = self.rows(self.day, self.day + timedelta(days=2))
+        self.assertEqual(rows[self.wi.pk], [60, 120])
+        self.assertEqual(rows[UNALLOCATED], [60, 120])
+
+    def test_session_started_before_period_counts_inside_it(self):
+        self.session(at(self.day, 22), at(self.day + timedelta(days=1), 4), minutes_allocated=360)
+        rows = self.rows(self.day + timedelta(days=1), self.day + timedelta(days=2))
+        self.assertEqual(rows[self.wi.pk], [240])
+        self.assertNotIn(UNALLOCATED, rows)
 
-# Create your tests here.
+    def test_allocations_are_grouped_per_session_and_work_item(self):
+        ts = self.session(at(self.day, 8), at(self.day, 12), minutes_allocated=60)
+        TimeSessionAllocation.objects.create(time_session=ts, work_item=self.wi, percent_allocated=25)
+        other = WorkItem.objects.create(project=self.project, name='Casseri')
+        TimeSessionAllocation.objects.create(time_session=ts, work_item=other, minutes_allocated=30)
+        for h in (13, 15):
+            self.session(at(self.day, h), at(self.day, h + 1), minutes_allocated=60)
+        with self.assertNumQueries(2):
+            rows = self.rows(self.day, self.day + timedelta(days=1))
+        self.assertEqual(rows[self.wi.pk], [60 + 60 + 60 + 60])
+        self.assertEqual(rows[other.pk], [30])
+        self.assertEqual(rows[UNALLOCATED], [90])
@@ -0,0 +1,10 @@
+from django.urls import path, re_path
+from . import views
+
+urlpatterns = [
+    path('', views.calendar, name='reports_calendar'),
+    path('calendar.json', views.calendar_json, name='reports_calendar_json'),
+    path('export/site-report/', views.export_site_report, name='reports_export_site_report'),
+    re_path(r'^export/(?P<job_id>[0-9a-f]{64})/$', views.export_status, name='reports_export_status'),
+    re_path(r'^export/(?P<job_id>[0-9a-f]{64})/download/$', views.export_download, name='reports_export_download'),
+]
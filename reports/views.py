@@ -1,3 +1,70 @@
+import os
+
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, FileResponse, Http404
 from django.shortcuts import render
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from core.images import local_media_path, derivative_path
+from core.models import Project, WorkPhoto
+from .engine import MODES, period_bounds, build_matrix, matrix_as_json, aware_midnight
+from . import exports
+
+def _matrix_from_request(request):
+    mode = request.GET.get('mode') if request.GET.get('mode') in MODES else 'week'
+    try:
+        anchor = timezone.datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        anchor = timezone.localdate()
+    project_id = request.GET.get('project') if (request.GET.get('project') or '').isdigit() else None
+    start, end = period_bounds(mode, anchor)
+    return mode, anchor, project_id, build_matrix(start, end, project_id)
+
+@login_required
+def calendar(request):
+    mode, anchor, project_id, matrix = _matrix_from_request(request)
+    start, end = matrix['start'], matrix['end']
+    return render(request, 'reports/calendar.html', {
+        'm': matrix, 'mode': mode, 'anchor': anchor, 'project_id': project_id,
+        'prev': start - timezone.timedelta(days=1), 'next': end,
+        'projects': Project.objects.only('id', 'name'),
+    })
+
+@login_required
+def calendar_json(request):
+    _, _, _, matrix = _matrix_from_request(request)
+    return JsonResponse(matrix_as_json(matrix))
+
+# ===== EXPORT PDF =====
+def _job_response(job_id):
+    return JsonResponse(exports.job_status(job_id))
+
+@login_required
+@require_POST
+def export_site_report(request):
+    _, _, project_id, matrix = _matrix_from_request(request)
+    photos = WorkPhoto.objects.filter(created_at__gte=aware_midnight(matrix['start']), created_at__lt=aware_midnight(matrix['end']))
+    if project_id:
+        photos = photos.filter(project_id=project_id)
+    payload = {
+        'matrix': matrix_as_json(matrix),
+        'project': Project.objects.filter(pk=project_id).values_list('name', flat=True).first() if project_id else None,
+        'photos': [
+            # Il PDF usa la taglia 'md' se già pronta: niente decodifica di foto a piena risoluzione
+            {'url': url, 'path': derivative_path(local_media_path(url), 'md') or local_media_path(url), 'caption': desc or project_name}
+            for url, desc, project_name in photos.values_list('url', 'description', 'project__name')[:200]
+        ],
+    }
+    return _job_response(exports.submit('site_report', payload))
+
+@login_required
+def export_status(request, job_id):
+    return _job_response(job_id)
 
-# Create your views here.
+@login_required
+def export_download(request, job_id):
+    path = exports.pdf_path(job_id)
+    if not os.path.exists(path):
+        raise Http404("Export non disponibile")
+    return FileResponse(open(path, 'rb'), content_type='application/pdf', as_attachment=True, filename=f"report-{job_id[:12]}.pdf")